@@ -3,11 +3,18 @@ Package principal de l'application WhatsApp Bot
 Initialise Flask et configure l'application
 """
 
+import time
+
+_import_started = time.perf_counter()
+
 from flask import Flask
 from app.config import Config
+from app.registry import registry
 from app.utils.logger import setup_logger
 import os
 
+registry.record_timing("package_import", time.perf_counter() - _import_started)
+
 # Initialiser le logger
 logger = setup_logger(__name__)
 
@@ -22,6 +29,7 @@ def create_app(config_class=Config):
     Returns:
         Application Flask configurée
     """
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(config_class)
     
@@ -34,6 +42,9 @@ def create_app(config_class=Config):
     from app.routes import webhook_bp
     app.register_blueprint(webhook_bp)
     
+    # Les services sont construits à la première requête (voir app.registry)
+    registry.record_timing("create_app", time.perf_counter() - started)
+    
     logger.info("Application WhatsApp Bot initialisée avec succès")
     logger.info(f"Mode Debug: {app.config.get('DEBUG')}")
     logger.info(f"Modèle Hugging Face: {app.config.get('HUGGINGFACE_MODEL')}")
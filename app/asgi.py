@@ -0,0 +1,544 @@
+"""
+Application ASGI (Starlette)
+Expose les mêmes routes que webhook_bp sur les services asynchrones
+
+Lancement: uvicorn app.asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Set, TYPE_CHECKING
+from urllib.parse import parse_qsl
+from starlette.applications import Starlette
+from starlette.datastructures import FormData
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Route
+from twilio.twiml.messaging_response import MessagingResponse
+from app.registry import get_service, registry
+from app.services import (
+    get_http_transport,
+    get_response_cache,
+    get_near_duplicate_cache,
+    get_webhook_deduplicator,
+    get_prompt_registry,
+)
+from app.config import Config
+from app.utils.logger import get_log_handler, setup_logger
+from app.utils.prometheus import WEBHOOK_PARSE_SECONDS, render_metrics
+from app.utils.profiling import PROFILE_HEADER, Trace, activate, check_admin_token, get_profiler
+
+if TYPE_CHECKING:
+    from app.handlers.async_message_handler import AsyncMessageHandler
+
+logger = setup_logger(__name__)
+
+# Réponse TwiML vide, construite une seule fois
+EMPTY_TWIML = str(MessagingResponse())
+
+# Conversations traitées en arrière-plan (références gardées jusqu'à la fin)
+_background_tasks: Set[asyncio.Task] = set()
+_max_in_flight = Config.WORKER_QUEUE_MAXSIZE
+
+
+class _FormRequest:
+    """Adapte une requête Starlette à l'interface attendue par TwilioService"""
+
+    def __init__(self, request: Request, body: bytes, form):
+        self.headers = request.headers
+        self.url = request.url
+        self.form = form
+        self.values = form
+        self._body = body
+
+    def get_data(self) -> bytes:
+        return self._body
+
+
+def _content_length(request: Request) -> Optional[int]:
+    """Taille annoncée du corps (None si absente ou invalide)"""
+    try:
+        return int(request.headers['content-length'])
+    except (KeyError, ValueError):
+        return None
+
+
+async def _read_body(request: Request, max_bytes: int) -> Optional[bytes]:
+    """Corps de la requête, ou None dès qu'il dépasse max_bytes (sans tout lire)"""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return None
+    return bytes(body)
+
+
+def _handler() -> "AsyncMessageHandler":
+    """Gestionnaire asynchrone du registre (construit à la première utilisation)"""
+    return get_service('async_message_handler')
+
+
+def _twiml_response() -> Response:
+    """Réponse TwiML vide attendue par Twilio"""
+    return Response(EMPTY_TWIML, media_type='text/xml')
+
+
+async def _process_in_background(message_data: dict, trace: Optional[Trace] = None) -> None:
+    """Traite un message hors de la requête webhook"""
+    try:
+        with activate(trace):
+            await _handler().process_message(message_data)
+    except Exception as e:
+        logger.error(f"Erreur non gérée dans la tâche de traitement: {e}", exc_info=True)
+    finally:
+        if trace is not None:
+            get_profiler().record(trace)
+
+
+async def home(request: Request) -> JSONResponse:
+    """Route d'accueil"""
+    return JSONResponse({
+        "service": "WhatsApp Bot avec Twilio et Hugging Face",
+        "status": "running",
+        "version": "1.0",
+        "endpoints": {
+            "webhook": "/webhook (POST)",
+            "health": "/health (GET)",
+            "liveness": "/health/live (GET)",
+            "readiness": "/health/ready (GET)",
+            "stats": "/stats (GET)",
+            "metrics": "/metrics (GET)",
+            "usage": "/usage/<numéro> (GET, X-Admin-Token)",
+            "profiling": "/admin/profiling (GET/POST, X-Admin-Token)",
+            "test": "/test/send (POST)"
+        }
+    })
+
+
+async def health_check(request: Request) -> JSONResponse:
+    """
+    Endpoint de health check
+    Renvoie le dernier état connu des services (sondés en arrière-plan)
+    """
+    try:
+        health_status = _handler().check_health()
+
+        status_code = 200 if health_status["status"] in ["healthy", "degraded"] else 503
+
+        return JSONResponse(health_status, status_code=status_code)
+
+    except Exception as e:
+        logger.error(f"Erreur lors du health check: {e}", exc_info=True)
+        return JSONResponse({
+            "status": "error",
+            "message": str(e)
+        }, status_code=503)
+
+
+async def liveness(request: Request) -> JSONResponse:
+    """Endpoint de liveness: le processus répond, sans consulter les dépendances"""
+    return JSONResponse({"status": "alive"})
+
+
+async def readiness(request: Request) -> JSONResponse:
+    """Endpoint de readiness: les dépendances ont été sondées avec succès récemment"""
+    ready = _handler().is_ready()
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready"},
+        status_code=200 if ready else 503
+    )
+
+
+async def stats(request: Request) -> JSONResponse:
+    """
+    Endpoint de statistiques internes
+    Expose les tâches en cours, le pool HTTP, les caches et la mémoire de conversation
+    """
+    cache = get_response_cache()
+    near_cache = get_near_duplicate_cache()
+    dedup = get_webhook_deduplicator()
+    message_handler = _handler()
+    conversations = message_handler.conversations
+    return JSONResponse({
+        "tasks": {
+            "in_flight": len(_background_tasks),
+            "max_in_flight": _max_in_flight
+        },
+        "http": get_http_transport().get_stats(),
+        "cache": cache.get_stats() if cache else None,
+        "near_duplicate_cache": near_cache.get_stats() if near_cache else None,
+        "conversations": conversations.get_stats() if conversations else None,
+        "webhook_dedup": dedup.get_stats() if dedup else None,
+        "quotas": message_handler.quotas.get_stats() if message_handler.quotas else None,
+        "faq": message_handler.faq.get_stats() if message_handler.faq else None,
+        "outbound": message_handler.outbound.get_stats() if message_handler.outbound else None,
+        "media": message_handler.media.get_stats() if message_handler.media else None,
+        "backend": message_handler.huggingface_service.backend.describe(),
+        "prompts": get_prompt_registry().get_stats(),
+        "logging": get_log_handler().get_stats(),
+        "webhook_signature": (
+            message_handler.twilio_service.signature_validator.get_stats()
+            if message_handler.twilio_service.signature_validator else None
+        ),
+        "startup": registry.get_stats()
+    })
+
+
+async def metrics(request: Request) -> Response:
+    """
+    Endpoint Prometheus
+    Histogrammes et compteurs de chaque étape
+    """
+    try:
+        body, content_type = render_metrics()
+    except RuntimeError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    return Response(body, media_type=content_type)
+
+
+async def user_usage(request: Request) -> JSONResponse:
+    """
+    Endpoint de consommation d'un expéditeur
+    Messages et tokens générés sur la fenêtre glissante des quotas (jeton admin requis)
+    """
+    denied = _require_admin(request)
+    if denied is not None:
+        return denied
+
+    quotas = _handler().quotas
+    if quotas is None:
+        return JSONResponse({"error": "Quotas désactivés"}, status_code=404)
+
+    sender = request.path_params['sender']
+    if not sender.startswith('whatsapp:'):
+        sender = f'whatsapp:{sender}'
+
+    usage = quotas.get_usage(sender)
+    if usage is None:
+        return JSONResponse({"error": "Expéditeur inconnu", "sender": sender}, status_code=404)
+
+    return JSONResponse(usage)
+
+
+async def webhook(request: Request) -> Response:
+    """
+    Endpoint principal pour recevoir les messages de Twilio
+    """
+    # cProfile ne s'applique pas à la boucle d'événements: traçage par étapes seulement
+    trace = get_profiler().start_trace(
+        'webhook',
+        request.headers.get(PROFILE_HEADER),
+        check_admin_token(request.headers.get('X-Admin-Token'))
+    )
+    started = time.perf_counter()
+    try:
+        logger.info("Webhook reçu de Twilio")
+
+        twilio_service = _handler().twilio_service
+
+        # Refus sur les en-têtes seuls: le corps d'un webhook forgé n'est pas lu
+        rejection = twilio_service.precheck_webhook(request.headers, _content_length(request))
+        if rejection:
+            logger.info("Webhook rejeté: %s", rejection)
+            if rejection == "oversized":
+                return Response("Payload Too Large", status_code=413)
+            if rejection == "missing_signature":
+                return Response("Unauthorized", status_code=401)
+            return Response("Forbidden", status_code=403)
+
+        # Corps sans Content-Length (chunked): la lecture s'arrête dès le plafond dépassé
+        body = await _read_body(request, Config.WEBHOOK_MAX_BODY_BYTES)
+        if body is None:
+            logger.info("Webhook rejeté: %s", twilio_service.reject_oversized())
+            return Response("Payload Too Large", status_code=413)
+        form_request = _FormRequest(
+            request, body, FormData(parse_qsl(body.decode('utf-8', errors='replace'), keep_blank_values=True))
+        )
+
+        # Valider que la requête vient de Twilio (compte, champs, signature HMAC)
+        if not twilio_service.validate_webhook(form_request):
+            logger.info("Webhook rejeté: compte, champs ou signature invalides")
+            return Response("Forbidden", status_code=403)
+
+        # Retry Twilio d'un message déjà reçu: ne pas le retraiter
+        message_sid = form_request.form.get('MessageSid')
+        dedup = get_webhook_deduplicator()
+        if dedup and message_sid and not dedup.check_and_mark(message_sid):
+            logger.info("Webhook en double ignoré: %s", message_sid)
+            return _twiml_response()
+
+        # Parser le message
+        message_data = twilio_service.parse_incoming_message(form_request)
+        WEBHOOK_PARSE_SECONDS.observe(time.perf_counter() - started)
+
+        if not message_data:
+            logger.error("Impossible de parser le message")
+            if dedup and message_sid:
+                dedup.forget(message_sid)
+            return Response("Bad Request", status_code=400)
+
+        # Trop de conversations en cours: Twilio réessaiera plus tard
+        if len(_background_tasks) >= _max_in_flight:
+            logger.warning(f"Trop de tâches en cours ({_max_in_flight}), message rejeté")
+            if dedup and message_sid:
+                dedup.forget(message_sid)
+            return Response("Service Unavailable", status_code=503)
+
+        # La génération se fait dans une tâche: Twilio reçoit sa réponse tout de suite
+        if trace is not None:
+            trace.add_span('webhook', 0, started, time.perf_counter())
+        task = asyncio.create_task(_process_in_background(message_data, trace))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+        return _twiml_response()
+
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement du webhook: {e}", exc_info=True)
+        # Toujours renvoyer 200 pour éviter les retries de Twilio
+        return _twiml_response()
+
+
+async def test_send_message(request: Request) -> JSONResponse:
+    """
+    Endpoint de test pour envoyer un message manuellement
+
+    Body JSON:
+    {
+        "to": "+33612345678",
+        "message": "Votre message ici"
+    }
+    """
+    try:
+        data = await request.json()
+
+        if not data:
+            return JSONResponse({"error": "Body JSON requis"}, status_code=400)
+
+        to = data.get('to')
+        message = data.get('message')
+
+        if not to or not message:
+            return JSONResponse({
+                "error": "Paramètres 'to' et 'message' requis"
+            }, status_code=400)
+
+        message_sid = await _handler().twilio_service.send_message(to, message)
+
+        if message_sid:
+            return JSONResponse({
+                "success": True,
+                "message_sid": message_sid,
+                "to": to
+            })
+        return JSONResponse({
+            "success": False,
+            "error": "Échec de l'envoi du message"
+        }, status_code=500)
+
+    except Exception as e:
+        logger.error(f"Erreur lors de l'envoi du message de test: {e}")
+        return JSONResponse({
+            "success": False,
+            "error": str(e)
+        }, status_code=500)
+
+
+async def test_ai_response(request: Request) -> JSONResponse:
+    """
+    Endpoint de test pour tester la génération de réponse IA
+
+    Body JSON:
+    {
+        "prompt": "Votre question ici",
+        "user_name": "Test User" (optionnel)
+    }
+    """
+    try:
+        data = await request.json()
+
+        if not data:
+            return JSONResponse({"error": "Body JSON requis"}, status_code=400)
+
+        prompt = data.get('prompt')
+        user_name = data.get('user_name', 'Test User')
+
+        if not prompt:
+            return JSONResponse({"error": "Paramètre 'prompt' requis"}, status_code=400)
+
+        profiler = get_profiler()
+        trace = profiler.start_trace(
+            'test_ai',
+            request.headers.get(PROFILE_HEADER),
+            check_admin_token(request.headers.get('X-Admin-Token'))
+        )
+        with activate(trace):
+            response = await _handler().huggingface_service.generate_response(prompt, user_name)
+
+        result = {
+            "success": True,
+            "prompt": prompt,
+            "response": response
+        }
+        if trace is not None:
+            profiler.record(trace)
+            result["trace"] = trace.to_dict()
+        return JSONResponse(result)
+
+    except Exception as e:
+        logger.error(f"Erreur lors du test IA: {e}")
+        return JSONResponse({
+            "success": False,
+            "error": str(e)
+        }, status_code=500)
+
+
+def _require_admin(request: Request) -> Optional[JSONResponse]:
+    """Réponse d'erreur si le jeton admin est absent ou invalide, sinon None"""
+    if not Config.ADMIN_TOKEN:
+        return JSONResponse({"error": "Endpoints d'administration désactivés (ADMIN_TOKEN)"}, status_code=404)
+    if not check_admin_token(request.headers.get('X-Admin-Token')):
+        return JSONResponse({"error": "Jeton admin invalide"}, status_code=401)
+    return None
+
+
+async def _json_body(request: Request) -> dict:
+    """Corps JSON de la requête, ou dict vide s'il est absent ou invalide"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def admin_profiling(request: Request) -> JSONResponse:
+    """
+    État du profilage; POST pour tracer temporairement une fraction des requêtes
+
+    Body JSON (POST):
+    {
+        "sample_rate": 0.05,
+        "duration": 300 (secondes, optionnel)
+    }
+    """
+    denied = _require_admin(request)
+    if denied:
+        return denied
+
+    profiler = get_profiler()
+    if request.method == 'POST':
+        data = await _json_body(request)
+        try:
+            sample_rate = float(data.get('sample_rate', 0))
+            duration = min(float(data.get('duration', 300)), Config.PROFILING_MAX_WINDOW_SECONDS)
+        except (TypeError, ValueError):
+            return JSONResponse({"error": "sample_rate et duration doivent être des nombres"}, status_code=400)
+        profiler.set_sample_rate(sample_rate, duration)
+
+    return JSONResponse(profiler.get_stats())
+
+
+async def admin_profiling_traces(request: Request) -> JSONResponse:
+    """Dernières traces conservées (décomposition par étape)"""
+    denied = _require_admin(request)
+    if denied:
+        return denied
+
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except ValueError:
+        limit = 20
+    return JSONResponse({"traces": get_profiler().get_traces(limit)})
+
+
+async def admin_profiling_sampler(request: Request) -> Response:
+    """
+    POST: échantillonne les piles de tous les threads pendant une fenêtre
+    GET: télécharge le dernier profil (folded stacks pour flamegraph.pl / speedscope)
+
+    Body JSON (POST):
+    {
+        "duration": 30 (secondes, optionnel)
+    }
+    """
+    denied = _require_admin(request)
+    if denied:
+        return denied
+
+    sampler = get_profiler().sampler
+    if request.method == 'POST':
+        data = await _json_body(request)
+        try:
+            duration = min(float(data.get('duration', 30)), Config.PROFILING_MAX_WINDOW_SECONDS)
+        except (TypeError, ValueError):
+            return JSONResponse({"error": "duration doit être un nombre"}, status_code=400)
+        if not sampler.start(duration, Config.PROFILING_SAMPLE_INTERVAL_MS / 1000):
+            return JSONResponse({"error": "Échantillonnage déjà en cours"}, status_code=409)
+        return JSONResponse({"started": True, "duration": duration}, status_code=202)
+
+    if sampler.running or not sampler.last_output or not os.path.exists(sampler.last_output):
+        return JSONResponse({"error": "Aucun profil disponible", "running": sampler.running}, status_code=404)
+    return FileResponse(
+        sampler.last_output,
+        media_type='text/plain',
+        filename=os.path.basename(sampler.last_output)
+    )
+
+
+async def not_found(request: Request, exc: Exception) -> JSONResponse:
+    """Gestionnaire pour les routes non trouvées"""
+    return JSONResponse({
+        "error": "Route non trouvée",
+        "status": 404
+    }, status_code=404)
+
+
+async def internal_error(request: Request, exc: Exception) -> JSONResponse:
+    """Gestionnaire pour les erreurs internes"""
+    logger.error(f"Erreur interne: {exc}", exc_info=True)
+    return JSONResponse({
+        "error": "Erreur interne du serveur",
+        "status": 500
+    }, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """
+    Au démarrage: lance les sondes de santé
+    À l'arrêt: attend les tâches en cours puis ferme les clients asynchrones
+    """
+    _handler().health_monitor.start_async()
+    yield
+    if _background_tasks:
+        await asyncio.wait(list(_background_tasks), timeout=10)
+    await _handler().close()
+    logger.info("Application ASGI arrêtée")
+
+
+routes = [
+    Route('/', home),
+    Route('/health', health_check),
+    Route('/health/live', liveness),
+    Route('/health/ready', readiness),
+    Route('/stats', stats),
+    Route('/metrics', metrics),
+    Route('/usage/{sender:path}', user_usage),
+    Route('/webhook', webhook, methods=['POST']),
+    Route('/test/send', test_send_message, methods=['POST']),
+    Route('/test/ai', test_ai_response, methods=['POST']),
+    Route('/admin/profiling', admin_profiling, methods=['GET', 'POST']),
+    Route('/admin/profiling/traces', admin_profiling_traces),
+    Route('/admin/profiling/sampler', admin_profiling_sampler, methods=['GET', 'POST']),
+]
+
+app = Starlette(
+    debug=Config.DEBUG,
+    routes=routes,
+    exception_handlers={404: not_found, 500: internal_error},
+    lifespan=lifespan
+)
+
+logger.info("Application ASGI WhatsApp Bot initialisée avec succès")
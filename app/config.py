@@ -23,11 +23,31 @@ class Config:
     TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+12525818652')
+    # API REST Twilio (vide = https://api.twilio.com; remplacé par un faux serveur en benchmark)
+    TWILIO_API_BASE = os.getenv('TWILIO_API_BASE', '')
     
     # Configuration Hugging Face
     HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY')
     HUGGINGFACE_MODEL = os.getenv('HUGGINGFACE_MODEL', '="HuggingFaceH4/zephyr-7b-beta:featherless-ai"')
-    HUGGINGFACE_API_URL = f"https://api-inference.huggingface.co/models/{HUGGINGFACE_MODEL}"
+    HUGGINGFACE_API_BASE = os.getenv('HUGGINGFACE_API_BASE', 'https://api-inference.huggingface.co/models')
+    HUGGINGFACE_API_URL = f"{HUGGINGFACE_API_BASE}/{HUGGINGFACE_MODEL}"
+    
+    # Moteur d'inférence: huggingface, openai (serveur compatible), local (CPU) ou stub
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'huggingface')
+    INFERENCE_MODEL = os.getenv('INFERENCE_MODEL', '')
+    OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'http://localhost:8080/v1')
+    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+    LOCAL_MODEL_THREADS = int(os.getenv('LOCAL_MODEL_THREADS', 0))
+    STUB_LATENCY_MS = int(os.getenv('STUB_LATENCY_MS', 0))
+    
+    # Requêtes couvertes: moteurs secondaires (moteur[:modèle][@url], séparés par des virgules)
+    HEDGE_ENDPOINTS = os.getenv('HEDGE_ENDPOINTS', '')
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 0.95))
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+    HEDGE_INITIAL_DELAY_MS = int(os.getenv('HEDGE_INITIAL_DELAY_MS', 3000))
+    HEDGE_MIN_DELAY_MS = int(os.getenv('HEDGE_MIN_DELAY_MS', 200))
+    HEDGE_MAX_RATIO = float(os.getenv('HEDGE_MAX_RATIO', 0.1))
+    HEDGE_MAX_CONCURRENCY = int(os.getenv('HEDGE_MAX_CONCURRENCY', 16))
     
     # Paramètres de génération pour Hugging Face
     HF_MAX_NEW_TOKENS = int(os.getenv('HF_MAX_NEW_TOKENS', 500))
@@ -35,9 +55,148 @@ class Config:
     HF_TOP_P = float(os.getenv('HF_TOP_P', 0.95))
     HF_REPETITION_PENALTY = float(os.getenv('HF_REPETITION_PENALTY', 1.1))
     
+    # Transport HTTP partagé (pool de connexions keep-alive)
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+    HTTP_KEEP_ALIVE = os.getenv('HTTP_KEEP_ALIVE', 'True').lower() == 'true'
+    HTTP_HTTP2 = os.getenv('HTTP_HTTP2', 'False').lower() == 'true'
+    
+    # Résilience: backoff des retries et disjoncteur
+    HF_RETRY_BASE_DELAY = float(os.getenv('HF_RETRY_BASE_DELAY', 0.5))
+    HF_RETRY_MAX_DELAY = float(os.getenv('HF_RETRY_MAX_DELAY', 30))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RECOVERY_TIMEOUT = float(os.getenv('CIRCUIT_RECOVERY_TIMEOUT', 30))
+    CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv('CIRCUIT_HALF_OPEN_MAX_CALLS', 1))
+    
+    # Génération en flux (envoi de la première phrase au plus tôt)
+    HF_STREAMING_ENABLED = os.getenv('HF_STREAMING_ENABLED', 'False').lower() == 'true'
+    STREAM_FOLLOWUP_MIN_CHARS = int(os.getenv('STREAM_FOLLOWUP_MIN_CHARS', 300))
+    
+    # Micro-batching des appels d'inférence
+    HF_BATCHING_ENABLED = os.getenv('HF_BATCHING_ENABLED', 'False').lower() == 'true'
+    HF_BATCH_MAX_SIZE = int(os.getenv('HF_BATCH_MAX_SIZE', 8))
+    HF_BATCH_MAX_WAIT_MS = float(os.getenv('HF_BATCH_MAX_WAIT_MS', 50))
+    HF_BATCH_MAX_CONCURRENCY = int(os.getenv('HF_BATCH_MAX_CONCURRENCY', 4))
+    
+    # Coalescence des générations identiques simultanées
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+    SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 120))
+    
+    # Cache des réponses générées
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1000))
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 3600))
+    CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', '')
+    
+    # Cache approximatif (MinHash/LSH sur n-grammes de caractères)
+    # Désactivé par défaut: deux questions presque identiques peuvent appeler
+    # des réponses différentes (« produit A » / « produit B »)
+    NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', 'False').lower() == 'true'
+    NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', 0.9))
+    NEAR_DUP_NGRAM_SIZE = int(os.getenv('NEAR_DUP_NGRAM_SIZE', 3))
+    NEAR_DUP_NUM_PERM = int(os.getenv('NEAR_DUP_NUM_PERM', 64))
+    NEAR_DUP_BANDS = int(os.getenv('NEAR_DUP_BANDS', 16))
+    NEAR_DUP_MAX_MEMORY_MB = float(os.getenv('NEAR_DUP_MAX_MEMORY_MB', 64))
+    
+    # Mémoire des conversations
+    CONVERSATION_MEMORY_ENABLED = os.getenv('CONVERSATION_MEMORY_ENABLED', 'True').lower() == 'true'
+    CONVERSATION_MAX_TURNS = int(os.getenv('CONVERSATION_MAX_TURNS', 4))
+    CONVERSATION_MAX_USERS = int(os.getenv('CONVERSATION_MAX_USERS', 100000))
+    CONVERSATION_IDLE_TTL = int(os.getenv('CONVERSATION_IDLE_TTL', 3600))
+    CONVERSATION_MAX_CHARS = int(os.getenv('CONVERSATION_MAX_CHARS', 500))
+    PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1024))
+    PROMPT_TOKENIZER_PATH = os.getenv('PROMPT_TOKENIZER_PATH', '')
+    
+    # Réponses rapides depuis une FAQ (sans appel au modèle)
+    FAQ_ENABLED = os.getenv('FAQ_ENABLED', 'True').lower() == 'true'
+    FAQ_PATH = os.getenv('FAQ_PATH', 'data/faq.json')
+    FAQ_RELOAD_INTERVAL = float(os.getenv('FAQ_RELOAD_INTERVAL', 5))
+    
+    # Sondes de santé en arrière-plan (intervalles en secondes)
+    HEALTH_TWILIO_INTERVAL = int(os.getenv('HEALTH_TWILIO_INTERVAL', 60))
+    HEALTH_HF_INTERVAL = int(os.getenv('HEALTH_HF_INTERVAL', 30))
+    
+    # Déduplication des webhooks Twilio (retries d'un même MessageSid)
+    WEBHOOK_DEDUP_ENABLED = os.getenv('WEBHOOK_DEDUP_ENABLED', 'True').lower() == 'true'
+    WEBHOOK_DEDUP_TTL = int(os.getenv('WEBHOOK_DEDUP_TTL', 3600))
+    WEBHOOK_DEDUP_MAX_ENTRIES = int(os.getenv('WEBHOOK_DEDUP_MAX_ENTRIES', 100000))
+    WEBHOOK_DEDUP_SQLITE_PATH = os.getenv('WEBHOOK_DEDUP_SQLITE_PATH', '')
+    
+    # Signature X-Twilio-Signature des webhooks
+    WEBHOOK_SIGNATURE_VALIDATION = os.getenv('WEBHOOK_SIGNATURE_VALIDATION', 'True').lower() == 'true'
+    # URL publique configurée dans la console Twilio (derrière un proxy ou un tunnel)
+    WEBHOOK_PUBLIC_URL = os.getenv('WEBHOOK_PUBLIC_URL', '')
+    # Sans URL publique: reconstruire l'URL depuis X-Forwarded-Proto/X-Forwarded-Host
+    # (à n'activer que si un proxy de confiance écrase ces en-têtes)
+    WEBHOOK_TRUSTED_PROXY = os.getenv('WEBHOOK_TRUSTED_PROXY', 'False').lower() == 'true'
+    WEBHOOK_MAX_BODY_BYTES = int(os.getenv('WEBHOOK_MAX_BODY_BYTES', 64 * 1024))
+    # Limite Flask appliquée pendant la lecture, y compris sans Content-Length (chunked):
+    # un octet de plus que le plafond suffit à détecter le dépassement sans tout lire
+    MAX_CONTENT_LENGTH = WEBHOOK_MAX_BODY_BYTES + 1
+    
+    # File d'envoi sortante (limitation de débit par numéro expéditeur)
+    OUTBOUND_QUEUE_ENABLED = os.getenv('OUTBOUND_QUEUE_ENABLED', 'True').lower() == 'true'
+    OUTBOUND_RATE_PER_SECOND = float(os.getenv('OUTBOUND_RATE_PER_SECOND', 10))
+    OUTBOUND_BURST = int(os.getenv('OUTBOUND_BURST', 20))
+    OUTBOUND_SEND_CONCURRENCY = int(os.getenv('OUTBOUND_SEND_CONCURRENCY', 4))
+    OUTBOUND_QUEUE_MAXSIZE = int(os.getenv('OUTBOUND_QUEUE_MAXSIZE', 5000))
+    OUTBOUND_MAX_ATTEMPTS = int(os.getenv('OUTBOUND_MAX_ATTEMPTS', 5))
+    OUTBOUND_IDEMPOTENCY_SIZE = int(os.getenv('OUTBOUND_IDEMPOTENCY_SIZE', 10000))
+    
+    # Médias entrants: téléchargement en flux sur disque, dédupliqué par SHA-256
+    MEDIA_ENABLED = os.getenv('MEDIA_ENABLED', 'True').lower() == 'true'
+    MEDIA_DIR = os.getenv('MEDIA_DIR', 'media')
+    MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', 16 * 1024 * 1024))
+    # Préfixes de types MIME acceptés, séparés par des virgules
+    MEDIA_ALLOWED_TYPES = os.getenv(
+        'MEDIA_ALLOWED_TYPES',
+        'image/,audio/,video/,application/pdf,text/plain'
+    )
+    MEDIA_DOWNLOAD_CONCURRENCY = int(os.getenv('MEDIA_DOWNLOAD_CONCURRENCY', 4))
+    MEDIA_QUEUE_MAXSIZE = int(os.getenv('MEDIA_QUEUE_MAXSIZE', 100))
+    MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', 64 * 1024))
+    MEDIA_DOWNLOAD_TIMEOUT = float(os.getenv('MEDIA_DOWNLOAD_TIMEOUT', 30))
+    MEDIA_DOWNLOAD_DEADLINE = float(os.getenv('MEDIA_DOWNLOAD_DEADLINE', 120))
+    MEDIA_INDEX_SIZE = int(os.getenv('MEDIA_INDEX_SIZE', 10000))
+    
+    # Pool de workers pour le traitement asynchrone des messages
+    WORKER_POOL_SIZE = int(os.getenv('WORKER_POOL_SIZE', 4))
+    WORKER_QUEUE_MAXSIZE = int(os.getenv('WORKER_QUEUE_MAXSIZE', 1000))
+    WORKER_MAX_PENDING_PER_SENDER = int(os.getenv('WORKER_MAX_PENDING_PER_SENDER', 20))
+    
+    # Quotas par expéditeur (fenêtre glissante, 0 = illimité)
+    QUOTA_ENABLED = os.getenv('QUOTA_ENABLED', 'True').lower() == 'true'
+    QUOTA_WINDOW_SECONDS = int(os.getenv('QUOTA_WINDOW_SECONDS', 3600))
+    QUOTA_MAX_MESSAGES = int(os.getenv('QUOTA_MAX_MESSAGES', 60))
+    QUOTA_MAX_TOKENS = int(os.getenv('QUOTA_MAX_TOKENS', 30000))
+    QUOTA_MAX_USERS = int(os.getenv('QUOTA_MAX_USERS', 100000))
+    # Sans fichier partagé, chaque worker gunicorn compte de son côté
+    QUOTA_SQLITE_PATH = os.getenv('QUOTA_SQLITE_PATH', '')
+    
+    # Métriques Prometheus (/metrics)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+    # Profilage à la demande (0 = seulement sur en-tête X-Profile ou via /admin/profiling)
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.0))
+    PROFILING_MAX_TRACES = int(os.getenv('PROFILING_MAX_TRACES', 100))
+    PROFILING_DIR = os.getenv('PROFILING_DIR', 'logs/profiles')
+    PROFILING_SAMPLE_INTERVAL_MS = int(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', 10))
+    PROFILING_MAX_WINDOW_SECONDS = int(os.getenv('PROFILING_MAX_WINDOW_SECONDS', 300))
+
+    # Jeton des endpoints /admin (en-tête X-Admin-Token, vide = désactivés)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
     # Configuration des logs
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'logs/whatsapp_bot.log')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text ou json
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    # Lignes INFO par seconde et par gabarit de message (0 = illimité)
+    LOG_RATE_LIMIT_PER_SECOND = float(os.getenv('LOG_RATE_LIMIT_PER_SECOND', 50))
     
     @staticmethod
     def validate():
@@ -4,5 +4,9 @@ Contient les gestionnaires de messages
 """
 
 from app.handlers.message_handler import MessageHandler
+from app.handlers.worker_pool import MessageWorkerPool
 
-__all__ = ['MessageHandler']
\ No newline at end of file
+__all__ = ['MessageHandler', 'MessageWorkerPool']
+
+# Les variantes asynchrones s'importent depuis leur module
+# (app.handlers.async_message_handler) pour ne pas exiger httpx/aiohttp en mode Flask
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Gestionnaire asynchrone des messages entrants
+Même logique métier que MessageHandler, sur les services asynchrones
+"""
+
+import asyncio
+from typing import Optional, Dict, Any
+from app.config import Config
+from app.handlers.message_handler import MessageHandler, MEDIA_BUSY_RESPONSE
+from app.services.async_twilio_services import AsyncTwilioService
+from app.services.async_huggingface_services import AsyncHuggingFaceService
+from app.services.outbound_dispatcher import get_outbound_dispatcher
+from app.utils.logger import setup_logger
+from app.utils.prometheus import MESSAGES
+from app.utils.profiling import span, traced
+
+logger = setup_logger(__name__)
+
+
+class AsyncMessageHandler(MessageHandler):
+    """Gestionnaire de messages dont le traitement est une coroutine"""
+
+    def __init__(self):
+        """Initialise les services asynchrones"""
+        super().__init__(AsyncTwilioService(), AsyncHuggingFaceService())
+        # Les réponses passent par la file partagée du processus
+        self.outbound = get_outbound_dispatcher()
+
+    @traced('process_message')
+    async def process_message(self, message_data: Dict[str, Any]) -> bool:
+        """
+        Traite un message entrant et envoie une réponse
+
+        Args:
+            message_data: Données du message parsées par Twilio
+
+        Returns:
+            True si le traitement a réussi, False sinon
+        """
+        if not message_data:
+            logger.warning("Message data vide")
+            return False
+
+        sender = message_data.get('from')
+        if not sender or not isinstance(sender, str):
+            logger.error(f"Sender invalide dans message_data: {sender!r}")
+            return False
+        body = message_data.get('body', '').strip()
+        profile_name = message_data.get('profile_name', 'User')
+        num_media = message_data.get('num_media', 0)
+        reply_key = message_data.get('message_sid') or None
+        MESSAGES.labels(self._message_type(body, num_media)).inc()
+
+        try:
+            if num_media > 0:
+                response = await self._handle_media_message_async(message_data)
+            elif body:
+                response = await self._handle_text_message(body, profile_name, sender)
+            else:
+                response = "Désolé, je n'ai pas reçu de contenu. Envoyez-moi un message ! 💬"
+
+            if response:
+                with span('send_message'):
+                    success = await self._send_reply_async(sender, response, reply_key)
+                if success:
+                    logger.info("Réponse envoyée avec succès à %s", sender)
+                    return True
+                logger.error(f"Échec de l'envoi de la réponse à {sender}")
+                return False
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement du message: {e}", exc_info=True)
+
+            try:
+                error_message = (
+                    "Désolé, une erreur s'est produite lors du traitement "
+                    "de votre message. Veuillez réessayer. 🙏"
+                )
+                await self._send_reply_async(
+                    sender, error_message, f"{reply_key}:error" if reply_key else None
+                )
+            except Exception:
+                pass
+
+            return False
+
+    async def _send_reply_async(
+        self,
+        to: str,
+        body: str,
+        idempotency_key: Optional[str] = None
+    ) -> bool:
+        """
+        Envoie une réponse, via la file d'envoi partagée si elle est activée
+
+        La file applique le débit par numéro expéditeur, les retries 429/5xx
+        et l'idempotence; la coroutine ne fait qu'y déposer le message.
+
+        Args:
+            to: Numéro du destinataire
+            body: Contenu du message
+            idempotency_key: Clé stable évitant un double envoi
+
+        Returns:
+            True si le message a été envoyé ou accepté dans la file
+        """
+        if self.outbound is not None:
+            return self.outbound.send_message(to, body, idempotency_key=idempotency_key)
+        return bool(await self.twilio_service.send_message(to, body))
+
+    async def _handle_text_message(
+        self,
+        text: str,
+        user_name: str,
+        sender: Optional[str] = None
+    ) -> str:
+        """
+        Traite un message texte et génère une réponse
+
+        Args:
+            text: Contenu du message
+            user_name: Nom de l'utilisateur
+            sender: Numéro de l'expéditeur (clé de la conversation)
+
+        Returns:
+            Réponse à envoyer
+        """
+        logger.info("Traitement message texte: %.100s...", text)
+
+        fast_response = self._fast_answer(text, sender)
+        if fast_response is not None:
+            return fast_response
+
+        quota_response = self._check_quota(sender)
+        if quota_response is not None:
+            return quota_response
+
+        use_memory = self.conversations is not None and bool(sender)
+        history = self.conversations.get_history(sender) if use_memory else None
+
+        response = await self.huggingface_service.generate_response(
+            text,
+            user_name,
+            history=history
+        )
+        self._record_usage(sender, response)
+
+        if use_memory and response != self.huggingface_service._get_fallback_response():
+            self.conversations.add_exchange(sender, text, response)
+
+        return response
+
+    async def _handle_media_message_async(self, message_data: Dict[str, Any]) -> str:
+        """
+        Traite un message contenant des médias
+
+        Les téléchargements tournent dans le pool d'E/S du pipeline médias;
+        la coroutine attend leur fin sans bloquer la boucle d'événements.
+
+        Args:
+            message_data: Données du message avec médias
+
+        Returns:
+            Réponse à envoyer
+        """
+        if self.media is None:
+            return self._handle_media_message(message_data)
+
+        media_list = message_data.get('media', [])
+        logger.info("Message avec %d média(s) reçu", message_data.get('num_media', 0))
+
+        future = self.media.submit(media_list)
+        if future is None:
+            return MEDIA_BUSY_RESPONSE
+        return self._media_reply(await asyncio.wrap_future(future))
+
+    async def _probe_twilio_async(self) -> Dict[str, Any]:
+        """Sonde Twilio exécutée par le moniteur de santé"""
+        twilio_info = await self.twilio_service.get_account_info()
+        return {
+            "status": "ok" if twilio_info else "error",
+            "info": twilio_info
+        }
+
+    def _register_health_probes(self) -> None:
+        """Déclare les dépendances sondées par des tâches asyncio"""
+        self.health_monitor.register(
+            "twilio", self._probe_twilio_async, Config.HEALTH_TWILIO_INTERVAL
+        )
+        self.health_monitor.register(
+            "huggingface",
+            self.huggingface_service.check_model_status,
+            Config.HEALTH_HF_INTERVAL,
+            is_healthy=lambda result: bool(result.get("available"))
+        )
+
+    async def close(self) -> None:
+        """Arrête les sondes et ferme les clients HTTP asynchrones"""
+        self.health_monitor.stop()
+        await self.huggingface_service.close()
+        await self.twilio_service.close()
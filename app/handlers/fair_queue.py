@@ -0,0 +1,96 @@
+"""
+File d'attente équitable entre expéditeurs
+Une file FIFO par expéditeur, servies à tour de rôle (round-robin)
+"""
+
+import queue
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Optional
+
+
+class FairQueue:
+    """
+    File bornée dont les éléments sont servis expéditeur par expéditeur
+
+    Même interface que queue.Queue pour put_nowait/get/qsize, avec une clé
+    d'équité: un expéditeur très actif n'attend que derrière ses propres messages
+    """
+
+    def __init__(self, maxsize: int, max_per_key: int = 0):
+        """
+        Initialise la file
+
+        Args:
+            maxsize: Nombre maximal d'éléments en attente (toutes clés confondues)
+            max_per_key: Nombre maximal d'éléments en attente par clé (0 = sans limite)
+        """
+        self.maxsize = maxsize
+        self.max_per_key = max_per_key
+        self._queues: Dict[Hashable, Deque[Any]] = {}
+        # Clés ayant au moins un élément, dans l'ordre de service
+        self._rotation: Deque[Hashable] = deque()
+        self._size = 0
+        self._closed = False
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def put_nowait(self, key: Hashable, item: Any) -> None:
+        """
+        Ajoute un élément pour une clé
+
+        Raises:
+            queue.Full: Si la file ou la part de cette clé est pleine
+        """
+        with self._not_empty:
+            if self._size >= self.maxsize:
+                raise queue.Full
+            key_queue = self._queues.get(key)
+            if key_queue is None:
+                key_queue = self._queues[key] = deque()
+                self._rotation.append(key)
+            elif self.max_per_key and len(key_queue) >= self.max_per_key:
+                raise queue.Full
+            key_queue.append(item)
+            self._size += 1
+            self._not_empty.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Retire le prochain élément de la clé dont c'est le tour
+
+        Returns:
+            L'élément, ou None si la file est fermée et vide
+
+        Raises:
+            queue.Empty: Si aucun élément n'arrive avant `timeout`
+        """
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._size > 0 or self._closed, timeout):
+                raise queue.Empty
+            if self._size == 0:
+                return None
+            key = self._rotation.popleft()
+            key_queue = self._queues[key]
+            item = key_queue.popleft()
+            if key_queue:
+                self._rotation.append(key)
+            else:
+                del self._queues[key]
+            self._size -= 1
+            return item
+
+    def close(self) -> None:
+        """Réveille les consommateurs: get() renvoie None une fois la file vidée"""
+        with self._not_empty:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def qsize(self) -> int:
+        """Nombre d'éléments en attente"""
+        with self._not_empty:
+            return self._size
+
+    def active_keys(self) -> int:
+        """Nombre de clés ayant des éléments en attente"""
+        with self._not_empty:
+            return len(self._queues)
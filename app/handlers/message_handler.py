@@ -2,31 +2,88 @@
 Gestionnaire principal pour traiter les messages entrants
 """
 
-from typing import Optional, Dict, Any
-from app.services import TwilioService, HuggingFaceService
+from typing import Optional, Dict, Any, Callable, List, Tuple, TYPE_CHECKING
+from app.config import Config
+from app.registry import get_service
+from app.services.conversation_store import get_conversation_store, estimate_tokens
+from app.services.outbound_dispatcher import OutboundDispatcher, get_outbound_dispatcher
+from app.services.quota import get_quota_manager
+from app.services.faq_engine import get_faq_engine
+from app.services.health_monitor import HealthMonitor
+from app.services.media_pipeline import get_media_pipeline
+from app.services.resilience import RetryLater
 from app.utils.logger import setup_logger
+from app.utils.prometheus import MESSAGES
+from app.utils.profiling import traced
+
+if TYPE_CHECKING:
+    from app.services import TwilioService, HuggingFaceService
 
 logger = setup_logger(__name__)
 
+MEDIA_BUSY_RESPONSE = (
+    "⏳ Beaucoup de fichiers sont en cours de traitement. "
+    "Merci de renvoyer votre média dans un moment."
+)
+
+# Préfixe de type MIME -> (nom affiché, démonstratif accordé)
+MEDIA_KINDS = (
+    ('image/', "image", "cette"),
+    ('audio/', "audio", "cet"),
+    ('video/', "vidéo", "cette"),
+)
+
 
 class MessageHandler:
     """Classe pour gérer le traitement des messages"""
     
-    def __init__(self):
-        """Initialise les services nécessaires"""
-        self.twilio_service = TwilioService()
-        self.huggingface_service = HuggingFaceService()
-        logger.info("MessageHandler initialisé")
+    def __init__(
+        self,
+        twilio_service: Optional["TwilioService"] = None,
+        huggingface_service: Optional["HuggingFaceService"] = None
+    ):
+        """
+        Initialise les services nécessaires
+        
+        Args:
+            twilio_service: Service Twilio (par défaut: celui du registre)
+            huggingface_service: Service Hugging Face (par défaut: celui du registre)
+        """
+        self.twilio_service = twilio_service or get_service('twilio_service')
+        self.huggingface_service = huggingface_service or get_service('huggingface_service')
+        self.conversations = get_conversation_store()
+        self.quotas = get_quota_manager()
+        self.faq = get_faq_engine()
+        self.media = get_media_pipeline()
+        self.fast_answer_stages = self._build_fast_answer_stages()
+        # File partagée du processus, sauf pour un service Twilio fourni explicitement
+        if twilio_service is None:
+            self.outbound = get_outbound_dispatcher()
+        else:
+            self.outbound = OutboundDispatcher(twilio_service) if Config.OUTBOUND_QUEUE_ENABLED else None
+        self.health_monitor = HealthMonitor()
+        self._register_health_probes()
+        logger.info("%s initialisé", type(self).__name__)
     
-    def process_message(self, message_data: Dict[str, Any]) -> bool:
+    @traced('process_message')
+    def process_message(
+        self,
+        message_data: Dict[str, Any],
+        defer_retries: bool = False
+    ) -> bool:
         """
         Traite un message entrant et envoie une réponse
         
         Args:
             message_data: Données du message parsées par Twilio
+            defer_retries: Lever RetryLater au lieu d'attendre entre deux
+                tentatives de génération (traitement par le pool de workers)
             
         Returns:
             True si le traitement a réussi, False sinon
+            
+        Raises:
+            RetryLater: Si la génération doit être retentée plus tard
         """
         if not message_data:
             logger.warning("Message data vide")
@@ -39,6 +96,12 @@ class MessageHandler:
         body = message_data.get('body', '').strip()
         profile_name = message_data.get('profile_name', 'User')
         num_media = message_data.get('num_media', 0)
+        attempt = message_data.get('retry_attempt', 0)
+        # Clé d'idempotence des réponses: un retraitement ne renvoie pas deux fois
+        reply_key = message_data.get('message_sid') or None
+        
+        if attempt == 0:
+            MESSAGES.labels(self._message_type(body, num_media)).inc()
         
         try:
             # Gérer les différents types de messages
@@ -47,16 +110,18 @@ class MessageHandler:
                 response = self._handle_media_message(message_data)
             elif body:
                 # Message texte
-                response = self._handle_text_message(body, profile_name)
+                response = self._handle_text_message(
+                    body, profile_name, sender, attempt, defer_retries, reply_key
+                )
             else:
                 # Message vide
                 response = "Désolé, je n'ai pas reçu de contenu. Envoyez-moi un message ! 💬"
             
             # Envoyer la réponse
             if response:
-                success = self.twilio_service.send_message(sender, response)
+                success = self._send_reply(sender, response, reply_key)
                 if success:
-                    logger.info(f"Réponse envoyée avec succès à {sender}")
+                    logger.info("Réponse envoyée avec succès à %s", sender)
                     return True
                 else:
                     logger.error(f"Échec de l'envoi de la réponse à {sender}")
@@ -64,6 +129,10 @@ class MessageHandler:
             
             return True
             
+        except RetryLater:
+            # Le pool de workers replanifie le message sans bloquer de thread
+            raise
+            
         except Exception as e:
             logger.error(f"Erreur lors du traitement du message: {e}", exc_info=True)
             
@@ -73,26 +142,117 @@ class MessageHandler:
                     "Désolé, une erreur s'est produite lors du traitement "
                     "de votre message. Veuillez réessayer. 🙏"
                 )
-                self.twilio_service.send_message(sender, error_message)
+                self._send_reply(sender, error_message, f"{reply_key}:error" if reply_key else None)
             except:
                 pass
             
             return False
     
-    def _handle_text_message(self, text: str, user_name: str) -> str:
+    def _handle_text_message(
+        self,
+        text: str,
+        user_name: str,
+        sender: Optional[str] = None,
+        attempt: int = 0,
+        defer_retries: bool = False,
+        reply_key: Optional[str] = None
+    ) -> Optional[str]:
         """
         Traite un message texte et génère une réponse
         
         Args:
             text: Contenu du message
             user_name: Nom de l'utilisateur
+            sender: Numéro de l'expéditeur (clé de la conversation)
+            attempt: Numéro de la tentative de génération
+            defer_retries: Replanifier les retries au lieu d'attendre
+            reply_key: Clé d'idempotence de la réponse (SID du message entrant)
             
         Returns:
-            Réponse à envoyer
+            Réponse à envoyer, ou None si elle a déjà été envoyée en flux
+        """
+        logger.info("Traitement message texte: %.100s...", text)
+        
+        # Réponses immédiates (commandes, FAQ): pas d'appel au modèle
+        fast_response = self._fast_answer(text, sender)
+        if fast_response is not None:
+            return fast_response
+        
+        # Générer une réponse avec Hugging Face, avec le contexte de la conversation
+        # Quota dépassé: réponse fixe, sans appel au modèle
+        if attempt == 0:
+            quota_response = self._check_quota(sender)
+            if quota_response is not None:
+                return quota_response
+        
+        use_memory = self.conversations is not None and bool(sender)
+        history = self.conversations.get_history(sender) if use_memory else None
+        
+        if Config.HF_STREAMING_ENABLED and sender and attempt == 0:
+            streamed = self._stream_text_reply(text, user_name, sender, history, reply_key)
+            if streamed is not None:
+                self._record_usage(sender, streamed)
+                if use_memory:
+                    self.conversations.add_exchange(sender, text, streamed)
+                return None
+            # Flux impossible avant tout envoi: repli sur la génération complète
+        
+        response = self.huggingface_service.generate_response(
+            text,
+            user_name,
+            history=history,
+            attempt=attempt,
+            defer_retries=defer_retries
+        )
+        self._record_usage(sender, response)
+        
+        if use_memory and response != self.huggingface_service._get_fallback_response():
+            self.conversations.add_exchange(sender, text, response)
+        
+        return response
+    
+    def _build_fast_answer_stages(self) -> List[Callable[[str, Optional[str]], Optional[str]]]:
+        """
+        Construit la liste des étapes de réponse rapide, essayées dans l'ordre
+        
+        Chaque étape reçoit (texte, expéditeur) et renvoie une réponse ou None
+        
+        Returns:
+            Étapes à consulter avant l'appel au modèle
+        """
+        stages = [self._handle_command]
+        if self.faq is not None:
+            stages.append(self.faq.answer)
+        return stages
+    
+    def _fast_answer(self, text: str, sender: Optional[str] = None) -> Optional[str]:
+        """
+        Cherche une réponse immédiate parmi les étapes rapides
+        
+        Args:
+            text: Contenu du message
+            sender: Numéro de l'expéditeur
+            
+        Returns:
+            Première réponse trouvée, ou None pour interroger le modèle
         """
-        logger.info(f"Traitement message texte: {text[:100]}...")
+        for stage in self.fast_answer_stages:
+            response = stage(text, sender)
+            if response is not None:
+                return response
+        return None
+    
+    def _handle_command(self, text: str, sender: Optional[str] = None) -> Optional[str]:
+        """
+        Traite les commandes spéciales
         
-        # Commandes spéciales
+        Args:
+            text: Contenu du message
+            sender: Numéro de l'expéditeur
+            
+        Returns:
+            Réponse à la commande, ou None si le message n'est pas une commande
+        """
         text_lower = text.lower().strip()
         
         if text_lower in ['/start', '/aide', '/help']:
@@ -104,39 +264,185 @@ class MessageHandler:
         elif text_lower == '/ping':
             return "🏓 Pong! Le bot est actif."
         
-        # Générer une réponse avec Hugging Face
-        response = self.huggingface_service.generate_response(text, user_name)
+        elif text_lower == '/reset':
+            if self.conversations is not None and sender:
+                self.conversations.clear(sender)
+            return "🧹 Conversation réinitialisée. De quoi voulez-vous parler ?"
         
-        return response
+        return None
+    
+    def _check_quota(self, sender: Optional[str]) -> Optional[str]:
+        """
+        Vérifie le quota de l'expéditeur et compte le message
+        
+        Args:
+            sender: Numéro de l'expéditeur
+            
+        Returns:
+            Réponse fixe si le quota est dépassé, None sinon
+        """
+        if self.quotas is None or not sender or self.quotas.allow_message(sender):
+            return None
+        
+        logger.info("Quota dépassé pour %s, réponse fixe envoyée", sender)
+        minutes = max(1, self.quotas.window // 60)
+        return (
+            "⏳ Vous avez envoyé beaucoup de messages récemment. "
+            f"Merci de réessayer dans un moment (limite sur {minutes} min)."
+        )
+    
+    def _record_usage(self, sender: Optional[str], response: str) -> None:
+        """Comptabilise les tokens générés pour l'expéditeur"""
+        if self.quotas is None or not sender:
+            return
+        if response != self.huggingface_service._get_fallback_response():
+            self.quotas.record_tokens(sender, estimate_tokens(response))
+    
+    def _stream_text_reply(
+        self,
+        text: str,
+        user_name: str,
+        sender: str,
+        history: Optional[list],
+        reply_key: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Génère la réponse en flux et envoie chaque partie dès qu'elle est prête
+        
+        Args:
+            text: Contenu du message
+            user_name: Nom de l'utilisateur
+            sender: Numéro du destinataire de la réponse
+            history: Échanges précédents de la conversation
+            reply_key: Clé d'idempotence de la réponse (suffixée par partie)
+            
+        Returns:
+            Texte envoyé, ou None si rien n'a pu être envoyé
+        """
+        sent_parts = []
+        
+        try:
+            for chunk in self.huggingface_service.stream_response(text, user_name, history):
+                chunk_key = f"{reply_key}:{len(sent_parts)}" if reply_key else None
+                if not self._send_reply(sender, chunk, chunk_key):
+                    logger.error(f"Échec de l'envoi d'une partie de la réponse à {sender}")
+                    break
+                sent_parts.append(chunk)
+        except Exception as e:
+            logger.error(f"Erreur pendant la génération en flux: {e}")
+        
+        if not sent_parts:
+            return None
+        
+        logger.info("Réponse envoyée en %d partie(s) à %s", len(sent_parts), sender)
+        return "\n\n".join(sent_parts)
+    
+    @traced('send_message')
+    def _send_reply(self, to: str, body: str, idempotency_key: Optional[str] = None) -> bool:
+        """
+        Envoie une réponse, via la file d'envoi si elle est activée
+        
+        Args:
+            to: Numéro du destinataire
+            body: Contenu du message
+            idempotency_key: Clé stable évitant un double envoi
+            
+        Returns:
+            True si le message a été envoyé ou accepté dans la file
+        """
+        if self.outbound is not None:
+            return self.outbound.send_message(to, body, idempotency_key=idempotency_key)
+        return bool(self.twilio_service.send_message(to, body))
     
-    def _handle_media_message(self, message_data: Dict[str, Any]) -> str:
+    @staticmethod
+    def _message_type(body: str, num_media: int) -> str:
+        """Type d'un message entrant pour les métriques (media, command, text, empty)"""
+        if num_media > 0:
+            return "media"
+        if body.startswith('/'):
+            return "command"
+        return "text" if body else "empty"
+    
+    def _handle_media_message(self, message_data: Dict[str, Any]) -> Optional[str]:
         """
         Traite un message contenant des médias
         
+        Les téléchargements passent par le pool d'E/S du pipeline médias: le
+        worker est libéré tout de suite et la réponse part quand tous les
+        médias du message sont traités.
+        
         Args:
             message_data: Données du message avec médias
             
         Returns:
-            Réponse à envoyer
+            Réponse à envoyer, ou None si elle sera envoyée après téléchargement
         """
         num_media = message_data.get('num_media', 0)
         media_list = message_data.get('media', [])
         
-        logger.info(f"Message avec {num_media} média(s) reçu")
+        logger.info("Message avec %d média(s) reçu", num_media)
         
-        # Analyser les types de médias
-        media_types = [m.get('content_type', '') for m in media_list]
+        if self.media is None:
+            return self._media_reply(
+                [{"status": "received", "content_type": m.get('content_type', '')} for m in media_list]
+            )
+        
+        future = self.media.submit(media_list)
+        if future is None:
+            return MEDIA_BUSY_RESPONSE
+        
+        sender = message_data.get('from')
+        reply_key = message_data.get('message_sid') or None
+        future.add_done_callback(
+            lambda done: self._send_media_reply(sender, done.result(), reply_key)
+        )
+        return None
+    
+    def _send_media_reply(
+        self,
+        sender: str,
+        results: List[Dict[str, Any]],
+        reply_key: Optional[str] = None
+    ) -> None:
+        """Envoie la réponse d'un message à médias une fois les téléchargements terminés"""
+        try:
+            if self._send_reply(sender, self._media_reply(results), reply_key):
+                logger.info("Réponse médias envoyée avec succès à %s", sender)
+            else:
+                logger.error(f"Échec de l'envoi de la réponse médias à {sender}")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi de la réponse médias: {e}", exc_info=True)
+    
+    def _media_reply(self, results: List[Dict[str, Any]]) -> str:
+        """
+        Construit la réponse à un message à médias
         
-        response = f"Merci pour {'les médias' if num_media > 1 else 'le média'} ! 📎\n\n"
+        Args:
+            results: Résultat de chaque média (statut, type, taille...)
+            
+        Returns:
+            Réponse à envoyer
+        """
+        response = f"Merci pour {'les médias' if len(results) > 1 else 'le média'} ! 📎\n\n"
         
-        if any('image' in mt for mt in media_types):
-            response += "J'ai bien reçu votre image. "
-        if any('audio' in mt for mt in media_types):
-            response += "J'ai bien reçu votre audio. "
-        if any('video' in mt for mt in media_types):
-            response += "J'ai bien reçu votre vidéo. "
-        if any('document' in mt for mt in media_types):
-            response += "J'ai bien reçu votre document. "
+        lines = []
+        for result in results:
+            kind, demonstrative = self._media_kind(result.get('content_type', ''))
+            status = result.get('status')
+            if status == "stored":
+                lines.append(f"J'ai bien reçu votre {kind} ({self._format_size(result['size'])}).")
+            elif status == "duplicate":
+                lines.append(f"J'avais déjà reçu {demonstrative} {kind}: rien de nouveau à traiter.")
+            elif status == "received":
+                lines.append(f"J'ai bien reçu votre {kind}.")
+            elif result.get('reason') == "too_large":
+                max_bytes = self.media.max_bytes if self.media else Config.MEDIA_MAX_BYTES
+                lines.append(f"Un fichier dépasse la taille maximale ({self._format_size(max_bytes)}).")
+            elif result.get('reason') == "type":
+                lines.append(f"Ce type de fichier ({result.get('detail') or 'inconnu'}) n'est pas pris en charge.")
+            else:
+                lines.append("Je n'ai pas pu récupérer un des fichiers, réessayez plus tard.")
+        response += "\n".join(lines)
         
         response += (
             "\n\nActuellement, je peux uniquement traiter des messages texte. "
@@ -145,6 +451,21 @@ class MessageHandler:
         
         return response
     
+    @staticmethod
+    def _media_kind(content_type: str) -> Tuple[str, str]:
+        """Nom affiché d'un média et son démonstratif, selon le type MIME"""
+        for prefix, kind, demonstrative in MEDIA_KINDS:
+            if content_type.startswith(prefix):
+                return kind, demonstrative
+        return "document", "ce"
+    
+    @staticmethod
+    def _format_size(size: int) -> str:
+        """Taille lisible (Ko/Mo)"""
+        if size >= 1024 * 1024:
+            return f"{size / (1024 * 1024):.1f} Mo"
+        return f"{max(1, size // 1024)} Ko"
+    
     def _get_help_message(self) -> str:
         """
         Retourne le message d'aide
@@ -160,6 +481,7 @@ Je suis un assistant intelligent propulsé par Hugging Face. Posez-moi n'importe
 • /aide - Afficher ce message
 • /info - Informations sur le bot
 • /ping - Vérifier si le bot est actif
+• /reset - Oublier la conversation en cours
 
 Envoyez simplement votre message et je vous répondrai ! 💬"""
     
@@ -170,54 +492,77 @@ Envoyez simplement votre message et je vous répondrai ! 💬"""
         Returns:
             Message d'information
         """
-        from app.config import Config
+        backend = self.huggingface_service.backend
         
         return f"""ℹ️ *Informations sur le bot*
 
-• Modèle IA: {Config.HUGGINGFACE_MODEL.split('/')[-1]}
-• Plateforme: Hugging Face Inference API
+• Modèle IA: {backend.model.split('/')[-1]}
+• Plateforme: {backend.label}
 • Service WhatsApp: Twilio
 • Version: 1.0
 
 Le bot utilise des modèles de langage avancés pour comprendre et répondre à vos messages de manière naturelle."""
     
+    def _probe_twilio(self) -> Dict[str, Any]:
+        """Sonde Twilio exécutée par le moniteur de santé"""
+        twilio_info = self.twilio_service.get_account_info()
+        return {
+            "status": "ok" if twilio_info else "error",
+            "info": twilio_info
+        }
+    
+    def _register_health_probes(self) -> None:
+        """Déclare les dépendances sondées en arrière-plan"""
+        self.health_monitor.register(
+            "twilio", self._probe_twilio, Config.HEALTH_TWILIO_INTERVAL
+        )
+        self.health_monitor.register(
+            "huggingface",
+            self.huggingface_service.check_model_status,
+            Config.HEALTH_HF_INTERVAL,
+            is_healthy=lambda result: bool(result.get("available"))
+        )
+    
     def check_health(self) -> Dict[str, Any]:
         """
-        Vérifie la santé de tous les services
+        Retourne la santé de tous les services depuis le dernier sondage
+        
+        Les dépendances sont sondées en arrière-plan: aucun appel réseau ici
         
         Returns:
-            Dict avec le statut de chaque service
+            Dict avec le statut de chaque service et l'âge des données
         """
+        self.health_monitor.start()
+        services = self.health_monitor.get_services()
+        
         health_status = {
             "status": "healthy",
-            "services": {}
+            "services": services
         }
         
-        # Vérifier Twilio
-        try:
-            twilio_info = self.twilio_service.get_account_info()
-            health_status["services"]["twilio"] = {
-                "status": "ok" if twilio_info else "error",
-                "info": twilio_info
-            }
-        except Exception as e:
-            health_status["services"]["twilio"] = {
-                "status": "error",
-                "error": str(e)
-            }
+        if all(service["status"] == "pending" for service in services.values()):
+            health_status["status"] = "starting"
+        elif not all(service["healthy"] for service in services.values()):
             health_status["status"] = "degraded"
         
-        # Vérifier Hugging Face
-        try:
-            hf_status = self.huggingface_service.check_model_status()
-            health_status["services"]["huggingface"] = hf_status
-            if not hf_status.get("available"):
-                health_status["status"] = "degraded"
-        except Exception as e:
-            health_status["services"]["huggingface"] = {
-                "status": "error",
-                "error": str(e)
-            }
+        # État du disjoncteur et des retries
+        resilience = self.huggingface_service.get_resilience_stats()
+        health_status["resilience"] = resilience
+        if resilience["circuit_breaker"]["state"] != "closed" and health_status["status"] == "healthy":
             health_status["status"] = "degraded"
         
-        return health_status
\ No newline at end of file
+        return health_status
+    
+    def is_ready(self) -> bool:
+        """
+        Indique si l'instance peut recevoir du trafic
+        
+        Returns:
+            True si les dépendances ont été sondées avec succès récemment
+            et que le disjoncteur Hugging Face n'est pas ouvert
+        """
+        self.health_monitor.start()
+        return (
+            self.health_monitor.is_ready()
+            and self.huggingface_service.circuit_breaker.state != "open"
+        )
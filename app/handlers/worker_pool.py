@@ -0,0 +1,232 @@
+"""
+Pool de workers en arrière-plan pour le traitement des messages
+Permet au webhook de répondre immédiatement à Twilio
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from app.config import Config
+from app.handlers.fair_queue import FairQueue
+from app.services.resilience import RetryLater, get_retry_scheduler
+from app.utils.logger import setup_logger
+from app.utils.metrics import Histogram
+from app.utils.prometheus import QUEUE_WAIT_SECONDS
+from app.utils.profiling import activate, get_profiler
+
+logger = setup_logger(__name__)
+
+
+class MessageWorkerPool:
+    """File bornée de messages, équitable entre expéditeurs, vidée par un pool de threads"""
+
+    def __init__(
+        self,
+        message_handler,
+        num_workers: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        max_pending_per_sender: Optional[int] = None
+    ):
+        """
+        Initialise le pool (les threads sont démarrés à la première soumission)
+
+        Args:
+            message_handler: Handler exposant process_message()
+            num_workers: Nombre de threads de traitement
+            max_queue_size: Taille maximale de la file d'attente
+            max_pending_per_sender: Messages en attente maximum par expéditeur
+        """
+        self.message_handler = message_handler
+        self.num_workers = max(1, num_workers or Config.WORKER_POOL_SIZE)
+        self.max_queue_size = max_queue_size or Config.WORKER_QUEUE_MAXSIZE
+        self.max_pending_per_sender = (
+            Config.WORKER_MAX_PENDING_PER_SENDER if max_pending_per_sender is None
+            else max_pending_per_sender
+        )
+
+        self._queue = FairQueue(self.max_queue_size, self.max_pending_per_sender)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._started_at = 0.0
+
+        # Statistiques
+        self.wait_time = Histogram()
+        self.processing_time = Histogram()
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._deferred = 0
+
+    def start(self) -> None:
+        """Démarre les workers s'ils ne tournent pas dans ce processus"""
+        with self._lock:
+            # Après un fork (gunicorn --preload), les threads du parent
+            # n'existent plus: on repart d'une file et de workers neufs
+            if self._pid == os.getpid():
+                return
+
+            self._queue = FairQueue(self.max_queue_size, self.max_pending_per_sender)
+            self._threads = []
+            self._busy = 0
+            self._pid = os.getpid()
+            self._started_at = time.monotonic()
+
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"message-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+        logger.info(f"Pool de workers démarré: {self.num_workers} thread(s), file max {self.max_queue_size}")
+
+    def submit(self, message_data: Dict[str, Any]) -> bool:
+        """
+        Place un message dans la file de traitement sans bloquer
+
+        Args:
+            message_data: Données du message parsées par Twilio
+
+        Returns:
+            True si le message a été mis en file, False si la file est pleine
+        """
+        self.start()
+
+        sender = message_data.get('from')
+        try:
+            self._queue.put_nowait(sender, (time.monotonic(), message_data))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"File de messages pleine pour {sender}, message rejeté")
+            return False
+
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Arrête les workers après avoir vidé la file
+
+        Args:
+            timeout: Temps d'attente maximal par thread
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            threads = list(self._threads)
+            self._pid = None
+
+        self._queue.close()
+        for thread in threads:
+            thread.join(timeout)
+
+        logger.info("Pool de workers arrêté")
+
+    def _worker_loop(self) -> None:
+        """Boucle principale d'un worker"""
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            enqueued_at, message_data = entry
+
+            started = time.monotonic()
+            self.wait_time.observe(started - enqueued_at)
+            QUEUE_WAIT_SECONDS.observe(started - enqueued_at)
+
+            # Requête tracée (en-tête X-Profile ou échantillonnage)
+            trace = message_data.get('trace')
+            if trace is not None:
+                trace.add_wait('queue_wait', started - enqueued_at)
+
+            with self._lock:
+                self._busy += 1
+
+            success = False
+            deferred = False
+            try:
+                with activate(trace):
+                    success = get_profiler().run_profiled(
+                        trace, self.message_handler.process_message, message_data, defer_retries=True
+                    )
+            except RetryLater as e:
+                # Pas de sleep dans le worker: le message revient en file après le délai
+                deferred = True
+                self._schedule_retry(message_data, e)
+            except Exception as e:
+                logger.error(f"Erreur non gérée dans le worker: {e}", exc_info=True)
+            finally:
+                elapsed = time.monotonic() - started
+                self.processing_time.observe(elapsed)
+                with self._lock:
+                    self._busy -= 1
+                    self._busy_seconds += elapsed
+                    if deferred:
+                        self._deferred += 1
+                    elif success:
+                        self._processed += 1
+                    else:
+                        self._failed += 1
+                if trace is not None and not deferred:
+                    get_profiler().record(trace)
+
+    def _schedule_retry(self, message_data: Dict[str, Any], retry: RetryLater) -> None:
+        """
+        Replanifie un message après le délai de backoff
+
+        Args:
+            message_data: Données du message à retraiter
+            retry: Demande de retry (délai et numéro de tentative)
+        """
+        message_data = dict(message_data, retry_attempt=retry.attempt)
+        logger.info("Message replanifié: %s", retry)
+
+        def requeue():
+            try:
+                self._queue.put_nowait(message_data.get('from'), (time.monotonic(), message_data))
+            except queue.Full:
+                with self._lock:
+                    self._rejected += 1
+                logger.warning("File de messages pleine, retry abandonné")
+
+        get_retry_scheduler().schedule(retry.delay, requeue)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques du pool
+
+        Returns:
+            Dict avec la profondeur de file, les temps d'attente et l'utilisation
+        """
+        with self._lock:
+            running = self._pid == os.getpid()
+            uptime = time.monotonic() - self._started_at if running else 0.0
+            capacity = uptime * self.num_workers
+            stats = {
+                "running": running,
+                "workers": self.num_workers,
+                "busy_workers": self._busy,
+                "queue_depth": self._queue.qsize(),
+                "queue_max_size": self.max_queue_size,
+                "active_senders": self._queue.active_keys(),
+                "submitted": self._submitted,
+                "processed": self._processed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "deferred": self._deferred,
+                "utilization": round(self._busy_seconds / capacity, 4) if capacity else 0.0,
+            }
+
+        stats["wait_time_seconds"] = self.wait_time.snapshot()
+        stats["processing_time_seconds"] = self.processing_time.snapshot()
+        return stats
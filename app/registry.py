@@ -0,0 +1,155 @@
+"""
+Registre des services de l'application
+Chaque service est construit à la première utilisation, une seule fois par processus
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Any
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ServiceRegistry:
+    """Fabrique paresseuse de services, sûre après un fork (gunicorn --preload)"""
+
+    def __init__(self):
+        """Initialise un registre vide"""
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._build_times: Dict[str, float] = {}
+        self._timings: Dict[str, float] = {}
+        # RLock: une fabrique peut demander ses dépendances au registre
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Déclare la fabrique d'un service
+
+        Args:
+            name: Nom du service
+            factory: Fonction sans argument qui construit le service
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Retourne le service, en le construisant au premier appel dans ce processus
+
+        Args:
+            name: Nom du service
+
+        Returns:
+            Instance du service
+
+        Raises:
+            KeyError: Si aucun service de ce nom n'est déclaré
+        """
+        instance = self._instances.get(name)
+        if instance is not None and self._pid == os.getpid():
+            return instance
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Les clients du parent (sockets, threads) ne sont pas réutilisables
+                self._instances = {}
+                self._build_times = {}
+                self._pid = os.getpid()
+
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                elapsed = time.perf_counter() - started
+                self._instances[name] = instance
+                self._build_times[name] = elapsed
+                logger.info(f"Service '{name}' construit en {elapsed * 1000:.1f} ms")
+            return instance
+
+    def warm_up(self, *names: str) -> None:
+        """
+        Construit des services à l'avance (ex: après le fork d'un worker)
+
+        Args:
+            names: Services à construire
+        """
+        for name in names:
+            self.get(name)
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        """
+        Enregistre une durée de démarrage (import, création de l'application...)
+
+        Args:
+            name: Étape mesurée
+            seconds: Durée en secondes
+        """
+        with self._lock:
+            self._timings[name] = seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les durées de démarrage
+
+        Returns:
+            Dict avec les étapes de démarrage et le temps de construction de chaque service
+        """
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "timings_ms": {name: round(s * 1000, 1) for name, s in self._timings.items()},
+                "services_ms": {name: round(s * 1000, 1) for name, s in self._build_times.items()},
+                "pending": sorted(set(self._factories) - set(self._instances)),
+            }
+
+
+def _build_twilio_service():
+    from app.services.twilio_services import TwilioService
+    return TwilioService()
+
+
+def _build_huggingface_service():
+    from app.services.huggingface_services import HuggingFaceService
+    return HuggingFaceService()
+
+
+def _build_message_handler():
+    from app.handlers.message_handler import MessageHandler
+    return MessageHandler()
+
+
+def _build_worker_pool():
+    from app.handlers.worker_pool import MessageWorkerPool
+    return MessageWorkerPool(registry.get('message_handler'))
+
+
+def _build_async_message_handler():
+    from app.handlers.async_message_handler import AsyncMessageHandler
+    return AsyncMessageHandler()
+
+
+registry = ServiceRegistry()
+registry.register('twilio_service', _build_twilio_service)
+registry.register('huggingface_service', _build_huggingface_service)
+registry.register('message_handler', _build_message_handler)
+registry.register('worker_pool', _build_worker_pool)
+registry.register('async_message_handler', _build_async_message_handler)
+
+
+def get_service(name: str) -> Any:
+    """
+    Retourne un service du registre de l'application
+
+    Args:
+        name: Nom du service (twilio_service, huggingface_service,
+            message_handler, worker_pool, async_message_handler)
+
+    Returns:
+        Instance du service
+    """
+    return registry.get(name)
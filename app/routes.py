@@ -3,20 +3,30 @@ Routes de l'application Flask
 Définit les endpoints pour les webhooks et l'API
 """
 
-from flask import Blueprint, request, jsonify
+import os
+import time
+from flask import Blueprint, Response, request, jsonify, send_file
 from twilio.twiml.messaging_response import MessagingResponse
-from app.handlers import MessageHandler
-from app.services import TwilioService
-from app.utils.logger import setup_logger
+from app.registry import get_service, registry
+from app.services import (
+    get_http_transport,
+    get_response_cache,
+    get_near_duplicate_cache,
+    get_webhook_deduplicator,
+    get_prompt_registry,
+)
+from app.config import Config
+from app.utils.logger import get_log_handler, setup_logger
+from app.utils.prometheus import WEBHOOK_PARSE_SECONDS, render_metrics
+from app.utils.profiling import PROFILE_HEADER, activate, check_admin_token, get_profiler
 
 logger = setup_logger(__name__)
 
 # Créer le blueprint
 webhook_bp = Blueprint('webhook', __name__)
 
-# Initialiser les services
-message_handler = MessageHandler()
-twilio_service = TwilioService()
+# Réponse TwiML vide, construite une seule fois
+EMPTY_TWIML = str(MessagingResponse())
 
 
 @webhook_bp.route('/')
@@ -29,6 +39,12 @@ def home():
         "endpoints": {
             "webhook": "/webhook (POST)",
             "health": "/health (GET)",
+            "liveness": "/health/live (GET)",
+            "readiness": "/health/ready (GET)",
+            "stats": "/stats (GET)",
+            "metrics": "/metrics (GET)",
+            "usage": "/usage/<numéro> (GET, X-Admin-Token)",
+            "profiling": "/admin/profiling (GET/POST, X-Admin-Token)",
             "test": "/test/send (POST)"
         }
     })
@@ -38,10 +54,10 @@ def home():
 def health_check():
     """
     Endpoint de health check
-    Vérifie que tous les services fonctionnent
+    Renvoie le dernier état connu des services (sondés en arrière-plan)
     """
     try:
-        health_status = message_handler.check_health()
+        health_status = get_service('message_handler').check_health()
         
         status_code = 200 if health_status["status"] in ["healthy", "degraded"] else 503
         
@@ -55,39 +71,162 @@ def health_check():
         }), 503
 
 
+@webhook_bp.route('/health/live')
+def liveness():
+    """Endpoint de liveness: le processus répond, sans consulter les dépendances"""
+    return jsonify({"status": "alive"})
+
+
+@webhook_bp.route('/health/ready')
+def readiness():
+    """Endpoint de readiness: les dépendances ont été sondées avec succès récemment"""
+    ready = get_service('message_handler').is_ready()
+    return jsonify({"status": "ready" if ready else "not_ready"}), 200 if ready else 503
+
+
+@webhook_bp.route('/stats')
+def stats():
+    """
+    Endpoint de statistiques internes
+    Expose l'état des files, des workers, du pool HTTP, des caches et du batching
+    """
+    cache = get_response_cache()
+    near_cache = get_near_duplicate_cache()
+    dedup = get_webhook_deduplicator()
+    message_handler = get_service('message_handler')
+    hf_service = message_handler.huggingface_service
+    conversations = message_handler.conversations
+    return jsonify({
+        "workers": get_service('worker_pool').get_stats(),
+        "http": get_http_transport().get_stats(),
+        "cache": cache.get_stats() if cache else None,
+        "near_duplicate_cache": near_cache.get_stats() if near_cache else None,
+        "batching": hf_service.batcher.get_stats() if hf_service.batcher else None,
+        "single_flight": hf_service.single_flight.get_stats() if hf_service.single_flight else None,
+        "conversations": conversations.get_stats() if conversations else None,
+        "outbound": message_handler.outbound.get_stats() if message_handler.outbound else None,
+        "webhook_dedup": dedup.get_stats() if dedup else None,
+        "quotas": message_handler.quotas.get_stats() if message_handler.quotas else None,
+        "faq": message_handler.faq.get_stats() if message_handler.faq else None,
+        "media": message_handler.media.get_stats() if message_handler.media else None,
+        "backend": hf_service.backend.describe(),
+        "prompts": get_prompt_registry().get_stats(),
+        "logging": get_log_handler().get_stats(),
+        "webhook_signature": (
+            message_handler.twilio_service.signature_validator.get_stats()
+            if message_handler.twilio_service.signature_validator else None
+        ),
+        "startup": registry.get_stats()
+    })
+
+
+@webhook_bp.route('/metrics')
+def metrics():
+    """
+    Endpoint Prometheus
+    Histogrammes et compteurs de chaque étape (agrégés sur tous les workers gunicorn)
+    """
+    try:
+        body, content_type = render_metrics()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    return Response(body, content_type=content_type)
+
+
+@webhook_bp.route('/usage/<path:sender>')
+def user_usage(sender):
+    """
+    Endpoint de consommation d'un expéditeur
+    Messages et tokens générés sur la fenêtre glissante des quotas (jeton admin requis)
+    """
+    denied = _require_admin()
+    if denied is not None:
+        return denied
+
+    quotas = get_service('message_handler').quotas
+    if quotas is None:
+        return jsonify({"error": "Quotas désactivés"}), 404
+    
+    if not sender.startswith('whatsapp:'):
+        sender = f'whatsapp:{sender}'
+    
+    usage = quotas.get_usage(sender)
+    if usage is None:
+        return jsonify({"error": "Expéditeur inconnu", "sender": sender}), 404
+    
+    return jsonify(usage)
+
+
 @webhook_bp.route('/webhook', methods=['POST'])
 def webhook():
     """
     Endpoint principal pour recevoir les messages de Twilio
     """
+    trace = get_profiler().start_trace(
+        'webhook',
+        request.headers.get(PROFILE_HEADER),
+        check_admin_token(request.headers.get('X-Admin-Token'))
+    )
+    started = time.perf_counter()
     try:
         logger.info("Webhook reçu de Twilio")
+        twilio_service = get_service('twilio_service')
+        
+        # Refus sur les en-têtes seuls: le corps d'un webhook forgé n'est pas lu
+        rejection = twilio_service.precheck_webhook(request.headers, request.content_length)
+        if rejection:
+            logger.info("Webhook rejeté: %s", rejection)
+            if rejection == "oversized":
+                return "Payload Too Large", 413
+            if rejection == "missing_signature":
+                return "Unauthorized", 401
+            return "Forbidden", 403
         
-        # Valider que la requête vient de Twilio
+        # Corps sans Content-Length (chunked): MAX_CONTENT_LENGTH coupe la lecture au plafond + 1
+        if len(request.get_data()) > Config.WEBHOOK_MAX_BODY_BYTES:
+            logger.info("Webhook rejeté: %s", twilio_service.reject_oversized())
+            return "Payload Too Large", 413
+        
+        # Valider que la requête vient de Twilio (compte, champs, signature HMAC)
         if not twilio_service.validate_webhook(request):
-            logger.warning("Webhook invalide reçu")
-            return "Unauthorized", 401
+            logger.info("Webhook rejeté: compte, champs ou signature invalides")
+            return "Forbidden", 403
+        
+        # Retry Twilio d'un message déjà reçu: ne pas le retraiter
+        message_sid = request.form.get('MessageSid')
+        dedup = get_webhook_deduplicator()
+        if dedup and message_sid and not dedup.check_and_mark(message_sid):
+            logger.info("Webhook en double ignoré: %s", message_sid)
+            return EMPTY_TWIML, 200, {'Content-Type': 'text/xml'}
         
         # Parser le message
         message_data = twilio_service.parse_incoming_message(request)
+        WEBHOOK_PARSE_SECONDS.observe(time.perf_counter() - started)
         
         if not message_data:
             logger.error("Impossible de parser le message")
+            if dedup and message_sid:
+                dedup.forget(message_sid)
             return "Bad Request", 400
         
-        # Traiter le message de manière asynchrone
-        # Note: Pour une production à grande échelle, utilisez Celery
-        message_handler.process_message(message_data)
+        if trace is not None:
+            trace.add_span('webhook', 0, started, time.perf_counter())
+            message_data['trace'] = trace
+        
+        # Mettre le message en file: la génération se fait en arrière-plan
+        if not get_service('worker_pool').submit(message_data):
+            # File saturée: Twilio réessaiera plus tard, le retry doit être traité
+            if dedup and message_sid:
+                dedup.forget(message_sid)
+            return "Service Unavailable", 503
         
         # Twilio attend une réponse TwiML vide
-        response = MessagingResponse()
-        return str(response), 200, {'Content-Type': 'text/xml'}
+        return EMPTY_TWIML, 200, {'Content-Type': 'text/xml'}
         
     except Exception as e:
         logger.error(f"Erreur lors du traitement du webhook: {e}", exc_info=True)
         # Toujours renvoyer 200 pour éviter les retries de Twilio
-        response = MessagingResponse()
-        return str(response), 200, {'Content-Type': 'text/xml'}
+        return EMPTY_TWIML, 200, {'Content-Type': 'text/xml'}
 
 
 @webhook_bp.route('/test/send', methods=['POST'])
@@ -116,7 +255,7 @@ def test_send_message():
             }), 400
         
         # Envoyer le message
-        message_sid = twilio_service.send_message(to, message)
+        message_sid = get_service('twilio_service').send_message(to, message)
         
         if message_sid:
             return jsonify({
@@ -161,16 +300,28 @@ def test_ai_response():
         if not prompt:
             return jsonify({"error": "Paramètre 'prompt' requis"}), 400
         
-        # Générer la réponse
-        from app.services import HuggingFaceService
-        hf_service = HuggingFaceService()
-        response = hf_service.generate_response(prompt, user_name)
+        profiler = get_profiler()
+        trace = profiler.start_trace(
+            'test_ai',
+            request.headers.get(PROFILE_HEADER),
+            check_admin_token(request.headers.get('X-Admin-Token'))
+        )
         
-        return jsonify({
+        # Générer la réponse (même service et même pool HTTP que le webhook)
+        with activate(trace):
+            response = profiler.run_profiled(
+                trace, get_service('huggingface_service').generate_response, prompt, user_name
+            )
+        
+        result = {
             "success": True,
             "prompt": prompt,
             "response": response
-        }), 200
+        }
+        if trace is not None:
+            profiler.record(trace)
+            result["trace"] = trace.to_dict()
+        return jsonify(result), 200
         
     except Exception as e:
         logger.error(f"Erreur lors du test IA: {e}")
@@ -180,6 +331,85 @@ def test_ai_response():
         }), 500
 
 
+def _require_admin():
+    """Réponse d'erreur si le jeton admin est absent ou invalide, sinon None"""
+    if not Config.ADMIN_TOKEN:
+        return jsonify({"error": "Endpoints d'administration désactivés (ADMIN_TOKEN)"}), 404
+    if not check_admin_token(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Jeton admin invalide"}), 401
+    return None
+
+
+@webhook_bp.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    """
+    État du profilage; POST pour tracer temporairement une fraction des requêtes
+    
+    Body JSON (POST):
+    {
+        "sample_rate": 0.05,
+        "duration": 300 (secondes, optionnel)
+    }
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    profiler = get_profiler()
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            sample_rate = float(data.get('sample_rate', 0))
+            duration = min(float(data.get('duration', 300)), Config.PROFILING_MAX_WINDOW_SECONDS)
+        except (TypeError, ValueError):
+            return jsonify({"error": "sample_rate et duration doivent être des nombres"}), 400
+        profiler.set_sample_rate(sample_rate, duration)
+    
+    return jsonify(profiler.get_stats())
+
+
+@webhook_bp.route('/admin/profiling/traces')
+def admin_profiling_traces():
+    """Dernières traces conservées (décomposition par étape)"""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({"traces": get_profiler().get_traces(limit)})
+
+
+@webhook_bp.route('/admin/profiling/sampler', methods=['GET', 'POST'])
+def admin_profiling_sampler():
+    """
+    POST: échantillonne les piles de tous les threads pendant une fenêtre
+    GET: télécharge le dernier profil (folded stacks pour flamegraph.pl / speedscope)
+    
+    Body JSON (POST):
+    {
+        "duration": 30 (secondes, optionnel)
+    }
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    sampler = get_profiler().sampler
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            duration = min(float(data.get('duration', 30)), Config.PROFILING_MAX_WINDOW_SECONDS)
+        except (TypeError, ValueError):
+            return jsonify({"error": "duration doit être un nombre"}), 400
+        if not sampler.start(duration, Config.PROFILING_SAMPLE_INTERVAL_MS / 1000):
+            return jsonify({"error": "Échantillonnage déjà en cours"}), 409
+        return jsonify({"started": True, "duration": duration}), 202
+    
+    if sampler.running or not sampler.last_output or not os.path.exists(sampler.last_output):
+        return jsonify({"error": "Aucun profil disponible", "running": sampler.running}), 404
+    return send_file(os.path.abspath(sampler.last_output), mimetype='text/plain', as_attachment=True)
+
+
 @webhook_bp.errorhandler(404)
 def not_found(error):
     """Gestionnaire pour les routes non trouvées"""
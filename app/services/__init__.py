@@ -3,7 +3,36 @@ Package des services
 Contient les services pour Twilio et Hugging Face
 """
 
-from app.services.twilio_services import TwilioService
+import importlib
 from app.services.huggingface_services import HuggingFaceService
+from app.services.http_transport import HttpTransport, get_http_transport
+from app.services.response_cache import ResponseCache, get_response_cache
+from app.services.near_duplicate_cache import NearDuplicateCache, get_near_duplicate_cache
+from app.services.outbound_dispatcher import OutboundDispatcher
+from app.services.webhook_dedup import WebhookDeduplicator, get_webhook_deduplicator
+from app.services.prompt_templates import PromptTemplateRegistry, get_prompt_registry
+from app.services.backends import InferenceBackend, create_backend
 
-__all__ = ['TwilioService', 'HuggingFaceService']
\ No newline at end of file
+__all__ = [
+    'TwilioService', 'HuggingFaceService',
+    'HttpTransport', 'get_http_transport',
+    'ResponseCache', 'get_response_cache',
+    'NearDuplicateCache', 'get_near_duplicate_cache',
+    'OutboundDispatcher',
+    'WebhookDeduplicator', 'get_webhook_deduplicator',
+    'PromptTemplateRegistry', 'get_prompt_registry',
+    'InferenceBackend', 'create_backend',
+]
+
+# Le SDK Twilio n'est importé qu'à la première utilisation de TwilioService
+_LAZY_EXPORTS = {
+    'TwilioService': 'app.services.twilio_services',
+}
+
+
+def __getattr__(name):
+    """Import différé des services lourds"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
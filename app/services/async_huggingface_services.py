@@ -0,0 +1,202 @@
+"""
+Variante asynchrone du service Hugging Face
+Les appels d'inférence passent par les méthodes asynchrones du moteur
+"""
+
+import asyncio
+import time
+from typing import Optional, Dict, Any, List
+import httpx
+from app.config import Config
+from app.services.huggingface_services import HuggingFaceService
+from app.services.backends import ModelLoadingError
+from app.services.conversation_store import Exchange
+from app.services.resilience import backoff_delay
+from app.utils.logger import setup_logger
+from app.utils.prometheus import GENERATION_SECONDS
+from app.utils.profiling import traced
+
+logger = setup_logger(__name__)
+
+
+class AsyncHuggingFaceService(HuggingFaceService):
+    """Service Hugging Face dont les appels réseau sont des coroutines"""
+
+    def __init__(self):
+        """Initialise le service (les clients du moteur sont créés dans la boucle d'événements)"""
+        super().__init__()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Niveau SQLite du cache: les lectures/écritures disque quittent la boucle d'événements
+        self._cache_on_disk = self.cache is not None and bool(self.cache.sqlite_path)
+
+    async def _alookup_cached(
+        self,
+        prompt: str,
+        request_key: str,
+        namespace: Optional[int],
+        history: List[Exchange]
+    ) -> Optional[str]:
+        """Variante asynchrone de _lookup_cached() (thread dédié si le cache va sur disque)"""
+        if self._cache_on_disk:
+            return await asyncio.to_thread(self._lookup_cached, prompt, request_key, namespace, history)
+        return self._lookup_cached(prompt, request_key, namespace, history)
+
+    async def _astore_response(
+        self,
+        prompt: str,
+        request_key: str,
+        namespace: Optional[int],
+        history: List[Exchange],
+        response: str
+    ) -> None:
+        """Variante asynchrone de _store_response() (thread dédié si le cache va sur disque)"""
+        if self._cache_on_disk:
+            await asyncio.to_thread(self._store_response, prompt, request_key, namespace, history, response)
+        else:
+            self._store_response(prompt, request_key, namespace, history, response)
+
+    @traced('generate_response')
+    async def generate_response(
+        self,
+        prompt: str,
+        user_name: str = "User",
+        max_retries: int = 3,
+        history: Optional[List[Exchange]] = None
+    ) -> str:
+        """
+        Génère une réponse à partir d'un prompt
+
+        Args:
+            prompt: Texte du message utilisateur
+            user_name: Nom de l'utilisateur
+            max_retries: Nombre de tentatives en cas d'erreur
+            history: Échanges précédents de la conversation (optionnel)
+
+        Returns:
+            Réponse générée par le modèle
+        """
+        history = self._select_history(prompt, history)
+        request_key, namespace = self._cache_keys(prompt, user_name, history)
+
+        cached = await self._alookup_cached(prompt, request_key, namespace, history)
+        if cached is not None:
+            return cached
+
+        # Les demandes identiques simultanées partagent une seule coroutine
+        shared = self._in_flight.get(request_key)
+        if shared is not None:
+            generated_text = await asyncio.shield(shared)
+        else:
+            task = asyncio.ensure_future(
+                self._generate_async(prompt, user_name, history, request_key, namespace, max_retries)
+            )
+            self._in_flight[request_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(request_key, None))
+            generated_text = await asyncio.shield(task)
+
+        if generated_text is None:
+            return self._get_fallback_response()
+
+        return generated_text
+
+    @traced('inference')
+    async def _generate_async(
+        self,
+        prompt: str,
+        user_name: str,
+        history: List[Exchange],
+        request_key: str,
+        namespace: Optional[int],
+        max_retries: int
+    ) -> Optional[str]:
+        """
+        Appelle le modèle avec plusieurs tentatives (attentes non bloquantes)
+
+        Returns:
+            Texte généré, ou None si toutes les tentatives ont échoué
+        """
+        formatted_prompt = self._format_prompt(prompt, user_name, history)
+
+        for attempt in range(max_retries):
+            if not self.circuit_breaker.allow_request():
+                logger.warning("Disjoncteur Hugging Face ouvert, réponse de secours")
+                with self._stats_lock:
+                    self.retry_stats["fail_fast"] += 1
+                return None
+
+            with self._stats_lock:
+                self.retry_stats["attempts"] += 1
+
+            started = time.monotonic()
+            status = "error"
+            try:
+                logger.info("Génération asynchrone (tentative %d/%d)", attempt + 1, max_retries)
+
+                result = await self.backend.agenerate(formatted_prompt)
+                self.circuit_breaker.record_success()
+
+                generated_text = self.prompt.extract(result)
+                if generated_text:
+                    status = "success"
+                    await self._astore_response(prompt, request_key, namespace, history, generated_text)
+                    logger.info("Réponse générée avec succès: %.100s...", generated_text)
+                    return generated_text
+
+                status = "empty"
+                logger.warning("Réponse vide du modèle")
+                delay = backoff_delay(attempt)
+
+            except ModelLoadingError as e:
+                status = "loading"
+                logger.warning("Modèle en cours de chargement, attente...")
+                # Le service répond: ni succès ni échec, le délai estimé régit la reprise
+                self.circuit_breaker.release()
+                delay = min(e.estimated_time, Config.HF_RETRY_MAX_DELAY)
+
+            except asyncio.CancelledError:
+                status = "cancelled"
+                self.circuit_breaker.release()
+                raise
+
+            except httpx.TimeoutException:
+                status = "timeout"
+                logger.error(f"Timeout lors de la requête (tentative {attempt + 1})")
+                self.circuit_breaker.record_failure()
+                delay = backoff_delay(attempt)
+
+            except Exception as e:
+                logger.error(f"Erreur API Hugging Face: {e}")
+                self.circuit_breaker.record_failure()
+                delay = backoff_delay(attempt)
+
+            finally:
+                GENERATION_SECONDS.labels(status, str(attempt + 1)).observe(time.monotonic() - started)
+
+            if attempt < max_retries - 1:
+                with self._stats_lock:
+                    self.retry_stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+        return None
+
+    async def check_model_status(self) -> Dict[str, Any]:
+        """
+        Vérifie le statut du modèle
+
+        Returns:
+            Dict avec les infos du modèle
+        """
+        try:
+            return await self.backend.acheck_status()
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la vérification du modèle: {e}")
+            return {
+                "status": 0,
+                "available": False,
+                "message": str(e)
+            }
+
+    async def close(self) -> None:
+        """Ferme les clients asynchrones du moteur"""
+        await self.backend.aclose()
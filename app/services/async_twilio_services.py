@@ -0,0 +1,162 @@
+"""
+Variante asynchrone du service Twilio
+Utilise le client HTTP asynchrone du SDK Twilio (aiohttp)
+"""
+
+import time
+from typing import Optional
+from twilio.rest import Client
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
+from app.config import Config
+from app.services.twilio_services import TwilioService
+from app.utils.logger import setup_logger
+from app.utils.prometheus import TWILIO_ERRORS, TWILIO_SEND_SECONDS
+from app.utils.profiling import traced
+
+logger = setup_logger(__name__)
+
+
+class AsyncTwilioService(TwilioService):
+    """Service Twilio dont les appels réseau sont des coroutines"""
+
+    def __init__(self):
+        """Initialise le service (le client est créé dans la boucle d'événements)"""
+        self.account_sid = Config.TWILIO_ACCOUNT_SID
+        self.auth_token = Config.TWILIO_AUTH_TOKEN
+        self.whatsapp_number = Config.TWILIO_WHATSAPP_NUMBER
+        self.signature_validator = self._build_signature_validator()
+        self.client: Optional[Client] = None
+
+    def _get_client(self) -> Client:
+        """
+        Retourne le client Twilio asynchrone, créé à la première utilisation
+
+        La session aiohttp doit être ouverte depuis une boucle d'événements active
+        """
+        if self.client is None:
+            try:
+                self.client = Client(
+                    self.account_sid,
+                    self.auth_token,
+                    http_client=AsyncTwilioHttpClient()
+                )
+                if Config.TWILIO_API_BASE:
+                    self.client.api.base_url = Config.TWILIO_API_BASE.rstrip('/')
+                logger.info("Client Twilio asynchrone initialisé avec succès")
+            except Exception as e:
+                logger.error(f"Erreur lors de l'initialisation du client Twilio asynchrone: {e}")
+                raise
+        return self.client
+
+    @traced('twilio_api')
+    async def _create_async(self, **params):
+        """Crée un message en mesurant la durée et les erreurs de l'appel"""
+        started = time.monotonic()
+        try:
+            return await self._get_client().messages.create_async(**params)
+        except TwilioRestException as e:
+            TWILIO_ERRORS.labels(str(e.code or e.status)).inc()
+            raise
+        except Exception:
+            TWILIO_ERRORS.labels('network').inc()
+            raise
+        finally:
+            TWILIO_SEND_SECONDS.observe(time.monotonic() - started)
+
+    async def send_message(self, to: str, body: str) -> Optional[str]:
+        """
+        Envoie un message WhatsApp via Twilio
+
+        Args:
+            to: Numéro du destinataire (format: whatsapp:+33612345678)
+            body: Contenu du message
+
+        Returns:
+            SID du message si succès, None sinon
+        """
+        try:
+            if not to.startswith('whatsapp:'):
+                to = f'whatsapp:{to}'
+
+            logger.info("Envoi message à %s: %.50s...", to, body)
+
+            message = await self._create_async(
+                from_=self.whatsapp_number,
+                body=body,
+                to=to
+            )
+
+            logger.info("Message envoyé avec succès. SID: %s", message.sid)
+            return message.sid
+
+        except TwilioRestException as e:
+            logger.error(f"Erreur Twilio lors de l'envoi: {e.msg} (Code: {e.code})")
+            return None
+
+        except Exception as e:
+            logger.error(f"Erreur inattendue lors de l'envoi: {e}", exc_info=True)
+            return None
+
+    async def send_media_message(self, to: str, body: str, media_url: str) -> Optional[str]:
+        """
+        Envoie un message WhatsApp avec média via Twilio
+
+        Args:
+            to: Numéro du destinataire
+            body: Contenu du message
+            media_url: URL du média (image, vidéo, etc.)
+
+        Returns:
+            SID du message si succès, None sinon
+        """
+        try:
+            if not to.startswith('whatsapp:'):
+                to = f'whatsapp:{to}'
+
+            message = await self._create_async(
+                from_=self.whatsapp_number,
+                body=body,
+                media_url=[media_url],
+                to=to
+            )
+
+            logger.info("Message avec média envoyé. SID: %s", message.sid)
+            return message.sid
+
+        except TwilioRestException as e:
+            logger.error(f"Erreur Twilio: {e.msg} (Code: {e.code})")
+            return None
+
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi avec média: {e}", exc_info=True)
+            return None
+
+    async def get_account_info(self) -> Optional[dict]:
+        """
+        Récupère les informations du compte Twilio
+
+        Returns:
+            Dict avec les infos du compte
+        """
+        try:
+            if not self.account_sid:
+                logger.error("TWILIO_ACCOUNT_SID n'est pas configuré")
+                return None
+
+            account = await self._get_client().api.accounts(self.account_sid).fetch_async()
+            return {
+                'sid': account.sid,
+                'friendly_name': account.friendly_name,
+                'status': account.status,
+                'type': account.type
+            }
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des infos compte: {e}")
+            return None
+
+    async def close(self) -> None:
+        """Ferme la session HTTP asynchrone"""
+        if self.client is not None:
+            await self.client.http_client.close()
+            self.client = None
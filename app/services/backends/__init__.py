@@ -0,0 +1,95 @@
+"""
+Moteurs d'inférence
+Choisis par INFERENCE_BACKEND: huggingface, openai, local ou stub;
+HEDGE_ENDPOINTS ajoute des moteurs secondaires pour les requêtes couvertes
+"""
+
+import importlib
+from typing import Optional, Dict, Any, Tuple
+from app.config import Config
+from app.services.backends.base import InferenceBackend, HttpBackend, ModelLoadingError
+
+__all__ = [
+    'InferenceBackend', 'HttpBackend', 'ModelLoadingError',
+    'BACKENDS', 'create_backend', 'parse_endpoint',
+]
+
+# Nom du moteur -> (module, classe); le module n'est importé que s'il est choisi
+BACKENDS = {
+    'huggingface': ('app.services.backends.huggingface', 'HuggingFaceBackend'),
+    'openai': ('app.services.backends.openai_compatible', 'OpenAICompatibleBackend'),
+    'local': ('app.services.backends.local_cpu', 'LocalCpuBackend'),
+    'stub': ('app.services.backends.stub', 'StubBackend'),
+}
+
+
+def _build(name: str, model: str, generation_params: Dict[str, Any], base_url: Optional[str] = None) -> InferenceBackend:
+    """Instancie un moteur par son nom"""
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur d'inférence inconnu: {name} (choix: {', '.join(BACKENDS)})")
+
+    module_name, class_name = BACKENDS[name]
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    if base_url:
+        return backend_class(model, generation_params, base_url=base_url)
+    return backend_class(model, generation_params)
+
+
+def parse_endpoint(spec: str, default_model: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Décode la description d'un moteur secondaire
+
+    Args:
+        spec: moteur[:modèle][@url] (ex: openai:mistral-7b@http://gpu:8000/v1)
+        default_model: Modèle utilisé si la description n'en donne pas
+
+    Returns:
+        Tuple (moteur, modèle, url ou None)
+    """
+    spec, _, base_url = spec.strip().partition('@')
+    name, _, model = spec.partition(':')
+    return name.strip(), model.strip() or default_model, base_url.strip() or None
+
+
+def create_backend(
+    name: Optional[str] = None,
+    model: Optional[str] = None,
+    generation_params: Optional[Dict[str, Any]] = None
+) -> InferenceBackend:
+    """
+    Construit le moteur d'inférence configuré
+
+    Si HEDGE_ENDPOINTS est défini (et qu'aucun moteur n'est imposé), le
+    moteur principal est combiné aux moteurs secondaires dans un HedgedBackend.
+
+    Args:
+        name: Nom du moteur (par défaut: INFERENCE_BACKEND)
+        model: Modèle servi (par défaut: INFERENCE_MODEL, sinon HUGGINGFACE_MODEL)
+        generation_params: Paramètres de génération (par défaut: ceux de la config)
+
+    Returns:
+        Instance du moteur
+
+    Raises:
+        ValueError: Si le nom d'un moteur est inconnu
+    """
+    model = model or Config.INFERENCE_MODEL or Config.HUGGINGFACE_MODEL
+    generation_params = generation_params or Config.get_huggingface_params()
+    primary = _build(name or Config.INFERENCE_BACKEND, model, generation_params)
+
+    if name is not None or not Config.HEDGE_ENDPOINTS.strip():
+        return primary
+
+    from app.services.backends.hedged import HedgedBackend
+
+    endpoints = [(f"{primary.name}:{model}", primary)]
+    for spec in Config.HEDGE_ENDPOINTS.split(','):
+        if not spec.strip():
+            continue
+        backend_name, backend_model, base_url = parse_endpoint(spec, model)
+        backend = _build(backend_name, backend_model, generation_params, base_url)
+        label = f"{backend.name}:{backend_model}" + (f"@{base_url}" if base_url else "")
+        endpoints.append((label, backend))
+
+    return HedgedBackend(endpoints)
@@ -0,0 +1,151 @@
+"""
+Interface commune des moteurs d'inférence
+Un moteur reçoit des prompts déjà formatés et renvoie le texte généré brut
+"""
+
+import asyncio
+from typing import Optional, Dict, Any, List, Iterator
+from app.config import Config
+
+try:
+    import httpx
+except ImportError:  # Uniquement nécessaire en mode ASGI
+    httpx = None
+
+
+class ModelLoadingError(Exception):
+    """Le modèle est en cours de chargement (HTTP 503)"""
+
+    def __init__(self, estimated_time: float = 20):
+        super().__init__(f"Modèle en cours de chargement (~{estimated_time}s)")
+        self.estimated_time = estimated_time
+
+
+class InferenceBackend:
+    """
+    Moteur d'inférence
+
+    Les sous-classes implémentent au minimum generate(); les autres méthodes
+    ont une version par défaut construite dessus.
+    """
+
+    # Nom du moteur (clé de INFERENCE_BACKEND) et libellé affiché aux utilisateurs (/info)
+    name = "base"
+    label = "Moteur d'inférence"
+
+    def __init__(self, model: str, generation_params: Dict[str, Any]):
+        """
+        Initialise le moteur
+
+        Args:
+            model: Identifiant du modèle servi
+            generation_params: Paramètres de génération (format Hugging Face)
+        """
+        self.model = model
+        self.generation_params = generation_params
+
+    def generate(self, prompt: str) -> str:
+        """
+        Génère le texte d'un prompt
+
+        Args:
+            prompt: Prompt formaté
+
+        Returns:
+            Texte généré brut (éventuel écho du prompt inclus)
+
+        Raises:
+            ModelLoadingError: Si le modèle n'est pas encore prêt
+        """
+        raise NotImplementedError
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Génère le texte de plusieurs prompts en un seul appel
+
+        Args:
+            prompts: Prompts formatés
+
+        Returns:
+            Un texte par prompt, dans le même ordre
+        """
+        return [self.generate(prompt) for prompt in prompts]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Génère le texte d'un prompt par fragments
+
+        Args:
+            prompt: Prompt formaté
+
+        Yields:
+            Fragments successifs du texte généré
+        """
+        yield self.generate(prompt)
+
+    def check_status(self) -> Dict[str, Any]:
+        """
+        Vérifie que le moteur peut servir des requêtes
+
+        Returns:
+            Dict avec status, available et message
+        """
+        return {"status": 200, "available": True, "message": "OK"}
+
+    async def agenerate(self, prompt: str) -> str:
+        """Variante asynchrone de generate() (exécutée dans un thread par défaut)"""
+        return await asyncio.to_thread(self.generate, prompt)
+
+    async def acheck_status(self) -> Dict[str, Any]:
+        """Variante asynchrone de check_status()"""
+        return await asyncio.to_thread(self.check_status)
+
+    async def aclose(self) -> None:
+        """Libère les ressources asynchrones du moteur"""
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Décrit le moteur pour /stats
+
+        Returns:
+            Dict avec le nom du moteur et le modèle servi
+        """
+        return {"backend": self.name, "model": self.model}
+
+
+class HttpBackend(InferenceBackend):
+    """Moteur distant: client httpx asynchrone créé dans la boucle d'événements"""
+
+    def __init__(self, model: str, generation_params: Dict[str, Any], base_url: Optional[str] = None):
+        """
+        Initialise le moteur distant
+
+        Args:
+            model: Identifiant du modèle servi
+            generation_params: Paramètres de génération (format Hugging Face)
+            base_url: URL de base du serveur (par défaut: celle de la config)
+        """
+        super().__init__(model, generation_params)
+        self.base_url = base_url
+        self._async_client: Optional["httpx.AsyncClient"] = None
+
+    def _get_async_client(self) -> "httpx.AsyncClient":
+        """Retourne le client httpx partagé, créé à la première utilisation"""
+        if self._async_client is None:
+            if httpx is None:
+                raise RuntimeError("httpx est requis pour les appels asynchrones")
+            self._async_client = httpx.AsyncClient(
+                http2=Config.HTTP_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=Config.HTTP_POOL_SIZE,
+                    max_keepalive_connections=Config.HTTP_POOL_SIZE if Config.HTTP_KEEP_ALIVE else 0
+                ),
+                timeout=httpx.Timeout(Config.HTTP_READ_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT)
+            )
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """Ferme le client httpx"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
@@ -0,0 +1,446 @@
+"""
+Requêtes couvertes (hedging) sur plusieurs moteurs d'inférence
+Si le moteur choisi n'a pas répondu après un délai calé sur ses latences
+récentes, un doublon part vers le suivant; la première réponse l'emporte
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+from app.config import Config
+from app.services.backends.base import InferenceBackend
+from app.services.resilience import CircuitBreaker, CircuitOpenError
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Latences conservées par moteur pour calculer le délai de couverture
+LATENCY_WINDOW = 200
+
+# Poids des nouvelles mesures dans la latence moyenne lissée
+EWMA_ALPHA = 0.2
+
+
+class Endpoint:
+    """Un moteur d'inférence et sa santé observée"""
+
+    def __init__(self, backend: InferenceBackend, label: str):
+        """
+        Initialise le suivi du moteur
+
+        Args:
+            backend: Moteur d'inférence
+            label: Nom affiché (moteur:modèle)
+        """
+        self.backend = backend
+        self.label = label
+        self.circuit_breaker = CircuitBreaker(f"inference:{label}")
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.ewma_latency: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: Optional[float]) -> None:
+        """
+        Enregistre l'issue d'un appel
+
+        Args:
+            latency: Durée de l'appel réussi (secondes), None en cas d'échec
+        """
+        if latency is None:
+            self.circuit_breaker.record_failure()
+            with self._lock:
+                self.failures += 1
+            return
+
+        self.circuit_breaker.record_success()
+        with self._lock:
+            self.successes += 1
+            self.latencies.append(latency)
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency += EWMA_ALPHA * (latency - self.ewma_latency)
+
+    def record_win(self) -> None:
+        """Enregistre une requête servie par ce moteur"""
+        with self._lock:
+            self.wins += 1
+
+    def score(self) -> float:
+        """
+        Note de santé: taux de succès divisé par la latence lissée
+
+        Un moteur au disjoncteur ouvert passe après tous les autres
+        """
+        if self.circuit_breaker.state == CircuitBreaker.OPEN:
+            return -1.0
+        with self._lock:
+            calls = self.successes + self.failures
+            # Lissage de Laplace: un moteur neuf vaut un moteur moyen sans historique
+            success_rate = (self.successes + 1) / (calls + 2)
+            latency = self.ewma_latency if self.ewma_latency is not None else Config.HEDGE_INITIAL_DELAY_MS / 1000
+        return success_rate / max(latency, 0.01)
+
+    def hedge_delay(self) -> float:
+        """
+        Délai avant le doublon: percentile configuré des latences récentes
+
+        Returns:
+            Délai en secondes, borné par HEDGE_MIN_DELAY_MS
+        """
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < Config.HEDGE_MIN_SAMPLES:
+            delay = Config.HEDGE_INITIAL_DELAY_MS / 1000
+        else:
+            delay = samples[min(len(samples) - 1, int(Config.HEDGE_PERCENTILE * len(samples)))]
+        return max(delay, Config.HEDGE_MIN_DELAY_MS / 1000)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne la santé observée du moteur"""
+        with self._lock:
+            stats = {
+                "successes": self.successes,
+                "failures": self.failures,
+                "wins": self.wins,
+                "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            }
+        stats["circuit_breaker"] = self.circuit_breaker.state
+        stats["hedge_delay_ms"] = round(self.hedge_delay() * 1000, 1)
+        stats["score"] = round(self.score(), 3)
+        return stats
+
+
+class HedgedBackend(InferenceBackend):
+    """Moteur composite: ordre par santé, bascule sur erreur, doublon sur lenteur"""
+
+    name = "hedged"
+    label = "Plusieurs moteurs (requêtes couvertes)"
+
+    def __init__(self, endpoints: List[Tuple[str, InferenceBackend]]):
+        """
+        Initialise le moteur composite
+
+        Args:
+            endpoints: (nom, moteur) par ordre de préférence, le premier étant le principal
+        """
+        primary = endpoints[0][1]
+        super().__init__(primary.model, primary.generation_params)
+        self.endpoints = [Endpoint(backend, label) for label, backend in endpoints]
+        # Deux appels au plus par requête (principal + doublon)
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.HEDGE_MAX_CONCURRENCY,
+            thread_name_prefix="hedge"
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "hedge_budget_exhausted": 0,
+            "failovers": 0,
+            "abandoned": 0,
+        }
+
+    def _ranked(self) -> List[Endpoint]:
+        """Moteurs du plus sain au moins sain (ordre de configuration à égalité)"""
+        return sorted(self.endpoints, key=lambda endpoint: -endpoint.score())
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _may_hedge(self) -> bool:
+        """Les doublons restent sous HEDGE_MAX_RATIO des requêtes (pas d'amplification)"""
+        with self._lock:
+            allowed = self._stats["hedged"] < Config.HEDGE_MAX_RATIO * self._stats["requests"]
+            if not allowed:
+                self._stats["hedge_budget_exhausted"] += 1
+            return allowed
+
+    @staticmethod
+    def _call(endpoint: Endpoint, prompt: str) -> str:
+        """Appelle un moteur en enregistrant la latence ou l'échec"""
+        started = time.monotonic()
+        try:
+            result = endpoint.backend.generate(prompt)
+        except Exception:
+            endpoint.record(None)
+            raise
+        endpoint.record(time.monotonic() - started)
+        return result
+
+    def generate(self, prompt: str) -> str:
+        """
+        Génère le texte avec couverture et bascule
+
+        Le moteur le plus sain part seul; après son délai de couverture, un
+        doublon part vers le suivant. Une erreur déclenche la bascule immédiate.
+        """
+        self._count("requests")
+        candidates = self._ranked()
+        pending: Dict[Future, Endpoint] = {}
+        last_error: Optional[BaseException] = None
+        next_index = 0
+        hedge_endpoint: Optional[Endpoint] = None
+        deadline: Optional[float] = None
+        # Le délai de couverture n'expire qu'une fois par requête, bascule comprise
+        hedged = False
+
+        def launch() -> Optional[Endpoint]:
+            nonlocal next_index
+            while next_index < len(candidates):
+                endpoint = candidates[next_index]
+                next_index += 1
+                if endpoint.circuit_breaker.allow_request():
+                    pending[self._executor.submit(self._call, endpoint, prompt)] = endpoint
+                    return endpoint
+            return None
+
+        while True:
+            if not pending:
+                endpoint = launch()
+                if endpoint is None:
+                    break
+                if endpoint is not candidates[0]:
+                    self._count("failovers")
+                if not hedged:
+                    deadline = time.monotonic() + endpoint.hedge_delay()
+
+            timeout = None
+            if deadline is not None and next_index < len(candidates):
+                timeout = max(0.0, deadline - time.monotonic())
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Moteur lent: doublon vers le suivant (une seule fois par requête)
+                deadline = None
+                hedged = True
+                if self._may_hedge():
+                    endpoint = launch()
+                    if endpoint is not None:
+                        hedge_endpoint = endpoint
+                        self._count("hedged")
+                        logger.info("Doublon vers %s (moteur principal lent)", endpoint.label)
+                continue
+
+            for future in done:
+                endpoint = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    endpoint.record_win()
+                    if endpoint is hedge_endpoint:
+                        self._count("hedge_wins")
+                    for loser, loser_endpoint in pending.items():
+                        # Un appel déjà parti ne s'interrompt pas: son résultat est ignoré
+                        if loser.cancel():
+                            loser_endpoint.circuit_breaker.release()
+                        else:
+                            self._count("abandoned")
+                    return future.result()
+
+                last_error = error
+                logger.warning("Moteur %s en échec: %s", endpoint.label, error)
+
+        raise last_error or CircuitOpenError("Aucun moteur d'inférence disponible")
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Lot envoyé au moteur le plus sain, bascule sur erreur (sans doublon)"""
+        last_error: Optional[BaseException] = None
+        for endpoint in self._ranked():
+            if not endpoint.circuit_breaker.allow_request():
+                continue
+            started = time.monotonic()
+            try:
+                texts = endpoint.backend.generate_batch(prompts)
+            except Exception as e:
+                endpoint.record(None)
+                last_error = e
+                continue
+            endpoint.record(time.monotonic() - started)
+            return texts
+        raise last_error or CircuitOpenError("Aucun moteur d'inférence disponible")
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Flux du moteur le plus sain; bascule possible tant que rien n'a été émis"""
+        last_error: Optional[BaseException] = None
+        for endpoint in self._ranked():
+            if not endpoint.circuit_breaker.allow_request():
+                continue
+            started = time.monotonic()
+            emitted = False
+            finished = False
+            try:
+                for token in endpoint.backend.stream(prompt):
+                    emitted = True
+                    yield token
+                finished = True
+            except Exception as e:
+                finished = True
+                endpoint.record(None)
+                if emitted:
+                    raise
+                last_error = e
+                continue
+            finally:
+                # Flux fermé par l'appelant: pas de latence mesurable, place d'essai rendue
+                if not finished:
+                    if emitted:
+                        endpoint.circuit_breaker.record_success()
+                    else:
+                        endpoint.circuit_breaker.release()
+            endpoint.record(time.monotonic() - started)
+            return
+        raise last_error or CircuitOpenError("Aucun moteur d'inférence disponible")
+
+    def check_status(self) -> Dict[str, Any]:
+        """Disponible si au moins un moteur l'est"""
+        statuses = {}
+        for endpoint in self.endpoints:
+            try:
+                statuses[endpoint.label] = endpoint.backend.check_status()
+            except Exception as e:
+                statuses[endpoint.label] = {"status": 0, "available": False, "message": str(e)}
+        available = any(status.get("available") for status in statuses.values())
+        return {
+            "status": 200 if available else 503,
+            "available": available,
+            "message": "OK" if available else "Aucun moteur disponible",
+            "endpoints": statuses,
+        }
+
+    @staticmethod
+    async def _acall(endpoint: Endpoint, prompt: str) -> str:
+        """Variante asynchrone de _call()"""
+        started = time.monotonic()
+        try:
+            result = await endpoint.backend.agenerate(prompt)
+        except asyncio.CancelledError:
+            # Perdant annulé: ni succès ni échec
+            endpoint.circuit_breaker.release()
+            raise
+        except Exception:
+            endpoint.record(None)
+            raise
+        endpoint.record(time.monotonic() - started)
+        return result
+
+    async def agenerate(self, prompt: str) -> str:
+        """Variante asynchrone de generate(): le perdant est réellement annulé"""
+        self._count("requests")
+        candidates = self._ranked()
+        pending: Dict[asyncio.Task, Endpoint] = {}
+        last_error: Optional[BaseException] = None
+        next_index = 0
+        hedge_endpoint: Optional[Endpoint] = None
+        deadline: Optional[float] = None
+        # Le délai de couverture n'expire qu'une fois par requête, bascule comprise
+        hedged = False
+
+        def launch() -> Optional[Endpoint]:
+            nonlocal next_index
+            while next_index < len(candidates):
+                endpoint = candidates[next_index]
+                next_index += 1
+                if endpoint.circuit_breaker.allow_request():
+                    pending[asyncio.ensure_future(self._acall(endpoint, prompt))] = endpoint
+                    return endpoint
+            return None
+
+        try:
+            while True:
+                if not pending:
+                    endpoint = launch()
+                    if endpoint is None:
+                        break
+                    if endpoint is not candidates[0]:
+                        self._count("failovers")
+                    if not hedged:
+                        deadline = time.monotonic() + endpoint.hedge_delay()
+
+                timeout = None
+                if deadline is not None and next_index < len(candidates):
+                    timeout = max(0.0, deadline - time.monotonic())
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    deadline = None
+                    hedged = True
+                    if self._may_hedge():
+                        endpoint = launch()
+                        if endpoint is not None:
+                            hedge_endpoint = endpoint
+                            self._count("hedged")
+                            logger.info("Doublon vers %s (moteur principal lent)", endpoint.label)
+                    continue
+
+                for task in done:
+                    endpoint = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        endpoint.record_win()
+                        if endpoint is hedge_endpoint:
+                            self._count("hedge_wins")
+                        return task.result()
+
+                    last_error = error
+                    logger.warning("Moteur %s en échec: %s", endpoint.label, error)
+        finally:
+            for task in pending:
+                task.cancel()
+                self._count("abandoned")
+
+        raise last_error or CircuitOpenError("Aucun moteur d'inférence disponible")
+
+    async def acheck_status(self) -> Dict[str, Any]:
+        """Sonde les moteurs en parallèle"""
+        results = await asyncio.gather(
+            *(endpoint.backend.acheck_status() for endpoint in self.endpoints),
+            return_exceptions=True
+        )
+        statuses = {
+            endpoint.label: (
+                {"status": 0, "available": False, "message": str(result)}
+                if isinstance(result, BaseException) else result
+            )
+            for endpoint, result in zip(self.endpoints, results)
+        }
+        available = any(status.get("available") for status in statuses.values())
+        return {
+            "status": 200 if available else 503,
+            "available": available,
+            "message": "OK" if available else "Aucun moteur disponible",
+            "endpoints": statuses,
+        }
+
+    async def aclose(self) -> None:
+        """Ferme les clients asynchrones de chaque moteur"""
+        for endpoint in self.endpoints:
+            await endpoint.backend.aclose()
+
+    def describe(self) -> Dict[str, Any]:
+        """Décrit le moteur composite, ses taux de couverture et la santé des moteurs"""
+        with self._lock:
+            stats = dict(self._stats)
+        requests_count = stats["requests"]
+        stats.update({
+            "hedge_rate": round(stats["hedged"] / requests_count, 4) if requests_count else 0.0,
+            "hedge_win_rate": round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else 0.0,
+        })
+        description = super().describe()
+        description.update({
+            "hedging": stats,
+            "endpoints": {
+                endpoint.label: dict(endpoint.backend.describe(), **endpoint.get_stats())
+                for endpoint in self.endpoints
+            },
+        })
+        return description
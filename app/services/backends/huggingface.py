@@ -0,0 +1,160 @@
+"""
+Moteur Hugging Face Inference API
+"""
+
+import json
+from typing import Optional, Dict, Any, List, Iterator
+import requests
+from app.config import Config
+from app.services.backends.base import HttpBackend, ModelLoadingError
+from app.services.http_transport import get_http_transport
+
+
+class HuggingFaceBackend(HttpBackend):
+    """Appels à l'API d'inférence Hugging Face (ou à un serveur TGI compatible)"""
+
+    name = "huggingface"
+    label = "Hugging Face Inference API"
+
+    def __init__(self, model: str, generation_params: Dict[str, Any], base_url: Optional[str] = None):
+        super().__init__(model, generation_params, base_url)
+        self.api_url = f"{(base_url or Config.HUGGINGFACE_API_BASE).rstrip('/')}/{model}"
+        self.headers = {
+            "Authorization": f"Bearer {Config.HUGGINGFACE_API_KEY}",
+            "Content-Type": "application/json"
+        }
+        self.http = get_http_transport()
+
+    @staticmethod
+    def _text_of(item: Any) -> str:
+        """Extrait le texte d'un élément de réponse ({"generated_text"}, [..] ou chaîne)"""
+        if isinstance(item, list):
+            item = item[0] if item else ''
+        if isinstance(item, dict):
+            return item.get('generated_text', '')
+        return str(item)
+
+    def _post_inputs(self, inputs: Any) -> Any:
+        """
+        Envoie une requête d'inférence à l'API
+
+        Args:
+            inputs: Prompt unique ou liste de prompts
+
+        Returns:
+            Réponse JSON de l'API
+
+        Raises:
+            ModelLoadingError: Si le modèle est en cours de chargement
+            requests.exceptions.RequestException: En cas d'erreur HTTP
+        """
+        payload = {
+            "inputs": inputs,
+            "parameters": self.generation_params
+        }
+
+        response = self.http.post(
+            self.api_url,
+            headers=self.headers,
+            json=payload,
+            timeout=Config.HTTP_READ_TIMEOUT
+        )
+
+        if response.status_code == 503:
+            raise ModelLoadingError(response.json().get('estimated_time', 20))
+
+        response.raise_for_status()
+        return response.json()
+
+    def generate(self, prompt: str) -> str:
+        """Génère le texte d'un prompt"""
+        return self._text_of(self._post_inputs(prompt))
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Génère plusieurs prompts en une requête (inputs en liste)"""
+        result = self._post_inputs(prompts)
+
+        if not isinstance(result, list) or len(result) != len(prompts):
+            raise ValueError(f"Réponse groupée inattendue: {str(result)[:200]}")
+
+        return [self._text_of(item) for item in result]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Décode les événements SSE de l'API en fragments de texte"""
+        payload = {
+            "inputs": prompt,
+            "parameters": self.generation_params,
+            "stream": True
+        }
+
+        for status, line in self.http.stream_lines(
+            'POST',
+            self.api_url,
+            headers=self.headers,
+            json=payload,
+            timeout=Config.HTTP_READ_TIMEOUT
+        ):
+            if status == 503:
+                try:
+                    estimated_time = json.loads(line).get('estimated_time', 20)
+                except ValueError:
+                    estimated_time = 20
+                raise ModelLoadingError(estimated_time)
+
+            if status >= 400:
+                raise requests.exceptions.HTTPError(f"Erreur HTTP {status}: {line[:200]}")
+
+            if not line.startswith('data:'):
+                continue
+
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+
+            event = json.loads(data)
+            if 'error' in event:
+                raise requests.exceptions.HTTPError(f"Erreur du flux: {event['error']}")
+
+            token = event.get('token') or {}
+            if token.get('special'):
+                continue
+            if token.get('text'):
+                yield token['text']
+
+    def check_status(self) -> Dict[str, Any]:
+        """Vérifie le statut du modèle sur l'API"""
+        response = self.http.get(self.api_url, headers=self.headers, timeout=10)
+        return {
+            "status": response.status_code,
+            "available": response.status_code == 200,
+            "message": response.text if response.status_code != 200 else "OK"
+        }
+
+    async def agenerate(self, prompt: str) -> str:
+        """Génère le texte d'un prompt via le client httpx asynchrone"""
+        response = await self._get_async_client().post(
+            self.api_url,
+            headers=self.headers,
+            json={"inputs": prompt, "parameters": self.generation_params}
+        )
+
+        if response.status_code == 503:
+            raise ModelLoadingError(response.json().get('estimated_time', 20))
+
+        response.raise_for_status()
+        return self._text_of(response.json())
+
+    async def acheck_status(self) -> Dict[str, Any]:
+        """Vérifie le statut du modèle sans bloquer la boucle d'événements"""
+        response = await self._get_async_client().get(self.api_url, headers=self.headers, timeout=10)
+        return {
+            "status": response.status_code,
+            "available": response.status_code == 200,
+            "message": response.text if response.status_code != 200 else "OK"
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Décrit le moteur pour /stats"""
+        description = super().describe()
+        description["url"] = self.api_url
+        return description
@@ -0,0 +1,136 @@
+"""
+Moteur local sur CPU (transformers)
+Pour les petits modèles: aucune latence réseau ni file d'attente distante
+"""
+
+import threading
+from typing import Dict, Any, List, Iterator
+from app.config import Config
+from app.services.backends.base import InferenceBackend
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import torch
+    from transformers import pipeline, TextIteratorStreamer
+except ImportError:  # Moteur local optionnel
+    torch = None
+    pipeline = None
+    TextIteratorStreamer = None
+
+# Familles encodeur-décodeur servies par la tâche text2text-generation
+SEQ2SEQ_MARKERS = ('t5', 'bart')
+
+
+class LocalCpuBackend(InferenceBackend):
+    """Modèle chargé dans le processus et exécuté sur CPU"""
+
+    name = "local"
+    label = "Modèle local (CPU)"
+
+    def __init__(self, model: str, generation_params: Dict[str, Any]):
+        super().__init__(model, generation_params)
+        if pipeline is None:
+            raise RuntimeError("INFERENCE_BACKEND=local nécessite transformers et torch")
+
+        model_lower = model.lower()
+        self.task = (
+            "text2text-generation"
+            if any(marker in model_lower for marker in SEQ2SEQ_MARKERS)
+            else "text-generation"
+        )
+
+        temperature = generation_params.get("temperature") or 0
+        self.parameters = {
+            "max_new_tokens": generation_params.get("max_new_tokens"),
+            "repetition_penalty": generation_params.get("repetition_penalty"),
+            "do_sample": temperature > 0,
+        }
+        if temperature > 0:
+            self.parameters["temperature"] = temperature
+            self.parameters["top_p"] = generation_params.get("top_p")
+        if self.task == "text-generation":
+            self.parameters["return_full_text"] = False
+        self.parameters = {key: value for key, value in self.parameters.items() if value is not None}
+
+        self._pipeline = None
+        self._load_lock = threading.Lock()
+        # Un seul passage à la fois: le modèle occupe déjà tous les cœurs alloués
+        self._run_lock = threading.Lock()
+
+    def _get_pipeline(self):
+        """Charge le modèle au premier appel (plusieurs secondes sur CPU)"""
+        if self._pipeline is None:
+            with self._load_lock:
+                if self._pipeline is None:
+                    if Config.LOCAL_MODEL_THREADS > 0:
+                        torch.set_num_threads(Config.LOCAL_MODEL_THREADS)
+                    logger.info(f"Chargement du modèle local {self.model} ({self.task})...")
+                    self._pipeline = pipeline(self.task, model=self.model, device=-1)
+                    logger.info(f"Modèle local {self.model} chargé")
+        return self._pipeline
+
+    @staticmethod
+    def _text_of(item: Any) -> str:
+        """Extrait le texte d'un résultat de pipeline"""
+        if isinstance(item, list):
+            item = item[0] if item else {}
+        return item.get("generated_text", "")
+
+    def generate(self, prompt: str) -> str:
+        """Génère le texte d'un prompt"""
+        generator = self._get_pipeline()
+        with self._run_lock:
+            return self._text_of(generator(prompt, **self.parameters))
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Génère plusieurs prompts en un seul passage du modèle"""
+        generator = self._get_pipeline()
+        with self._run_lock:
+            results = generator(prompts, batch_size=len(prompts), **self.parameters)
+        return [self._text_of(result) for result in results]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Génère le texte par fragments (génération dans un thread dédié)"""
+        generator = self._get_pipeline()
+        streamer = TextIteratorStreamer(
+            generator.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        parameters = dict(self.parameters, streamer=streamer)
+        errors: List[BaseException] = []
+
+        def run() -> None:
+            with self._run_lock:
+                try:
+                    generator(prompt, **parameters)
+                except BaseException as e:
+                    errors.append(e)
+                    streamer.end()
+
+        threading.Thread(target=run, name="local-model-stream", daemon=True).start()
+        for text in streamer:
+            if text:
+                yield text
+        if errors:
+            raise errors[0]
+
+    def check_status(self) -> Dict[str, Any]:
+        """
+        Charge le modèle s'il ne l'est pas encore
+
+        Appelé par la sonde de santé en arrière-plan: le chargement a lieu
+        avant le premier message, et l'instance n'est prête qu'une fois chargé.
+        """
+        self._get_pipeline()
+        return {"status": 200, "available": True, "message": "OK"}
+
+    def describe(self) -> Dict[str, Any]:
+        """Décrit le moteur pour /stats"""
+        description = super().describe()
+        description.update({
+            "task": self.task,
+            "loaded": self._pipeline is not None,
+            "threads": torch.get_num_threads(),
+        })
+        return description
@@ -0,0 +1,146 @@
+"""
+Moteur compatible OpenAI (llama.cpp server, vLLM, Ollama, TGI...)
+Utilise l'endpoint /completions: le prompt est déjà formaté par le gabarit du modèle
+"""
+
+import json
+from typing import Optional, Dict, Any, List, Iterator
+import requests
+from app.config import Config
+from app.services.backends.base import HttpBackend, ModelLoadingError
+from app.services.http_transport import get_http_transport
+
+
+class OpenAICompatibleBackend(HttpBackend):
+    """Appels à un serveur exposant l'API OpenAI /v1/completions"""
+
+    name = "openai"
+    label = "Serveur compatible OpenAI"
+
+    def __init__(self, model: str, generation_params: Dict[str, Any], base_url: Optional[str] = None):
+        super().__init__(model, generation_params, base_url)
+        self.base_url = (base_url or Config.OPENAI_API_BASE).rstrip('/')
+        self.completions_url = f"{self.base_url}/completions"
+        self.headers = {"Content-Type": "application/json"}
+        if Config.OPENAI_API_KEY:
+            self.headers["Authorization"] = f"Bearer {Config.OPENAI_API_KEY}"
+        self.http = get_http_transport()
+
+        # Paramètres Hugging Face traduits une fois pour toutes
+        self.parameters = {
+            "max_tokens": generation_params.get("max_new_tokens"),
+            "temperature": generation_params.get("temperature"),
+            "top_p": generation_params.get("top_p"),
+            # Extension llama.cpp / vLLM, ignorée par les serveurs qui ne la connaissent pas
+            "repetition_penalty": generation_params.get("repetition_penalty"),
+        }
+        self.parameters = {key: value for key, value in self.parameters.items() if value is not None}
+
+    def _payload(self, prompt: Any, stream: bool = False) -> Dict[str, Any]:
+        """Construit le corps d'une requête /completions"""
+        payload = {"model": self.model, "prompt": prompt, **self.parameters}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _check_response(response: Any) -> None:
+        """Traduit un 503 (modèle en chargement) et les autres erreurs HTTP"""
+        if response.status_code == 503:
+            try:
+                estimated_time = float(response.headers.get('Retry-After', 20))
+            except ValueError:
+                estimated_time = 20
+            raise ModelLoadingError(estimated_time)
+        response.raise_for_status()
+
+    def _post(self, prompt: Any) -> List[str]:
+        """Envoie une requête et retourne les textes triés par index"""
+        response = self.http.post(
+            self.completions_url,
+            headers=self.headers,
+            json=self._payload(prompt),
+            timeout=Config.HTTP_READ_TIMEOUT
+        )
+        self._check_response(response)
+        choices = sorted(response.json()["choices"], key=lambda choice: choice.get("index", 0))
+        return [choice.get("text", "") for choice in choices]
+
+    def generate(self, prompt: str) -> str:
+        """Génère le texte d'un prompt"""
+        texts = self._post(prompt)
+        return texts[0] if texts else ""
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Génère plusieurs prompts en une requête (prompt en liste)"""
+        texts = self._post(prompts)
+
+        if len(texts) != len(prompts):
+            raise ValueError(f"Réponse groupée inattendue: {len(texts)} choix pour {len(prompts)} prompts")
+
+        return texts
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Décode les événements SSE /completions en fragments de texte"""
+        for status, line in self.http.stream_lines(
+            'POST',
+            self.completions_url,
+            headers=self.headers,
+            json=self._payload(prompt, stream=True),
+            timeout=Config.HTTP_READ_TIMEOUT
+        ):
+            if status == 503:
+                raise ModelLoadingError()
+
+            if status >= 400:
+                raise requests.exceptions.HTTPError(f"Erreur HTTP {status}: {line[:200]}")
+
+            if not line.startswith('data:'):
+                continue
+
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+
+            event = json.loads(data)
+            if 'error' in event:
+                raise requests.exceptions.HTTPError(f"Erreur du flux: {event['error']}")
+
+            for choice in event.get("choices", []):
+                if choice.get("text"):
+                    yield choice["text"]
+
+    def check_status(self) -> Dict[str, Any]:
+        """Vérifie que le serveur répond sur /models"""
+        response = self.http.get(f"{self.base_url}/models", headers=self.headers, timeout=10)
+        return {
+            "status": response.status_code,
+            "available": response.status_code == 200,
+            "message": response.text if response.status_code != 200 else "OK"
+        }
+
+    async def agenerate(self, prompt: str) -> str:
+        """Génère le texte d'un prompt via le client httpx asynchrone"""
+        response = await self._get_async_client().post(
+            self.completions_url,
+            headers=self.headers,
+            json=self._payload(prompt)
+        )
+        self._check_response(response)
+        choices = response.json()["choices"]
+        return choices[0].get("text", "") if choices else ""
+
+    async def acheck_status(self) -> Dict[str, Any]:
+        """Vérifie le serveur sans bloquer la boucle d'événements"""
+        response = await self._get_async_client().get(f"{self.base_url}/models", headers=self.headers, timeout=10)
+        return {
+            "status": response.status_code,
+            "available": response.status_code == 200,
+            "message": response.text if response.status_code != 200 else "OK"
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Décrit le moteur pour /stats"""
+        description = super().describe()
+        description["url"] = self.base_url
+        return description
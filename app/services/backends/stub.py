@@ -0,0 +1,72 @@
+"""
+Moteur factice déterministe
+Pour les tests et les benchmarks: même prompt, même réponse, sans réseau ni modèle
+"""
+
+import asyncio
+import time
+import zlib
+from typing import Dict, Any, List, Iterator
+from app.config import Config
+from app.services.backends.base import InferenceBackend
+
+STUB_RESPONSES = (
+    "Bonne question ! Voici une réponse de test.",
+    "Je suis le moteur de test, tout fonctionne correctement.",
+    "Réponse automatique: votre message a bien été reçu.",
+    "Merci pour votre message. Ceci est une réponse simulée.",
+)
+
+
+class StubBackend(InferenceBackend):
+    """Réponses fixes choisies par hachage du prompt, avec une latence simulée"""
+
+    name = "stub"
+    label = "Moteur de test (réponses fixes)"
+
+    def __init__(self, model: str, generation_params: Dict[str, Any]):
+        super().__init__(model, generation_params)
+        self.latency = Config.STUB_LATENCY_MS / 1000
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        """Choisit la réponse du prompt (stable d'un processus à l'autre)"""
+        self.calls += 1
+        return STUB_RESPONSES[zlib.crc32(prompt.encode('utf-8')) % len(STUB_RESPONSES)]
+
+    def generate(self, prompt: str) -> str:
+        """Retourne la réponse du prompt après la latence configurée"""
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(prompt)
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Un seul délai pour tout le lot, comme un vrai appel groupé"""
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._answer(prompt) for prompt in prompts]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Retourne la réponse mot par mot, la latence répartie sur les mots"""
+        words = self._answer(prompt).split(' ')
+        delay = self.latency / len(words)
+        for index, word in enumerate(words):
+            if delay:
+                time.sleep(delay)
+            yield word if index == 0 else f" {word}"
+
+    async def agenerate(self, prompt: str) -> str:
+        """Variante asynchrone sans thread (attente non bloquante)"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def acheck_status(self) -> Dict[str, Any]:
+        """Toujours disponible"""
+        return self.check_status()
+
+    def describe(self) -> Dict[str, Any]:
+        """Décrit le moteur pour /stats"""
+        description = super().describe()
+        description.update({"latency_ms": Config.STUB_LATENCY_MS, "calls": self.calls})
+        return description
@@ -0,0 +1,172 @@
+"""
+Regroupement des appels d'inférence en micro-lots
+Les prompts concurrents sont envoyés ensemble en une seule requête
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Any, Dict, Optional
+from app.config import Config
+from app.utils.logger import setup_logger
+from app.utils.metrics import Histogram
+
+logger = setup_logger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class MicroBatcher:
+    """Collecte les éléments soumis et les traite par lots"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        name: str = "batch"
+    ):
+        """
+        Initialise le batcher (le thread de collecte démarre à la première soumission)
+
+        Args:
+            batch_fn: Fonction traitant une liste d'éléments et renvoyant
+                une liste de résultats dans le même ordre
+            max_batch_size: Nombre max d'éléments par lot
+            max_wait_ms: Attente max avant d'envoyer un lot incomplet
+            max_concurrency: Nombre max de lots en vol simultanément
+            name: Nom utilisé pour les threads et les logs
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size or Config.HF_BATCH_MAX_SIZE)
+        self.max_wait = (max_wait_ms or Config.HF_BATCH_MAX_WAIT_MS) / 1000.0
+        self.max_concurrency = max(1, max_concurrency or Config.HF_BATCH_MAX_CONCURRENCY)
+        self.name = name
+
+        self._queue: queue.Queue = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.Semaphore] = None
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+
+        # Statistiques
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.batch_latency = Histogram()
+        self.queue_wait = Histogram()
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+
+    def _ensure_started(self) -> None:
+        """Démarre le thread de collecte dans le processus courant"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._queue = queue.Queue()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix=f"{self.name}-batch"
+            )
+            self._slots = threading.Semaphore(self.max_concurrency)
+            self._pid = os.getpid()
+
+            threading.Thread(
+                target=self._collect_loop,
+                name=f"{self.name}-collector",
+                daemon=True
+            ).start()
+
+        logger.info(
+            f"Micro-batching '{self.name}' démarré (lot max: {self.max_batch_size}, "
+            f"attente max: {self.max_wait * 1000:.0f}ms)"
+        )
+
+    def submit(self, item: Any) -> Future:
+        """
+        Soumet un élément au prochain lot
+
+        Args:
+            item: Élément à traiter
+
+        Returns:
+            Future résolue avec le résultat de cet élément
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((time.monotonic(), item, future))
+        return future
+
+    def _collect_loop(self) -> None:
+        """Assemble les lots: N éléments ou T millisecondes, au premier atteint"""
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Bloquer la collecte tant que tous les lots autorisés sont en vol:
+            # les éléments continuent de s'accumuler pour le lot suivant
+            self._slots.acquire()
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[tuple]) -> None:
+        """Exécute un lot et distribue les résultats aux appelants"""
+        started = time.monotonic()
+        for enqueued_at, _, _ in batch:
+            self.queue_wait.observe(started - enqueued_at)
+        self.batch_size.observe(len(batch))
+
+        try:
+            results = self.batch_fn([item for _, item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Lot de {len(batch)} éléments mais {len(results)} résultats reçus"
+                )
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            for _, _, future in batch:
+                future.set_exception(e)
+        finally:
+            self.batch_latency.observe(time.monotonic() - started)
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+            self._slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques du batcher
+
+        Returns:
+            Dict avec les tailles de lots, latences et compteurs
+        """
+        with self._lock:
+            stats = {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_concurrency": self.max_concurrency,
+                "pending": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+            }
+
+        stats["batch_size"] = self.batch_size.snapshot()
+        stats["batch_latency_seconds"] = self.batch_latency.snapshot()
+        stats["queue_wait_seconds"] = self.queue_wait.snapshot()
+        return stats
@@ -0,0 +1,195 @@
+"""
+Mémoire des conversations par utilisateur
+Historique borné par expéditeur avec éviction LRU des conversations inactives
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Tuple
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Un échange: (message utilisateur, réponse de l'assistant, nombre de tokens)
+Exchange = Tuple[str, str, int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estime le nombre de tokens d'un texte
+
+    Args:
+        text: Texte à mesurer
+
+    Returns:
+        Estimation (environ 4 caractères par token)
+    """
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    """Tampon circulaire des derniers échanges d'un utilisateur"""
+
+    __slots__ = ('exchanges', 'last_active')
+
+    def __init__(self, max_turns: int):
+        self.exchanges: deque = deque(maxlen=max_turns)
+        self.last_active = time.monotonic()
+
+
+class ConversationStore:
+    """Stockage des conversations indexé par expéditeur"""
+
+    def __init__(
+        self,
+        max_turns: Optional[int] = None,
+        max_conversations: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        max_chars: Optional[int] = None
+    ):
+        """
+        Initialise le stockage
+
+        Args:
+            max_turns: Nombre d'échanges conservés par conversation
+            max_conversations: Nombre max de conversations en mémoire
+            idle_ttl: Durée d'inactivité avant oubli (secondes)
+            max_chars: Longueur max conservée pour chaque message
+        """
+        self.max_turns = max_turns or Config.CONVERSATION_MAX_TURNS
+        self.max_conversations = max_conversations or Config.CONVERSATION_MAX_USERS
+        self.idle_ttl = idle_ttl or Config.CONVERSATION_IDLE_TTL
+        self.max_chars = max_chars or Config.CONVERSATION_MAX_CHARS
+
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def get_history(self, sender: str) -> List[Exchange]:
+        """
+        Retourne l'historique d'un utilisateur, du plus ancien au plus récent
+
+        Args:
+            sender: Identifiant de l'expéditeur (champ 'from')
+
+        Returns:
+            Liste des échanges conservés
+        """
+        with self._lock:
+            self._expire_idle()
+            conversation = self._conversations.get(sender)
+            if conversation is None:
+                return []
+            return list(conversation.exchanges)
+
+    def add_exchange(self, sender: str, user_text: str, assistant_text: str) -> None:
+        """
+        Ajoute un échange à la conversation d'un utilisateur
+
+        Args:
+            sender: Identifiant de l'expéditeur
+            user_text: Message de l'utilisateur
+            assistant_text: Réponse envoyée
+        """
+        user_text = user_text[:self.max_chars]
+        assistant_text = assistant_text[:self.max_chars]
+        # Le coût en tokens est calculé une seule fois, à l'insertion
+        tokens = estimate_tokens(user_text) + estimate_tokens(assistant_text)
+
+        with self._lock:
+            conversation = self._conversations.get(sender)
+            if conversation is None:
+                conversation = Conversation(self.max_turns)
+                self._conversations[sender] = conversation
+            else:
+                self._conversations.move_to_end(sender)
+
+            conversation.exchanges.append((user_text, assistant_text, tokens))
+            conversation.last_active = time.monotonic()
+
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self, sender: str) -> None:
+        """
+        Oublie la conversation d'un utilisateur
+
+        Args:
+            sender: Identifiant de l'expéditeur
+        """
+        with self._lock:
+            self._conversations.pop(sender, None)
+
+    def _expire_idle(self) -> None:
+        """Retire les conversations inactives (verrou déjà pris)"""
+        # L'ordre LRU suit la dernière activité: on s'arrête au premier actif
+        deadline = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            sender, conversation = next(iter(self._conversations.items()))
+            if conversation.last_active > deadline:
+                break
+            del self._conversations[sender]
+            self._stats["expirations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques du stockage
+
+        Returns:
+            Dict avec le nombre de conversations et d'évictions
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["conversations"] = len(self._conversations)
+            stats["max_conversations"] = self.max_conversations
+        return stats
+
+
+def select_history(history: List[Exchange], budget: int) -> List[Exchange]:
+    """
+    Sélectionne les échanges les plus récents tenant dans un budget de tokens
+
+    Args:
+        history: Échanges du plus ancien au plus récent
+        budget: Nombre de tokens disponibles pour l'historique
+
+    Returns:
+        Sous-liste des échanges retenus, dans l'ordre chronologique
+    """
+    selected = []
+    used = 0
+    for exchange in reversed(history):
+        used += exchange[2]
+        if used > budget:
+            break
+        selected.append(exchange)
+    selected.reverse()
+    return selected
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> Optional[ConversationStore]:
+    """
+    Retourne le stockage des conversations partagé du processus
+
+    Returns:
+        Instance ConversationStore, ou None si la mémoire est désactivée
+    """
+    global _store
+
+    if not Config.CONVERSATION_MEMORY_ENABLED:
+        return None
+
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore()
+        return _store
@@ -0,0 +1,293 @@
+"""
+Réponses rapides à partir d'une FAQ
+Reconnaît des mots-clés avec un automate Aho-Corasick, sans appel au modèle
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
+from app.config import Config
+from app.services.near_duplicate_cache import normalize_for_similarity
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AhoCorasick:
+    """
+    Automate de recherche multi-motifs
+
+    Une seule passe sur le texte, quel que soit le nombre de motifs:
+    coût linéaire en longueur du message (plus le nombre de correspondances)
+    """
+
+    def __init__(self, patterns: List[str]):
+        """
+        Construit l'automate
+
+        Args:
+            patterns: Motifs à rechercher (déjà normalisés)
+        """
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = next_node
+            self._out[node] += (index,)
+
+        # Liens d'échec en largeur; les sorties héritent de celles du lien d'échec
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                pending.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0) if node else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[int]:
+        """
+        Retourne les indices des motifs présents dans le texte
+
+        Args:
+            text: Texte normalisé
+
+        Returns:
+            Indices des motifs trouvés (chacun au plus une fois)
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found = set()
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+
+        return sorted(found)
+
+    @property
+    def size(self) -> int:
+        """Nombre d'états de l'automate"""
+        return len(self._goto)
+
+
+class FaqEntry:
+    """Entrée de FAQ: mots-clés et réponse préparée"""
+
+    __slots__ = ('id', 'response', 'max_words', 'priority')
+
+    def __init__(self, entry_id: str, response: str, max_words: int = 0, priority: int = 0):
+        self.id = entry_id
+        self.response = response
+        self.max_words = max_words
+        self.priority = priority
+
+
+class FaqEngine:
+    """Étape de réponse rapide chargée depuis un fichier JSON rechargé à chaud"""
+
+    def __init__(self, path: Optional[str] = None, reload_interval: Optional[float] = None):
+        """
+        Initialise le moteur et charge la FAQ
+
+        Args:
+            path: Fichier JSON de la FAQ
+            reload_interval: Délai minimal entre deux vérifications du fichier (secondes)
+        """
+        self.path = path or Config.FAQ_PATH
+        self.reload_interval = Config.FAQ_RELOAD_INTERVAL if reload_interval is None else reload_interval
+
+        self._lock = threading.Lock()
+        # (automate, entrées, entrée de chaque motif, longueur de chaque motif)
+        self._table: Tuple[Optional[AhoCorasick], List[FaqEntry], List[int], List[int]] = (None, [], [], [])
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "reloads": 0,
+            "load_errors": 0,
+        }
+
+        self._reload_if_changed(force=True)
+
+    def _reload_if_changed(self, force: bool = False) -> None:
+        """Recharge la FAQ si le fichier a changé (vérification espacée)"""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                if self._mtime is not None or force:
+                    logger.warning(f"Fichier FAQ introuvable: {self.path}")
+                self._mtime = None
+                self._table = (None, [], [], [])
+                return
+
+            if mtime == self._mtime:
+                return
+
+            try:
+                table = self._load(self.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # On garde la table précédente plutôt que de perdre toutes les réponses
+                self._stats["load_errors"] += 1
+                logger.error(f"FAQ invalide ({self.path}), table précédente conservée: {e}")
+                self._mtime = mtime
+                return
+
+            self._table = table
+            self._mtime = mtime
+            self._stats["reloads"] += 1
+            automaton, entries = table[0], table[1]
+            logger.info(
+                f"FAQ chargée: {len(entries)} entrée(s), "
+                f"{len(automaton.patterns) if automaton else 0} mot(s)-clé(s)"
+            )
+
+    @staticmethod
+    def _load(path: str) -> Tuple[Optional[AhoCorasick], List[FaqEntry], List[int], List[int]]:
+        """
+        Lit le fichier FAQ et construit l'automate
+
+        Format: {"entries": [{"id", "keywords": [...], "response", "max_words"?, "priority"?}]}
+        """
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        entries: List[FaqEntry] = []
+        patterns: List[str] = []
+        pattern_entry: List[int] = []
+
+        for raw in data["entries"]:
+            entry = FaqEntry(
+                str(raw.get("id", len(entries))),
+                raw["response"],
+                int(raw.get("max_words", 0)),
+                int(raw.get("priority", 0))
+            )
+            for keyword in raw["keywords"]:
+                normalized = normalize_for_similarity(keyword)
+                if normalized:
+                    # Espaces autour: un mot-clé ne correspond qu'à des mots entiers
+                    patterns.append(f" {normalized} ")
+                    pattern_entry.append(len(entries))
+            entries.append(entry)
+
+        automaton = AhoCorasick(patterns) if patterns else None
+        return automaton, entries, pattern_entry, [len(p) for p in patterns]
+
+    def answer(self, text: str, sender: Optional[str] = None) -> Optional[str]:
+        """
+        Cherche une réponse préparée pour le message
+
+        Args:
+            text: Message de l'utilisateur
+            sender: Numéro de l'expéditeur (non utilisé, interface des étapes rapides)
+
+        Returns:
+            Réponse de la FAQ, ou None si aucune entrée ne correspond
+        """
+        self._reload_if_changed()
+        automaton, entries, pattern_entry, pattern_lengths = self._table
+
+        with self._lock:
+            self._stats["lookups"] += 1
+
+        if automaton is None:
+            return None
+
+        normalized = normalize_for_similarity(text)
+        word_count = normalized.count(' ') + 1
+
+        # Score d'une entrée: longueur totale de ses mots-clés trouvés
+        scores: Dict[int, int] = {}
+        for pattern_index in automaton.find(f" {normalized} "):
+            entry_index = pattern_entry[pattern_index]
+            scores[entry_index] = scores.get(entry_index, 0) + pattern_lengths[pattern_index]
+
+        best: Optional[FaqEntry] = None
+        best_key = None
+        for entry_index, score in scores.items():
+            entry = entries[entry_index]
+            if entry.max_words and word_count > entry.max_words:
+                continue
+            key = (entry.priority, score, -entry_index)
+            if best_key is None or key > best_key:
+                best, best_key = entry, key
+
+        if best is None:
+            return None
+
+        with self._lock:
+            self._stats["hits"] += 1
+        logger.info("Réponse FAQ '%s'", best.id)
+        return best.response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de la FAQ
+
+        Returns:
+            Dict avec recherches, réponses, rechargements et taille de la table
+        """
+        automaton, entries, _, _ = self._table
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "entries": len(entries),
+            "patterns": len(automaton.patterns) if automaton else 0,
+            "automaton_states": automaton.size if automaton else 0,
+            "hit_rate": round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0,
+        })
+        return stats
+
+
+_engine: Optional[FaqEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_faq_engine() -> Optional[FaqEngine]:
+    """
+    Retourne le moteur de FAQ partagé du processus
+
+    Returns:
+        Instance FaqEngine, ou None si la FAQ est désactivée
+    """
+    global _engine
+
+    if not Config.FAQ_ENABLED:
+        return None
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = FaqEngine()
+        return _engine
@@ -0,0 +1,193 @@
+"""
+Surveillance de la santé des dépendances en arrière-plan
+Chaque dépendance est sondée à son propre intervalle; /health lit le dernier résultat
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class _Probe:
+    """Sonde d'une dépendance et son dernier résultat"""
+
+    __slots__ = (
+        'name', 'check', 'interval', 'is_healthy',
+        'result', 'healthy', 'checked_at', 'checked_at_wall', 'duration', 'failures'
+    )
+
+    def __init__(
+        self,
+        name: str,
+        check: Callable,
+        interval: float,
+        is_healthy: Callable[[Dict[str, Any]], bool]
+    ):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.is_healthy = is_healthy
+        self.result: Optional[Dict[str, Any]] = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self.checked_at_wall: Optional[datetime] = None
+        self.duration = 0.0
+        self.failures = 0
+
+
+class HealthMonitor:
+    """Sonde les dépendances en tâche de fond et garde les résultats en mémoire"""
+
+    def __init__(self):
+        """Initialise le moniteur (les sondes démarrent avec start())"""
+        self._probes: Dict[str, _Probe] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pid: Optional[int] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def register(
+        self,
+        name: str,
+        check: Callable,
+        interval: float,
+        is_healthy: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> None:
+        """
+        Déclare une dépendance à surveiller
+
+        Args:
+            name: Nom de la dépendance (clé dans /health)
+            check: Fonction (ou coroutine) renvoyant un dict de statut
+            interval: Intervalle entre deux sondes (secondes)
+            is_healthy: Prédicat sur le résultat (par défaut: status == "ok")
+        """
+        self._probes[name] = _Probe(
+            name,
+            check,
+            interval,
+            is_healthy or (lambda result: result.get("status") == "ok")
+        )
+
+    def start(self) -> None:
+        """Démarre un thread par sonde synchrone dans ce processus"""
+        with self._lock:
+            # Après un fork (gunicorn --preload), les threads du parent n'existent plus
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+            for probe in self._probes.values():
+                if asyncio.iscoroutinefunction(probe.check):
+                    continue
+                threading.Thread(
+                    target=self._probe_loop,
+                    args=(probe,),
+                    name=f"health-{probe.name}",
+                    daemon=True
+                ).start()
+
+        logger.info(f"Surveillance de santé démarrée: {', '.join(self._probes)}")
+
+    def start_async(self) -> None:
+        """Démarre une tâche par sonde asynchrone dans la boucle d'événements courante"""
+        for probe in self._probes.values():
+            if asyncio.iscoroutinefunction(probe.check):
+                self._tasks.append(asyncio.get_running_loop().create_task(self._async_probe_loop(probe)))
+        self.start()
+
+    def stop(self) -> None:
+        """Arrête les sondes"""
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def _probe_loop(self, probe: _Probe) -> None:
+        """Boucle d'une sonde synchrone"""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                result = probe.check()
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            self._record(probe, result, time.monotonic() - started)
+            self._stop.wait(probe.interval)
+
+    async def _async_probe_loop(self, probe: _Probe) -> None:
+        """Boucle d'une sonde asynchrone"""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                result = await probe.check()
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            self._record(probe, result, time.monotonic() - started)
+            await asyncio.sleep(probe.interval)
+
+    def _record(self, probe: _Probe, result: Dict[str, Any], duration: float) -> None:
+        """Enregistre le résultat d'une sonde"""
+        try:
+            healthy = bool(probe.is_healthy(result))
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            if not healthy and probe.healthy:
+                logger.warning(f"Dépendance '{probe.name}' en échec: {result}")
+            elif healthy and probe.result is not None and not probe.healthy:
+                logger.info(f"Dépendance '{probe.name}' rétablie")
+            probe.result = result
+            probe.healthy = healthy
+            probe.checked_at = time.monotonic()
+            probe.checked_at_wall = datetime.now(timezone.utc)
+            probe.duration = duration
+            probe.failures = 0 if healthy else probe.failures + 1
+
+    def get_services(self) -> Dict[str, Any]:
+        """
+        Retourne le dernier résultat de chaque sonde, sans appel réseau
+
+        Returns:
+            Dict nom -> résultat, avec l'âge de la donnée et la durée de la sonde
+        """
+        now = time.monotonic()
+        services = {}
+        with self._lock:
+            for probe in self._probes.values():
+                if probe.result is None:
+                    services[probe.name] = {"status": "pending", "healthy": False, "age_seconds": None}
+                    continue
+                entry = dict(probe.result)
+                entry.update({
+                    "healthy": probe.healthy,
+                    "checked_at": probe.checked_at_wall.isoformat(),
+                    "age_seconds": round(now - probe.checked_at, 3),
+                    "stale": now - probe.checked_at > 3 * probe.interval,
+                    "probe_duration_ms": round(probe.duration * 1000, 1),
+                    "consecutive_failures": probe.failures,
+                })
+                services[probe.name] = entry
+        return services
+
+    def is_ready(self) -> bool:
+        """
+        Indique si chaque dépendance a été sondée au moins une fois avec succès récemment
+
+        Returns:
+            True si toutes les sondes sont saines et à jour
+        """
+        now = time.monotonic()
+        with self._lock:
+            return all(
+                probe.result is not None
+                and probe.healthy
+                and now - probe.checked_at <= 3 * probe.interval
+                for probe in self._probes.values()
+            )
@@ -0,0 +1,392 @@
+"""
+Couche de transport HTTP partagée
+Session poolée avec keep-alive pour les appels aux APIs externes
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, Iterator, Callable
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 optionnel
+    httpx = None
+
+
+class StreamedResponse:
+    """Réponse dont le corps n'est lu qu'à la demande, par morceaux"""
+
+    __slots__ = ('status_code', 'headers', '_iter_chunks')
+
+    def __init__(self, status_code: int, headers: Any, iter_chunks: Callable[[int], Iterator[bytes]]):
+        self.status_code = status_code
+        self.headers = headers
+        self._iter_chunks = iter_chunks
+
+    def iter_chunks(self, chunk_size: int) -> Iterator[bytes]:
+        """Lit le corps par morceaux d'au plus chunk_size octets"""
+        return self._iter_chunks(chunk_size)
+
+
+class HttpTransport:
+    """Transport HTTP poolé partagé par les services"""
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        pool_connections: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        keep_alive: Optional[bool] = None,
+        http2: Optional[bool] = None
+    ):
+        """
+        Initialise la session HTTP
+
+        Args:
+            pool_size: Nombre max de connexions conservées par hôte
+            pool_connections: Nombre d'hôtes distincts gardés en cache
+            connect_timeout: Timeout d'établissement de connexion (secondes)
+            read_timeout: Timeout de lecture par défaut (secondes)
+            keep_alive: Réutiliser les connexions entre les requêtes
+            http2: Utiliser HTTP/2 (nécessite httpx[http2])
+        """
+        self.pool_size = pool_size or Config.HTTP_POOL_SIZE
+        self.pool_connections = pool_connections or Config.HTTP_POOL_CONNECTIONS
+        self.connect_timeout = connect_timeout or Config.HTTP_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or Config.HTTP_READ_TIMEOUT
+        self.keep_alive = Config.HTTP_KEEP_ALIVE if keep_alive is None else keep_alive
+        self.http2 = Config.HTTP_HTTP2 if http2 is None else http2
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._in_flight = 0
+        self._errors = 0
+
+        if self.http2 and httpx is None:
+            logger.warning("HTTP/2 demandé mais httpx n'est pas installé, repli sur HTTP/1.1")
+            self.http2 = False
+
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size * self.pool_connections,
+                    max_keepalive_connections=self.pool_size if self.keep_alive else 0
+                ),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            )
+            self._session = None
+        else:
+            self._client = None
+            self._adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_size
+            )
+            self._session = requests.Session()
+            self._session.mount('https://', self._adapter)
+            self._session.mount('http://', self._adapter)
+            if not self.keep_alive:
+                self._session.headers['Connection'] = 'close'
+
+        logger.info(
+            f"Transport HTTP initialisé (pool: {self.pool_size}, "
+            f"keep-alive: {self.keep_alive}, http2: {self.http2})"
+        )
+
+    def _timeout(self, timeout: Optional[float]) -> Tuple[float, float]:
+        """Construit le couple (connexion, lecture)"""
+        return (self.connect_timeout, timeout or self.read_timeout)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Exécute une requête HTTP sur une connexion du pool
+
+        Args:
+            method: Méthode HTTP
+            url: URL cible
+            headers: En-têtes de la requête
+            json: Corps JSON éventuel
+            timeout: Timeout de lecture (secondes)
+
+        Returns:
+            Objet réponse (interface compatible requests)
+
+        Raises:
+            requests.exceptions.RequestException: En cas d'erreur réseau
+        """
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+
+        try:
+            if self._client is not None:
+                return self._httpx_request(method, url, headers, json, timeout)
+
+            return self._session.request(
+                method,
+                url,
+                headers=headers,
+                json=json,
+                timeout=self._timeout(timeout)
+            )
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _httpx_request(self, method, url, headers, json, timeout):
+        """Exécute la requête via httpx en traduisant les erreurs en exceptions requests"""
+        connect, read = self._timeout(timeout)
+        try:
+            return self._client.request(
+                method,
+                url,
+                headers=headers,
+                json=json,
+                timeout=httpx.Timeout(read, connect=connect)
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def stream_lines(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        Exécute une requête et lit la réponse ligne par ligne (SSE)
+
+        Args:
+            method: Méthode HTTP
+            url: URL cible
+            headers: En-têtes de la requête
+            json: Corps JSON éventuel
+            timeout: Timeout de lecture entre deux lignes (secondes)
+
+        Yields:
+            Tuples (code HTTP, ligne décodée)
+
+        Raises:
+            requests.exceptions.RequestException: En cas d'erreur réseau
+        """
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+
+        try:
+            if self._client is not None:
+                connect, read = self._timeout(timeout)
+                try:
+                    with self._client.stream(
+                        method,
+                        url,
+                        headers=headers,
+                        json=json,
+                        timeout=httpx.Timeout(read, connect=connect)
+                    ) as response:
+                        for line in response.iter_lines():
+                            yield response.status_code, line
+                except httpx.TimeoutException as e:
+                    raise requests.exceptions.Timeout(str(e)) from e
+                except httpx.HTTPError as e:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+                return
+
+            response = self._session.request(
+                method,
+                url,
+                headers=headers,
+                json=json,
+                timeout=self._timeout(timeout),
+                stream=True
+            )
+            # Le contexte rend la connexion au pool même si le flux est abandonné
+            with response:
+                if response.encoding is None:
+                    response.encoding = 'utf-8'
+                for line in response.iter_lines(decode_unicode=True):
+                    yield response.status_code, line or ""
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    @contextmanager
+    def open_stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[StreamedResponse]:
+        """
+        Ouvre un GET dont le corps est lu par morceaux (téléchargements)
+
+        Les redirections sont suivies; la connexion retourne au pool à la
+        sortie du bloc, même si le corps n'a pas été lu en entier.
+
+        Args:
+            url: URL cible
+            headers: En-têtes de la requête
+            timeout: Timeout de lecture entre deux morceaux (secondes)
+
+        Yields:
+            StreamedResponse (code HTTP, en-têtes, lecture par morceaux)
+
+        Raises:
+            requests.exceptions.RequestException: En cas d'erreur réseau
+        """
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+
+        try:
+            if self._client is not None:
+                connect, read = self._timeout(timeout)
+                try:
+                    with self._client.stream(
+                        'GET',
+                        url,
+                        headers=headers,
+                        follow_redirects=True,
+                        timeout=httpx.Timeout(read, connect=connect)
+                    ) as response:
+                        yield StreamedResponse(response.status_code, response.headers, response.iter_bytes)
+                except httpx.TimeoutException as e:
+                    raise requests.exceptions.Timeout(str(e)) from e
+                except httpx.HTTPError as e:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+                return
+
+            response = self._session.get(
+                url,
+                headers=headers,
+                timeout=self._timeout(timeout),
+                stream=True
+            )
+            with response:
+                yield StreamedResponse(
+                    response.status_code,
+                    response.headers,
+                    lambda chunk_size: response.iter_content(chunk_size)
+                )
+        except requests.exceptions.RequestException:
+            # Seules les erreurs réseau comptent: le bloc appelant peut abandonner la lecture
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def post(self, url: str, **kwargs):
+        """Raccourci pour une requête POST"""
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        """Raccourci pour une requête GET"""
+        return self.request('GET', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques du pool de connexions
+
+        Returns:
+            Dict avec les connexions utilisées, inactives et les handshakes évités
+        """
+        with self._lock:
+            stats = {
+                "http2": self.http2,
+                "keep_alive": self.keep_alive,
+                "pool_size": self.pool_size,
+                "requests": self._requests,
+                "errors": self._errors,
+                "in_flight": self._in_flight,
+            }
+
+        if self._client is not None:
+            # httpcore expose les connexions ouvertes du pool
+            pool = getattr(self._client._transport, '_pool', None)
+            connections = list(getattr(pool, 'connections', []))
+            idle = sum(1 for conn in connections if conn.is_idle())
+            stats.update({
+                "connections_in_use": len(connections) - idle,
+                "connections_idle": idle,
+                "new_connections": None,
+                "handshakes_avoided": None,
+            })
+            return stats
+
+        idle = 0
+        new_connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            new_connections += pool.num_connections
+            idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        stats.update({
+            "connections_in_use": stats["in_flight"],
+            "connections_idle": idle,
+            "new_connections": new_connections,
+            "handshakes_avoided": max(0, stats["requests"] - new_connections),
+        })
+        return stats
+
+    def close(self) -> None:
+        """Ferme toutes les connexions du pool"""
+        if self._client is not None:
+            self._client.close()
+        else:
+            self._session.close()
+
+
+_transport: Optional[HttpTransport] = None
+_transport_pid: Optional[int] = None
+_transport_lock = threading.Lock()
+
+
+def get_http_transport() -> HttpTransport:
+    """
+    Retourne le transport partagé du processus
+
+    Un nouveau transport est créé après un fork pour ne pas partager
+    les sockets du processus parent.
+
+    Returns:
+        Instance HttpTransport partagée
+    """
+    global _transport, _transport_pid
+
+    with _transport_lock:
+        if _transport is None or _transport_pid != os.getpid():
+            _transport = HttpTransport()
+            _transport_pid = os.getpid()
+        return _transport
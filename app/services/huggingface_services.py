@@ -3,36 +3,85 @@ Service pour interagir avec l'API Hugging Face
 Gère la génération de texte avec les modèles de langage
 """
 
+import threading
 import requests
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Iterator, Tuple
 from app.config import Config
+from app.services.response_cache import ResponseCache, get_response_cache
+from app.services.near_duplicate_cache import get_near_duplicate_cache
+from app.services.batching import MicroBatcher
+from app.services.single_flight import SingleFlight, SingleFlightTimeout
+from app.services.conversation_store import Exchange, select_history
+from app.services.prompt_templates import get_prompt_registry
+from app.services.backends import InferenceBackend, ModelLoadingError, create_backend
+from app.services.streaming import SentenceChunker
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryLater,
+    backoff_delay,
+    get_retry_scheduler,
+)
 from app.utils.logger import setup_logger
+from app.utils.prometheus import (
+    CACHE_EXACT_HIT,
+    CACHE_EXACT_MISS,
+    CACHE_NEAR_HIT,
+    CACHE_NEAR_MISS,
+    GENERATION_SECONDS,
+)
+from app.utils.profiling import traced
 
 logger = setup_logger(__name__)
 
 
 class HuggingFaceService:
-    """Service pour gérer les interactions avec Hugging Face"""
+    """Service de génération de réponses (moteur d'inférence choisi par la config)"""
     
-    def __init__(self):
-        """Initialise le service Hugging Face"""
-        self.api_key = Config.HUGGINGFACE_API_KEY
-        self.model = Config.HUGGINGFACE_MODEL
-        self.api_url = Config.HUGGINGFACE_API_URL
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+    def __init__(self, backend: Optional[InferenceBackend] = None):
+        """
+        Initialise le service
+        
+        Args:
+            backend: Moteur d'inférence (par défaut: celui de INFERENCE_BACKEND)
+        """
+        self.backend = backend or create_backend()
+        self.model = self.backend.model
+        self.generation_params = self.backend.generation_params
+        self.cache = get_response_cache()
+        self.near_cache = get_near_duplicate_cache()
+        self.cache_namespace = (
+            self.near_cache.make_namespace(self.model, self.generation_params)
+            if self.near_cache is not None else None
+        )
+        self.batcher = (
+            MicroBatcher(self._infer_batch, name="huggingface")
+            if Config.HF_BATCHING_ENABLED else None
+        )
+        self.single_flight = SingleFlight() if Config.SINGLE_FLIGHT_ENABLED else None
+        self.prompt = get_prompt_registry().resolve(self.model)
+        self.prompt_token_budget = self.prompt.budget
+        self.circuit_breaker = CircuitBreaker("huggingface")
+        self.retry_stats = {
+            "attempts": 0,
+            "retries": 0,
+            "deferred": 0,
+            "fail_fast": 0,
         }
-        self.generation_params = Config.get_huggingface_params()
+        self._stats_lock = threading.Lock()
         
-        logger.info(f"Service Hugging Face initialisé avec modèle: {self.model}")
+        logger.info(f"Service de génération initialisé: moteur {self.backend.name}, modèle {self.model}")
     
+    @traced('generate_response')
     def generate_response(
         self,
         prompt: str,
         user_name: str = "User",
-        max_retries: int = 3
+        max_retries: int = 3,
+        history: Optional[List[Exchange]] = None,
+        attempt: int = 0,
+        defer_retries: bool = False
     ) -> str:
         """
         Génère une réponse à partir d'un prompt
@@ -41,152 +90,400 @@ class HuggingFaceService:
             prompt: Texte du message utilisateur
             user_name: Nom de l'utilisateur
             max_retries: Nombre de tentatives en cas d'erreur
+            history: Échanges précédents de la conversation (optionnel)
+            attempt: Numéro de la tentative pour un traitement replanifié
+            defer_retries: Lever RetryLater plutôt que d'attendre entre deux tentatives
             
         Returns:
             Réponse générée par le modèle
+            
+        Raises:
+            RetryLater: Si defer_retries est actif et qu'une nouvelle tentative est prévue
         """
-        # Construire le prompt avec contexte
-        formatted_prompt = self._format_prompt(prompt, user_name)
+        history = self._select_history(prompt, history)
+        request_key, namespace = self._cache_keys(prompt, user_name, history)
         
-        payload = {
-            "inputs": formatted_prompt,
-            "parameters": self.generation_params
-        }
+        cached = self._lookup_cached(prompt, request_key, namespace, history)
+        if cached is not None:
+            return cached
         
-        for attempt in range(max_retries):
+        def generate() -> Optional[str]:
+            # Construire le prompt avec contexte
+            formatted_prompt = self._format_prompt(prompt, user_name, history)
+            generated = self._generate(formatted_prompt, max_retries, attempt, defer_retries)
+            
+            if generated is not None:
+                self._store_response(prompt, request_key, namespace, history, generated)
+            return generated
+        
+        if self.single_flight is not None:
+            # Les demandes identiques simultanées partagent un seul appel
             try:
-                logger.info(f"Génération de réponse (tentative {attempt + 1}/{max_retries})")
-                logger.debug(f"Prompt: {formatted_prompt[:100]}...")
-                
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=60
-                )
-                
-                # Gérer les cas spécifiques
-                if response.status_code == 503:
-                    # Modèle en cours de chargement
-                    logger.warning("Modèle en cours de chargement, attente...")
-                    estimated_time = response.json().get('estimated_time', 20)
-                    time.sleep(min(estimated_time, 30))
-                    continue
+                generated_text = self.single_flight.do(request_key, generate)
+            except SingleFlightTimeout as e:
+                logger.error(f"Génération partagée expirée: {e}")
+                generated_text = None
+        else:
+            generated_text = generate()
+        
+        if generated_text is None:
+            # Si toutes les tentatives échouent (jamais mis en cache)
+            return self._get_fallback_response()
+        
+        return generated_text
+    
+    def stream_response(
+        self,
+        prompt: str,
+        user_name: str = "User",
+        history: Optional[List[Exchange]] = None
+    ) -> Iterator[str]:
+        """
+        Génère une réponse en flux, découpée en messages prêts à envoyer
+        
+        La première phrase est produite dès qu'elle est complète, la suite
+        par blocs de paragraphes.
+        
+        Args:
+            prompt: Texte du message utilisateur
+            user_name: Nom de l'utilisateur
+            history: Échanges précédents de la conversation (optionnel)
+            
+        Yields:
+            Messages successifs de la réponse
+            
+        Raises:
+            ModelLoadingError: Si le modèle est en cours de chargement
+            requests.exceptions.RequestException: En cas d'erreur HTTP
+        """
+        history = self._select_history(prompt, history)
+        request_key, namespace = self._cache_keys(prompt, user_name, history)
+        
+        cached = self._lookup_cached(prompt, request_key, namespace, history)
+        if cached is not None:
+            yield cached
+            return
+        
+        formatted_prompt = self._format_prompt(prompt, user_name, history)
+        chunker = SentenceChunker()
+        parts = []
+        
+        for token in self._stream_tokens(formatted_prompt):
+            parts.append(token)
+            for chunk in chunker.feed(token):
+                yield chunk
+        
+        remainder = chunker.flush()
+        if remainder:
+            yield remainder
+        
+        generated_text = "".join(parts).strip()
+        if generated_text:
+            self._store_response(prompt, request_key, namespace, history, generated_text)
+    
+    def _stream_tokens(self, formatted_prompt: str) -> Iterator[str]:
+        """
+        Lit le flux de tokens du moteur d'inférence, sous la
+        protection du disjoncteur
+        
+        Args:
+            formatted_prompt: Prompt formaté
+            
+        Yields:
+            Texte de chaque token généré
+            
+        Raises:
+            CircuitOpenError: Si le disjoncteur refuse l'appel
+        """
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError("Disjoncteur Hugging Face ouvert")
+        
+        started = time.monotonic()
+        emitted = False
+        finished = False
+        try:
+            for token in self.backend.stream(formatted_prompt):
+                emitted = True
+                yield token
+            finished = True
+        except Exception:
+            finished = True
+            self.circuit_breaker.record_failure()
+            GENERATION_SECONDS.labels("stream_error", "1").observe(time.monotonic() - started)
+            raise
+        finally:
+            # Flux fermé par l'appelant (GeneratorExit): le moteur a répondu s'il a émis
+            if not finished:
+                if emitted:
+                    self.circuit_breaker.record_success()
+                else:
+                    self.circuit_breaker.release()
+        
+        self.circuit_breaker.record_success()
+        GENERATION_SECONDS.labels("stream_success", "1").observe(time.monotonic() - started)
+    
+    def _select_history(
+        self,
+        prompt: str,
+        history: Optional[List[Exchange]]
+    ) -> List[Exchange]:
+        """Garde les échanges récents qui tiennent dans le budget du modèle"""
+        budget = self.prompt_token_budget - self.prompt.overhead_tokens - self.prompt.count_tokens(prompt)
+        return select_history(history or [], budget)
+    
+    def _cache_keys(
+        self,
+        prompt: str,
+        user_name: str,
+        history: List[Exchange]
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Clé du cache exact et espace du cache approximatif d'une requête
+        
+        Quand le gabarit insère le nom de l'utilisateur dans le prompt, la
+        réponse peut le citer (« Bonjour Alice »): le nom fait alors partie
+        des deux clés, sinon elle serait servie à un autre expéditeur.
+        
+        Args:
+            prompt: Message de l'utilisateur
+            user_name: Nom de l'utilisateur
+            history: Historique retenu pour le prompt
+            
+        Returns:
+            Tuple (clé exacte, espace de noms du cache approximatif)
+        """
+        name = user_name if self.prompt.template.uses_user_name else None
+        request_key = ResponseCache.make_key(
+            prompt, self.model, self.generation_params, history=history, user_name=name
+        )
+        namespace = self.cache_namespace
+        if namespace is not None and name is not None:
+            namespace = self.near_cache.make_namespace(
+                self.model, dict(self.generation_params, user_name=name)
+            )
+        return request_key, namespace
+    
+    @traced('cache_lookup')
+    def _lookup_cached(
+        self,
+        prompt: str,
+        request_key: str,
+        namespace: Optional[int],
+        history: List[Exchange]
+    ) -> Optional[str]:
+        """
+        Recherche une réponse dans le cache exact puis dans le cache approximatif
+        
+        Args:
+            prompt: Message de l'utilisateur
+            request_key: Clé de cache de la requête
+            namespace: Espace de noms du cache approximatif
+            history: Historique retenu pour le prompt
+            
+        Returns:
+            Réponse en cache ou None
+        """
+        if self.cache is not None:
+            cached = self.cache.get(request_key)
+            if cached is not None:
+                CACHE_EXACT_HIT.inc()
+                logger.info("Réponse servie depuis le cache")
+                return cached
+            CACHE_EXACT_MISS.inc()
+        
+        # Le cache approximatif ne vaut que pour les questions sans contexte
+        if self.near_cache is not None and not history:
+            similar = self.near_cache.get(prompt, namespace)
+            if similar is None:
+                CACHE_NEAR_MISS.inc()
+            else:
+                CACHE_NEAR_HIT.inc()
+                logger.info("Réponse servie depuis le cache approximatif")
+                if self.cache is not None:
+                    self.cache.set(request_key, similar)
+                return similar
+        
+        return None
+    
+    def _store_response(
+        self,
+        prompt: str,
+        request_key: str,
+        namespace: Optional[int],
+        history: List[Exchange],
+        response: str
+    ) -> None:
+        """Enregistre une réponse générée dans les caches"""
+        if self.cache is not None:
+            self.cache.set(request_key, response)
+        if self.near_cache is not None and not history:
+            self.near_cache.set(prompt, namespace, response)
+    
+    def _generate(
+        self,
+        formatted_prompt: str,
+        max_retries: int,
+        first_attempt: int = 0,
+        defer_retries: bool = False
+    ) -> Optional[str]:
+        """
+        Appelle le modèle avec plusieurs tentatives
+        
+        Args:
+            formatted_prompt: Prompt déjà formaté pour le modèle
+            max_retries: Nombre de tentatives en cas d'erreur
+            first_attempt: Numéro de la tentative courante (0 au premier passage)
+            defer_retries: Lever RetryLater au lieu d'attendre entre deux tentatives
+            
+        Returns:
+            Texte généré, ou None si toutes les tentatives ont échoué
+            
+        Raises:
+            RetryLater: Si defer_retries est actif et qu'une nouvelle tentative est prévue
+        """
+        for attempt in range(first_attempt, max_retries):
+            if not self.circuit_breaker.allow_request():
+                # Service amont en panne: échec immédiat vers la réponse de secours
+                logger.warning("Disjoncteur Hugging Face ouvert, réponse de secours")
+                with self._stats_lock:
+                    self.retry_stats["fail_fast"] += 1
+                return None
+            
+            with self._stats_lock:
+                self.retry_stats["attempts"] += 1
+            
+            started = time.monotonic()
+            status = "error"
+            try:
+                logger.info("Génération de réponse (tentative %d/%d)", attempt + 1, max_retries)
+                logger.debug("Prompt: %.100s...", formatted_prompt)
                 
-                response.raise_for_status()
-                result = response.json()
+                result = self._infer(formatted_prompt)
+                self.circuit_breaker.record_success()
                 
-                # Extraire la réponse
-                generated_text = self._extract_response(result)
+                # Extraire la réponse (sans l'éventuel écho du prompt)
+                generated_text = self.prompt.extract(result)
                 
                 if generated_text:
-                    logger.info(f"Réponse générée avec succès: {generated_text[:100]}...")
+                    status = "success"
+                    logger.info("Réponse générée avec succès: %.100s...", generated_text)
                     return generated_text
-                else:
-                    logger.warning("Réponse vide du modèle")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
+                
+                status = "empty"
+                logger.warning("Réponse vide du modèle")
+                delay = backoff_delay(attempt)
+                
+            except ModelLoadingError as e:
+                # Modèle en cours de chargement
+                status = "loading"
+                logger.warning("Modèle en cours de chargement, attente...")
+                # Le service répond: ni succès ni échec, le délai estimé régit la reprise
+                self.circuit_breaker.release()
+                delay = min(e.estimated_time, Config.HF_RETRY_MAX_DELAY)
                 
             except requests.exceptions.Timeout:
+                status = "timeout"
                 logger.error(f"Timeout lors de la requête (tentative {attempt + 1})")
-                if attempt < max_retries - 1:
-                    time.sleep(5)
-                    continue
+                self.circuit_breaker.record_failure()
+                delay = backoff_delay(attempt)
                     
             except requests.exceptions.RequestException as e:
+                status = "http_error"
                 logger.error(f"Erreur API Hugging Face: {e}")
                 if hasattr(e, 'response') and e.response is not None:
                     logger.error(f"Réponse: {e.response.text}")
-                if attempt < max_retries - 1:
-                    time.sleep(5)
-                    continue
+                self.circuit_breaker.record_failure()
+                delay = backoff_delay(attempt)
                     
             except Exception as e:
                 logger.error(f"Erreur inattendue: {e}", exc_info=True)
-                if attempt < max_retries - 1:
-                    time.sleep(5)
-                    continue
+                self.circuit_breaker.record_failure()
+                delay = backoff_delay(attempt)
+            
+            finally:
+                GENERATION_SECONDS.labels(status, str(attempt + 1)).observe(time.monotonic() - started)
+            
+            if attempt >= max_retries - 1:
+                break
+            
+            with self._stats_lock:
+                self.retry_stats["retries"] += 1
+            
+            if defer_retries:
+                # Libérer le worker: le message sera remis en file après le délai
+                with self._stats_lock:
+                    self.retry_stats["deferred"] += 1
+                raise RetryLater(delay, attempt + 1)
+            
+            time.sleep(delay)
         
-        # Si toutes les tentatives échouent
-        return self._get_fallback_response()
+        return None
     
-    def _format_prompt(self, message: str, user_name: str) -> str:
+    def get_resilience_stats(self) -> Dict[str, Any]:
         """
-        Formate le prompt selon le modèle utilisé
+        Retourne l'état du disjoncteur et les compteurs de tentatives
         
-        Args:
-            message: Message de l'utilisateur
-            user_name: Nom de l'utilisateur
-            
         Returns:
-            Prompt formaté
+            Dict avec l'état du disjoncteur et les compteurs de retries
         """
-        # Détection du type de modèle pour adapter le format
-        model_lower = self.model.lower()
+        with self._stats_lock:
+            retries = dict(self.retry_stats)
         
-        if 'mistral' in model_lower or 'mixtral' in model_lower:
-            # Format Mistral avec [INST]
-            return f"""[INST] Tu es un assistant WhatsApp utile et amical.
-Réponds de manière concise et naturelle en 2-3 phrases maximum.
-
-{user_name} te demande: {message} [/INST]"""
-        
-        elif 'llama' in model_lower:
-            # Format Llama 2
-            return f"""<s>[INST] <<SYS>>
-Tu es un assistant WhatsApp utile et amical.
-Réponds de manière concise et naturelle en 2-3 phrases maximum.
-<</SYS>>
-
-{user_name} te demande: {message} [/INST]"""
+        return {
+            "circuit_breaker": self.circuit_breaker.get_stats(),
+            "retries": retries,
+            "scheduler": get_retry_scheduler().get_stats()
+        }
+    
+    @traced('inference')
+    def _infer(self, formatted_prompt: str) -> str:
+        """
+        Exécute une inférence, via le micro-batching s'il est activé
         
-        elif 'flan' in model_lower:
-            # Format Flan-T5 (simple)
-            return f"Réponds à cette question de manière concise: {message}"
+        Args:
+            formatted_prompt: Prompt formaté
+            
+        Returns:
+            Texte généré brut pour ce prompt
+        """
+        if self.batcher is not None:
+            future = self.batcher.submit(formatted_prompt)
+            return future.result(timeout=Config.HTTP_READ_TIMEOUT + self.batcher.max_wait)
         
-        else:
-            # Format générique
-            return f"""Assistant: Tu es un assistant WhatsApp.
-User ({user_name}): {message}
-Assistant:"""
+        return self.backend.generate(formatted_prompt)
     
-    def _extract_response(self, api_response: Any) -> Optional[str]:
+    def _infer_batch(self, prompts: List[str]) -> List[str]:
         """
-        Extrait le texte généré de la réponse API
+        Exécute une inférence groupée
         
         Args:
-            api_response: Réponse de l'API Hugging Face
+            prompts: Prompts formatés
             
         Returns:
-            Texte généré ou None
+            Un texte généré par prompt
         """
-        try:
-            if isinstance(api_response, list) and len(api_response) > 0:
-                # Format standard: [{"generated_text": "..."}]
-                if isinstance(api_response[0], dict):
-                    generated = api_response[0].get('generated_text', '')
-                    
-                    # Nettoyer la réponse (enlever le prompt si présent)
-                    if '[/INST]' in generated:
-                        generated = generated.split('[/INST]')[-1].strip()
-                    elif 'Assistant:' in generated:
-                        parts = generated.split('Assistant:')
-                        generated = parts[-1].strip() if len(parts) > 1 else generated
-                    
-                    return generated.strip()
-                else:
-                    return str(api_response[0]).strip()
-            
-            elif isinstance(api_response, dict):
-                # Autre format possible
-                return api_response.get('generated_text', '').strip()
-            
-            return None
+        return self.backend.generate_batch(prompts)
+    
+    @traced('format_prompt')
+    def _format_prompt(
+        self,
+        message: str,
+        user_name: str,
+        history: Optional[List[Exchange]] = None
+    ) -> str:
+        """
+        Formate le prompt avec le gabarit résolu pour le modèle
+        
+        Args:
+            message: Message de l'utilisateur
+            user_name: Nom de l'utilisateur
+            history: Échanges précédents déjà bornés au budget de tokens
             
-        except Exception as e:
-            logger.error(f"Erreur lors de l'extraction de la réponse: {e}")
-            return None
+        Returns:
+            Prompt formaté (réduit au budget de tokens du modèle)
+        """
+        prompt, _ = self.prompt.format(message, user_name, history or [])
+        return prompt
     
     def _get_fallback_response(self) -> str:
         """
@@ -208,17 +505,7 @@ Assistant:"""
             Dict avec les infos du modèle
         """
         try:
-            response = requests.get(
-                self.api_url,
-                headers=self.headers,
-                timeout=10
-            )
-            
-            return {
-                "status": response.status_code,
-                "available": response.status_code == 200,
-                "message": response.text if response.status_code != 200 else "OK"
-            }
+            return self.backend.check_status()
             
         except Exception as e:
             logger.error(f"Erreur lors de la vérification du modèle: {e}")
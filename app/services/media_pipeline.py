@@ -0,0 +1,408 @@
+"""
+Pipeline des médias entrants
+Téléchargement en flux vers le disque sur un pool d'E/S borné, plafonds de taille
+et de type, hachage SHA-256 pendant la lecture pour ne stocker qu'une fois un
+même contenu
+"""
+
+import base64
+import errno
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlsplit
+from app.config import Config
+from app.services.http_transport import HttpTransport, get_http_transport
+from app.utils.logger import setup_logger
+from app.utils.metrics import Histogram
+from app.utils.profiling import activate, current_trace, span
+from app.utils.prometheus import MEDIA_DOWNLOADS, MEDIA_DOWNLOAD_SECONDS
+
+logger = setup_logger(__name__)
+
+DEFAULT_TWILIO_HOST = 'api.twilio.com'
+
+
+class MediaRejected(Exception):
+    """Média refusé par les plafonds (type non accepté, taille dépassée...)"""
+
+    def __init__(self, reason: str, detail: str = ''):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+        self.detail = detail
+
+
+class MediaPipeline:
+    """Télécharge les médias des webhooks sans les charger en mémoire"""
+
+    def __init__(
+        self,
+        storage_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        allowed_types: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        index_size: Optional[int] = None,
+        transport: Optional[HttpTransport] = None
+    ):
+        """
+        Initialise le pipeline (le pool d'E/S démarre au premier média)
+
+        Args:
+            storage_dir: Dossier de stockage des médias
+            max_bytes: Taille maximale d'un média
+            allowed_types: Préfixes de types MIME acceptés, séparés par des virgules
+            concurrency: Téléchargements simultanés
+            max_pending: Médias en attente ou en cours au-delà desquels on refuse
+            chunk_size: Taille des morceaux lus et écrits
+            timeout: Timeout de lecture entre deux morceaux (secondes)
+            deadline: Durée totale maximale d'un téléchargement (secondes)
+            index_size: Nombre d'empreintes gardées en mémoire
+            transport: Transport HTTP (par défaut: celui du processus)
+        """
+        self.storage_dir = storage_dir or Config.MEDIA_DIR
+        self.max_bytes = max_bytes or Config.MEDIA_MAX_BYTES
+        self.allowed_types = tuple(
+            prefix.strip().lower()
+            for prefix in (allowed_types or Config.MEDIA_ALLOWED_TYPES).split(',')
+            if prefix.strip()
+        )
+        self.concurrency = max(1, concurrency or Config.MEDIA_DOWNLOAD_CONCURRENCY)
+        self.max_pending = max(1, max_pending or Config.MEDIA_QUEUE_MAXSIZE)
+        self.chunk_size = chunk_size or Config.MEDIA_CHUNK_SIZE
+        self.timeout = timeout or Config.MEDIA_DOWNLOAD_TIMEOUT
+        self.deadline = deadline or Config.MEDIA_DOWNLOAD_DEADLINE
+        self.index_size = index_size or Config.MEDIA_INDEX_SIZE
+        self._transport = transport
+
+        # Les identifiants Twilio ne partent que vers l'API Twilio
+        self._auth_hosts = {DEFAULT_TWILIO_HOST}
+        if Config.TWILIO_API_BASE:
+            self._auth_hosts.add(urlsplit(Config.TWILIO_API_BASE).netloc)
+        self._auth_header = None
+        if Config.TWILIO_ACCOUNT_SID and Config.TWILIO_AUTH_TOKEN:
+            credentials = f"{Config.TWILIO_ACCOUNT_SID}:{Config.TWILIO_AUTH_TOKEN}".encode()
+            self._auth_header = f"Basic {base64.b64encode(credentials).decode()}"
+
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        # Empreinte SHA-256 -> média déjà stocké
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.download_latency = Histogram()
+        self._stats = {
+            "submitted": 0,
+            "stored": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "errors": 0,
+            "busy": 0,
+            "bytes_downloaded": 0,
+            "bytes_deduplicated": 0,
+        }
+
+    @property
+    def transport(self) -> HttpTransport:
+        """Transport HTTP utilisé pour les téléchargements"""
+        return self._transport or get_http_transport()
+
+    def _ensure_started(self) -> None:
+        """Crée le pool d'E/S dans ce processus (verrou pris)"""
+        if self._pid == os.getpid():
+            return
+
+        # Après un fork, les threads du parent n'existent plus
+        self._pending = 0
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="media-download"
+        )
+        os.makedirs(os.path.join(self.storage_dir, 'tmp'), exist_ok=True)
+        logger.info(
+            f"Pipeline médias démarré: {self.concurrency} téléchargement(s) simultané(s), "
+            f"max {self.max_bytes // 1024} Ko, stockage {self.storage_dir}"
+        )
+
+    def submit(self, media_list: List[Dict[str, Any]]) -> Optional[Future]:
+        """
+        Met les médias d'un message en file de téléchargement sans bloquer
+
+        Args:
+            media_list: Médias du webhook (dicts avec 'url' et 'content_type')
+
+        Returns:
+            Future résolue avec un résultat par média (dans l'ordre),
+            ou None si le pool est saturé
+        """
+        batch: Future = Future()
+        if not media_list:
+            batch.set_result([])
+            return batch
+
+        with self._lock:
+            self._ensure_started()
+            if self._pending + len(media_list) > self.max_pending:
+                self._stats["busy"] += 1
+                logger.warning(
+                    "Pipeline médias saturé (%d en attente), %d média(s) refusé(s)",
+                    self._pending, len(media_list)
+                )
+                return None
+            self._pending += len(media_list)
+            self._stats["submitted"] += len(media_list)
+            executor = self._executor
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(media_list)
+        remaining = [len(media_list)]
+        trace = current_trace()
+
+        def item_done(index: int, future: Future) -> None:
+            results[index] = future.result()
+            with self._lock:
+                self._pending -= 1
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                batch.set_result(results)
+
+        enqueued_at = time.monotonic()
+        for index, media in enumerate(media_list):
+            executor.submit(self._fetch_traced, media, trace, enqueued_at).add_done_callback(
+                partial(item_done, index)
+            )
+        return batch
+
+    def _fetch_traced(self, media: Dict[str, Any], trace, enqueued_at: float) -> Dict[str, Any]:
+        """Télécharge un média en rattachant l'attente et le téléchargement à la trace"""
+        if trace is not None:
+            trace.add_wait('media_queue', time.monotonic() - enqueued_at)
+        with activate(trace), span('media_download'):
+            return self.fetch(media)
+
+    def fetch(self, media: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Télécharge et stocke un média (appelé dans le pool d'E/S)
+
+        Args:
+            media: Dict avec 'url' et 'content_type' (type annoncé par Twilio)
+
+        Returns:
+            Dict avec le statut (stored, duplicate, rejected, error), le type,
+            la taille, l'empreinte SHA-256 et le chemin du fichier
+        """
+        declared_type = self._normalize_type(media.get('content_type', ''))
+        started = time.monotonic()
+
+        try:
+            if not media.get('url'):
+                raise MediaRejected("missing_url")
+            # Type annoncé dans le webhook: refus avant toute connexion
+            if declared_type and not self.is_allowed(declared_type):
+                raise MediaRejected("type", declared_type)
+            result = self._download(media['url'], declared_type)
+        except MediaRejected as e:
+            with self._lock:
+                self._stats["rejected"] += 1
+            MEDIA_DOWNLOADS.labels('rejected').inc()
+            logger.info("Média refusé (%s)", e)
+            return {
+                "status": "rejected",
+                "reason": e.reason,
+                "detail": e.detail,
+                "content_type": declared_type,
+            }
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            MEDIA_DOWNLOADS.labels('error').inc()
+            logger.error(f"Échec du téléchargement du média {media.get('url')}: {e}")
+            return {"status": "error", "reason": type(e).__name__, "content_type": declared_type}
+
+        elapsed = time.monotonic() - started
+        self.download_latency.observe(elapsed)
+        MEDIA_DOWNLOAD_SECONDS.observe(elapsed)
+        MEDIA_DOWNLOADS.labels(result["status"]).inc()
+        result["seconds"] = round(elapsed, 4)
+        return result
+
+    def _download(self, url: str, declared_type: str) -> Dict[str, Any]:
+        """Lit le corps par morceaux vers un fichier temporaire, en le hachant au passage"""
+        # Le timeout par morceau ne borne pas un serveur qui envoie quelques octets
+        # juste avant chaque échéance: la durée totale est plafonnée à part
+        deadline = time.monotonic() + self.deadline
+        with self.transport.open_stream(url, headers=self._auth_headers(url), timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise IOError(f"HTTP {response.status_code}")
+
+            content_type = self._normalize_type(response.headers.get('Content-Type', '')) or declared_type
+            if not self.is_allowed(content_type):
+                raise MediaRejected("type", content_type or "inconnu")
+
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                raise MediaRejected("too_large", length)
+
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.storage_dir, 'tmp'), suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_chunks(self.chunk_size):
+                        size += len(chunk)
+                        # Content-Length absent ou faux: le plafond s'applique pendant la lecture
+                        if size > self.max_bytes:
+                            raise MediaRejected("too_large", str(size))
+                        if time.monotonic() > deadline:
+                            raise MediaRejected("deadline", f"{self.deadline}s, {size} octets lus")
+                        digest.update(chunk)
+                        f.write(chunk)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        return self._store(digest.hexdigest(), tmp_path, size, content_type)
+
+    def _store(self, sha256: str, tmp_path: str, size: int, content_type: str) -> Dict[str, Any]:
+        """Range le fichier sous son empreinte, ou l'écarte si le contenu est déjà connu"""
+        with self._lock:
+            record = self._index.get(sha256)
+            if record is not None:
+                self._index.move_to_end(sha256)
+
+        if record is not None:
+            os.unlink(tmp_path)
+            status = "duplicate"
+        else:
+            path = self._path_for(sha256)
+            # Le fichier peut venir d'un autre thread, d'un autre worker ou d'un démarrage précédent
+            status = "stored" if self._claim(tmp_path, path) else "duplicate"
+            # Le type est une métadonnée: un même contenu annoncé sous deux types reste un doublon
+            record = {"sha256": sha256, "content_type": content_type, "size": size, "path": path}
+
+        with self._lock:
+            self._index[sha256] = record
+            if len(self._index) > self.index_size:
+                self._index.popitem(last=False)
+            self._stats["bytes_downloaded"] += size
+            if status == "duplicate":
+                self._stats["duplicates"] += 1
+                self._stats["bytes_deduplicated"] += size
+            else:
+                self._stats["stored"] += 1
+
+        if status == "duplicate":
+            logger.info("Média déjà connu (%s), pas de retraitement", sha256[:12])
+        else:
+            logger.info("Média stocké: %s (%s, %d octets)", record["path"], content_type, size)
+        return dict(record, status=status)
+
+    @staticmethod
+    def _claim(tmp_path: str, path: str) -> bool:
+        """
+        Publie le fichier temporaire sous son chemin définitif, sauf s'il existe déjà
+
+        os.link échoue de façon atomique si la cible existe: de deux
+        téléchargements simultanés du même contenu, un seul le stocke.
+
+        Returns:
+            True si ce fichier a été stocké, False si le contenu l'était déjà
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError as e:
+            # Système de fichiers sans liens physiques: vérification puis renommage
+            if e.errno not in (errno.EPERM, errno.EXDEV, errno.ENOTSUP, errno.EMLINK):
+                raise
+            if os.path.exists(path):
+                return False
+            os.replace(tmp_path, path)
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _path_for(self, sha256: str) -> str:
+        """Chemin de stockage: <dossier>/<2 premiers caractères>/<empreinte>"""
+        return os.path.join(self.storage_dir, sha256[:2], sha256)
+
+    def _auth_headers(self, url: str) -> Optional[Dict[str, str]]:
+        """Authentification HTTP Basic pour les médias hébergés par Twilio"""
+        if self._auth_header is None or urlsplit(url).netloc not in self._auth_hosts:
+            return None
+        return {'Authorization': self._auth_header}
+
+    @staticmethod
+    def _normalize_type(content_type: str) -> str:
+        """Type MIME sans paramètres, en minuscules"""
+        return content_type.split(';', 1)[0].strip().lower()
+
+    def is_allowed(self, content_type: str) -> bool:
+        """
+        Indique si un type MIME est accepté
+
+        Args:
+            content_type: Type MIME normalisé
+
+        Returns:
+            True si le type commence par l'un des préfixes acceptés
+        """
+        return bool(content_type) and content_type.startswith(self.allowed_types)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques du pipeline
+
+        Returns:
+            Dict avec les médias stockés, dédupliqués et refusés, les octets lus
+            et la latence de téléchargement
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "running": self._pid == os.getpid(),
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "concurrency": self.concurrency,
+                "max_bytes": self.max_bytes,
+                "indexed": len(self._index),
+            })
+        stats["download_latency_seconds"] = self.download_latency.snapshot()
+        return stats
+
+
+_pipeline: Optional[MediaPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_media_pipeline() -> Optional[MediaPipeline]:
+    """
+    Retourne le pipeline médias partagé du processus
+
+    Returns:
+        Instance MediaPipeline, ou None si le traitement des médias est désactivé
+    """
+    global _pipeline
+
+    if not Config.MEDIA_ENABLED:
+        return None
+
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = MediaPipeline()
+        return _pipeline
@@ -0,0 +1,337 @@
+"""
+Cache approximatif des réponses
+Retrouve les messages quasi identiques grâce à MinHash et LSH
+"""
+
+import heapq
+import json
+import operator
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Set
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Constantes de mélange (hachage multiplicatif de Fibonacci sur 64 bits)
+_MIX_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK_64 = (1 << 64) - 1
+_MASK_32 = (1 << 32) - 1
+_EMPTY_BIN = _MASK_32 + 1
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+# Jetons qui changent le sens d'une question: nombres, références, lettres isolées
+_DISTINCTIVE_RE = re.compile(r'^(?:\w*\d\w*|\w)$')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Taille max d'un seau LSH et nombre de candidats comparés par recherche:
+# le coût d'une recherche reste borné quelle que soit la taille de l'index
+_MAX_BUCKET_SIZE = 32
+_MAX_CANDIDATES = 8
+
+# Coût fixe approximatif d'une entrée (dict, tuple, clés de bandes)
+_ENTRY_OVERHEAD_BYTES = 400
+
+
+def normalize_for_similarity(text: str) -> str:
+    """
+    Normalise un message pour la comparaison approximative
+
+    Args:
+        text: Message brut
+
+    Returns:
+        Message en minuscules, sans accents ni ponctuation
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCTUATION_RE.sub(' ', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def distinctive_tokens(text: str) -> frozenset:
+    """
+    Jetons devant être identiques pour réutiliser une réponse
+
+    Un n-gramme de caractères change à peine entre « produit A » et
+    « produit B », ou « commande 1234 » et « commande 1243 »: ces jetons
+    sont comparés exactement, en plus de la similarité MinHash.
+
+    Args:
+        text: Message brut
+
+    Returns:
+        Nombres, mots contenant un chiffre et lettres isolées du message
+    """
+    return frozenset(
+        token for token in normalize_for_similarity(text).split()
+        if _DISTINCTIVE_RE.match(token)
+    )
+
+
+class NearDuplicateCache:
+    """Index MinHash/LSH des réponses sur n-grammes de caractères"""
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ngram_size: Optional[int] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        max_memory_mb: Optional[float] = None,
+        ttl: Optional[float] = None
+    ):
+        """
+        Initialise l'index
+
+        Args:
+            threshold: Similarité de Jaccard minimale pour un hit
+            ngram_size: Taille des n-grammes de caractères
+            num_perm: Nombre de cases de la signature MinHash
+            bands: Nombre de bandes LSH (doit diviser num_perm)
+            max_memory_mb: Mémoire maximale estimée de l'index
+            ttl: Durée de vie d'une entrée (secondes)
+        """
+        self.threshold = threshold or Config.NEAR_DUP_THRESHOLD
+        self.ngram_size = ngram_size or Config.NEAR_DUP_NGRAM_SIZE
+        self.num_perm = num_perm or Config.NEAR_DUP_NUM_PERM
+        self.bands = bands or Config.NEAR_DUP_BANDS
+        self.max_memory_bytes = int((max_memory_mb or Config.NEAR_DUP_MAX_MEMORY_MB) * 1024 * 1024)
+        self.ttl = ttl or Config.CACHE_TTL
+
+        if self.num_perm % self.bands:
+            raise ValueError("NEAR_DUP_NUM_PERM doit être un multiple de NEAR_DUP_BANDS")
+        self.rows = self.num_perm // self.bands
+
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._buckets: Dict[int, List[int]] = {}
+        self._next_id = 0
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "candidates_checked": 0,
+            "distinctive_mismatches": 0,
+        }
+
+        logger.info(
+            f"Cache approximatif initialisé (seuil: {self.threshold}, "
+            f"{self.bands} bandes x {self.rows} lignes)"
+        )
+
+    @staticmethod
+    def make_namespace(model: str, params: Dict[str, Any]) -> int:
+        """
+        Calcule l'espace de noms d'un couple modèle/paramètres
+
+        Args:
+            model: Nom du modèle
+            params: Paramètres de génération
+
+        Returns:
+            Entier identifiant l'espace de noms
+        """
+        return zlib.crc32(json.dumps([model, params], sort_keys=True).encode('utf-8'))
+
+    def _shingles(self, text: str) -> Set[int]:
+        """Découpe le texte en n-grammes de caractères hachés"""
+        normalized = f" {normalize_for_similarity(text)} "
+        n = self.ngram_size
+        if len(normalized) <= n:
+            return {zlib.crc32(normalized.encode('utf-8'))}
+        return {
+            zlib.crc32(normalized[i:i + n].encode('utf-8'))
+            for i in range(len(normalized) - n + 1)
+        }
+
+    def _signature(self, text: str) -> array:
+        """
+        Calcule la signature MinHash d'un texte
+
+        Utilise le MinHash à permutation unique (un seul hachage par n-gramme,
+        réparti sur num_perm cases) avec densification par rotation pour
+        remplir les cases vides des messages courts.
+        """
+        num_bins = self.num_perm
+        bins = [_EMPTY_BIN] * num_bins
+
+        for shingle in self._shingles(text):
+            mixed = (shingle * _MIX_MULTIPLIER) & _MASK_64
+            index = (mixed >> 32) % num_bins
+            value = mixed & _MASK_32
+            if value < bins[index]:
+                bins[index] = value
+
+        signature = array('Q', bins)
+        for index in range(num_bins):
+            if bins[index] != _EMPTY_BIN:
+                continue
+            # Emprunter la première case non vide à droite (circulairement)
+            for distance in range(1, num_bins):
+                neighbour = bins[(index + distance) % num_bins]
+                if neighbour != _EMPTY_BIN:
+                    signature[index] = neighbour + distance * _EMPTY_BIN
+                    break
+        return signature
+
+    def _band_keys(self, signature: array, namespace: int) -> List[int]:
+        """Calcule la clé de chaque bande LSH"""
+        rows = self.rows
+        return [
+            hash((namespace, band, tuple(signature[band * rows:(band + 1) * rows])))
+            for band in range(self.bands)
+        ]
+
+    def get(self, prompt: str, namespace: int) -> Optional[str]:
+        """
+        Recherche une réponse pour un message similaire
+
+        Args:
+            prompt: Message de l'utilisateur
+            namespace: Espace de noms (modèle + paramètres)
+
+        Returns:
+            Réponse associée au message le plus proche, ou None
+        """
+        signature = self._signature(prompt)
+        band_keys = self._band_keys(signature, namespace)
+        distinctive = distinctive_tokens(prompt)
+        now = time.time()
+
+        with self._lock:
+            # Nombre de bandes partagées par candidat: plus il est élevé,
+            # plus la similarité estimée est forte
+            collisions: Dict[int, int] = {}
+            for key in band_keys:
+                bucket = self._buckets.get(key)
+                if bucket:
+                    for entry_id in bucket:
+                        collisions[entry_id] = collisions.get(entry_id, 0) + 1
+
+            candidates = heapq.nlargest(_MAX_CANDIDATES, collisions, key=collisions.get)
+
+            best_id = None
+            best_score = 0.0
+            for entry_id in candidates:
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    continue
+                if entry[2] <= now:
+                    self._remove(entry_id)
+                    self._stats["expirations"] += 1
+                    continue
+                if entry[5] != distinctive:
+                    self._stats["distinctive_mismatches"] += 1
+                    continue
+                score = sum(map(operator.eq, signature, entry[0])) / self.num_perm
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            self._stats["candidates_checked"] += len(candidates)
+
+            if best_id is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self._stats["hits"] += 1
+                return self._entries[best_id][1]
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, prompt: str, namespace: int, response: str) -> None:
+        """
+        Indexe une réponse
+
+        Args:
+            prompt: Message de l'utilisateur
+            namespace: Espace de noms (modèle + paramètres)
+            response: Réponse générée
+        """
+        signature = self._signature(prompt)
+        band_keys = self._band_keys(signature, namespace)
+        size = (
+            signature.itemsize * len(signature)
+            + len(response.encode('utf-8'))
+            + _ENTRY_OVERHEAD_BYTES
+        )
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (
+                signature, response, time.time() + self.ttl, band_keys, size, distinctive_tokens(prompt)
+            )
+            self._memory_bytes += size
+            for key in band_keys:
+                bucket = self._buckets.setdefault(key, [])
+                bucket.append(entry_id)
+                if len(bucket) > _MAX_BUCKET_SIZE:
+                    # Les entrées les plus récentes restent joignables
+                    del bucket[0]
+
+            while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._stats["evictions"] += 1
+
+    def _remove(self, entry_id: int) -> None:
+        """Retire une entrée de l'index (verrou déjà pris)"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._memory_bytes -= entry[4]
+        for key in entry[3]:
+            bucket = self._buckets.get(key)
+            if bucket is not None and entry_id in bucket:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de l'index
+
+        Returns:
+            Dict avec hits, misses, évictions et taille mémoire estimée
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["buckets"] = len(self._buckets)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["max_memory_bytes"] = self.max_memory_bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_near_cache: Optional[NearDuplicateCache] = None
+_near_cache_lock = threading.Lock()
+
+
+def get_near_duplicate_cache() -> Optional[NearDuplicateCache]:
+    """
+    Retourne le cache approximatif partagé du processus
+
+    Returns:
+        Instance NearDuplicateCache, ou None si désactivé
+    """
+    global _near_cache
+
+    if not Config.NEAR_DUP_ENABLED:
+        return None
+
+    with _near_cache_lock:
+        if _near_cache is None:
+            _near_cache = NearDuplicateCache()
+        return _near_cache
@@ -0,0 +1,433 @@
+"""
+File d'envoi sortante vers Twilio
+Limite le débit par numéro expéditeur, priorise les réponses et retente les 429/5xx
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, Deque, List, Optional, Tuple
+from twilio.base.exceptions import TwilioRestException
+from app.config import Config
+from app.services.resilience import backoff_delay, get_retry_scheduler
+from app.utils.logger import setup_logger
+from app.utils.metrics import Histogram
+from app.utils.profiling import activate, current_trace, span
+
+logger = setup_logger(__name__)
+
+PRIORITY_REPLY = 0
+PRIORITY_BULK = 10
+
+
+class TokenBucket:
+    """Seau à jetons: débit moyen `rate` par seconde, rafales jusqu'à `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialise le seau (plein)
+
+        Args:
+            rate: Jetons ajoutés par seconde
+            burst: Capacité maximale du seau
+        """
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """
+        Prend un jeton s'il y en a un (non thread-safe: appelé sous verrou)
+
+        Returns:
+            0 si le jeton est pris, sinon le délai avant le prochain jeton
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class OutboundMessage:
+    """Message en attente d'envoi"""
+
+    __slots__ = (
+        'to', 'body', 'media_url', 'priority', 'idempotency_key',
+        'future', 'enqueued_at', 'attempt', 'first_attempt_at', 'ambiguous', 'trace'
+    )
+
+    def __init__(
+        self,
+        to: str,
+        body: str,
+        media_url: Optional[str],
+        priority: int,
+        idempotency_key: str
+    ):
+        self.to = to
+        self.body = body
+        self.media_url = media_url
+        self.priority = priority
+        self.idempotency_key = idempotency_key
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.attempt = 0
+        self.first_attempt_at: Optional[datetime] = None
+        # Une tentative précédente a pu créer le message côté Twilio
+        self.ambiguous = False
+        # Trace de la requête d'origine: l'envoi différé y ajoute ses étapes
+        self.trace = current_trace()
+
+
+class OutboundDispatcher:
+    """Envoie les messages Twilio dans l'ordre de priorité, au débit autorisé"""
+
+    def __init__(
+        self,
+        twilio_service,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        """
+        Initialise la file (les threads démarrent au premier envoi)
+
+        Args:
+            twilio_service: Service exposant create_message()
+            rate: Messages par seconde autorisés par numéro expéditeur
+            burst: Rafale maximale par numéro expéditeur
+            concurrency: Appels Twilio simultanés
+            max_queue_size: Nombre maximal de messages en attente
+            max_attempts: Tentatives par message (429 et 5xx)
+        """
+        self.twilio_service = twilio_service
+        self.rate = rate or Config.OUTBOUND_RATE_PER_SECOND
+        self.burst = burst or Config.OUTBOUND_BURST
+        self.concurrency = max(1, concurrency or Config.OUTBOUND_SEND_CONCURRENCY)
+        self.max_queue_size = max_queue_size or Config.OUTBOUND_QUEUE_MAXSIZE
+        self.max_attempts = max(1, max_attempts or Config.OUTBOUND_MAX_ATTEMPTS)
+
+        self._condition = threading.Condition()
+        self._pid: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counter = itertools.count()
+
+        # File FIFO par destinataire: les parties d'une réponse partent dans l'ordre
+        self._pending: Dict[str, Deque[OutboundMessage]] = {}
+        # Destinataires prêts, triés par (priorité, ordre d'arrivée) de leur premier message
+        self._ready: List[Tuple[int, int, str]] = []
+        # Destinataires dont un message est en cours d'envoi ou en attente de retry
+        self._busy: set = set()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._size = 0
+        self._in_flight = 0
+
+        # Idempotence: clés en file et clés déjà envoyées (avec leur SID)
+        self._queued_keys: Dict[str, OutboundMessage] = {}
+        self._delivered: "OrderedDict[str, str]" = OrderedDict()
+
+        # Statistiques
+        self.queue_latency = Histogram()
+        self.send_latency = Histogram()
+        self._started_at = 0.0
+        self._stats = {
+            "submitted": 0,
+            "sent": 0,
+            "failed": 0,
+            "rejected": 0,
+            "duplicates": 0,
+            "retries": 0,
+            "throttled": 0,
+            "reconciled": 0,
+            "rate_limited_waits": 0,
+        }
+
+    def _ensure_started(self) -> None:
+        """Démarre le thread de distribution dans ce processus (verrou pris)"""
+        if self._pid == os.getpid():
+            return
+
+        # Après un fork, les threads du parent n'existent plus
+        self._pending = {}
+        self._ready = []
+        self._busy = set()
+        self._queued_keys = {}
+        self._size = 0
+        self._in_flight = 0
+        self._pid = os.getpid()
+        self._started_at = time.monotonic()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="outbound-sender"
+        )
+        threading.Thread(target=self._dispatch_loop, name="outbound-dispatcher", daemon=True).start()
+        logger.info(
+            f"File d'envoi démarrée: {self.rate}/s par numéro (rafale {self.burst}), "
+            f"{self.concurrency} envoi(s) simultané(s)"
+        )
+
+    def submit(
+        self,
+        to: str,
+        body: str,
+        media_url: Optional[str] = None,
+        priority: int = PRIORITY_REPLY,
+        idempotency_key: Optional[str] = None
+    ) -> Optional[Future]:
+        """
+        Met un message en file d'envoi sans bloquer
+
+        Args:
+            to: Numéro du destinataire
+            body: Contenu du message
+            media_url: URL d'un média à joindre (optionnel)
+            priority: PRIORITY_REPLY (réponses) ou PRIORITY_BULK (envois de masse)
+            idempotency_key: Clé stable du message; une même clé n'est envoyée qu'une fois
+
+        Returns:
+            Future résolue avec le SID (None en cas d'échec définitif),
+            ou None si la file est pleine
+        """
+        if not to.startswith('whatsapp:'):
+            to = f'whatsapp:{to}'
+        key = idempotency_key or uuid.uuid4().hex
+
+        with self._condition:
+            self._ensure_started()
+
+            sid = self._delivered.get(key)
+            if sid is not None or key in self._queued_keys:
+                self._stats["duplicates"] += 1
+                logger.info("Envoi déjà effectué ou en file pour la clé %s, ignoré", key)
+                if sid is not None:
+                    future: Future = Future()
+                    future.set_result(sid)
+                    return future
+                return self._queued_keys[key].future
+
+            if self._size >= self.max_queue_size:
+                self._stats["rejected"] += 1
+                logger.warning(f"File d'envoi pleine ({self.max_queue_size}), message à {to} rejeté")
+                return None
+
+            message = OutboundMessage(to, body, media_url, priority, key)
+            queue = self._pending.setdefault(to, deque())
+            queue.append(message)
+            self._queued_keys[key] = message
+            self._size += 1
+            self._stats["submitted"] += 1
+
+            if len(queue) == 1 and to not in self._busy:
+                self._push_ready(to)
+            self._condition.notify()
+
+        return message.future
+
+    def send_message(self, to: str, body: str, **kwargs) -> bool:
+        """
+        Met une réponse en file (même usage que TwilioService.send_message)
+
+        Returns:
+            True si le message a été accepté dans la file
+        """
+        return self.submit(to, body, **kwargs) is not None
+
+    def _push_ready(self, to: str) -> None:
+        """Rend un destinataire éligible selon son premier message (verrou pris)"""
+        head = self._pending[to][0]
+        heapq.heappush(self._ready, (head.priority, next(self._counter), to))
+
+    def _dispatch_loop(self) -> None:
+        """Choisit le prochain message et attend un jeton de son numéro expéditeur"""
+        while True:
+            with self._condition:
+                while not self._ready or self._in_flight >= self.concurrency:
+                    self._condition.wait()
+
+                entry = heapq.heappop(self._ready)
+                to = entry[2]
+                message = self._pending[to][0]
+
+                sender_number = self.twilio_service.whatsapp_number
+                bucket = self._buckets.get(sender_number)
+                if bucket is None:
+                    bucket = self._buckets[sender_number] = TokenBucket(self.rate, self.burst)
+
+                wait = bucket.try_acquire()
+                if wait > 0:
+                    # Pas de jeton: l'entrée revient telle quelle et garde son rang FIFO
+                    heapq.heappush(self._ready, entry)
+                    self._stats["rate_limited_waits"] += 1
+                    self._condition.wait(wait)
+                    continue
+
+                self._busy.add(to)
+                self._in_flight += 1
+
+            self._executor.submit(self._send, message)
+
+    def _send(self, message: OutboundMessage) -> None:
+        """Envoie un message et décide de la suite (succès, retry ou échec)"""
+        started = time.monotonic()
+        if message.attempt == 0:
+            self.queue_latency.observe(started - message.enqueued_at)
+            message.first_attempt_at = datetime.now(timezone.utc)
+            if message.trace is not None:
+                message.trace.add_wait('outbound_queue', started - message.enqueued_at)
+
+        sid: Optional[str] = None
+        retry_delay: Optional[float] = None
+        try:
+            with activate(message.trace), span('outbound_send'):
+                if message.ambiguous:
+                    sid = self._reconcile(message)
+                if sid is None:
+                    sid = self.twilio_service.create_message(message.to, message.body, message.media_url)
+        except TwilioRestException as e:
+            if e.status == 429 or e.status >= 500:
+                retry_delay = self._retry_delay(message)
+                message.ambiguous = message.ambiguous or e.status >= 500
+                if e.status == 429:
+                    with self._condition:
+                        self._stats["throttled"] += 1
+            logger.error(f"Erreur Twilio lors de l'envoi à {message.to}: {e.msg} (HTTP {e.status})")
+        except Exception as e:
+            # Erreur réseau: la requête a pu atteindre Twilio
+            retry_delay = self._retry_delay(message)
+            message.ambiguous = True
+            logger.error(f"Erreur lors de l'envoi à {message.to}: {e}")
+        finally:
+            self.send_latency.observe(time.monotonic() - started)
+
+        message.attempt += 1
+        if sid is None and retry_delay is not None and message.attempt < self.max_attempts:
+            with self._condition:
+                self._stats["retries"] += 1
+                self._in_flight -= 1
+                self._condition.notify()
+            logger.info(
+                f"Envoi à {message.to} replanifié dans {retry_delay:.1f}s "
+                f"(tentative {message.attempt + 1}/{self.max_attempts})"
+            )
+            # Le destinataire reste occupé: ses messages suivants attendent ce retry
+            get_retry_scheduler().schedule(retry_delay, lambda: self._release(message.to))
+            return
+
+        self._finish(message, sid)
+
+    def _retry_delay(self, message: OutboundMessage) -> float:
+        """Délai avant retry: Retry-After de Twilio s'il est fourni, sinon backoff"""
+        retry_after = self.twilio_service.get_retry_after()
+        if retry_after is not None:
+            return retry_after
+        return backoff_delay(message.attempt)
+
+    def _reconcile(self, message: OutboundMessage) -> Optional[str]:
+        """Vérifie qu'une tentative ambiguë n'a pas déjà créé le message"""
+        sid = self.twilio_service.find_sent_message(message.to, message.body, message.first_attempt_at)
+        if sid is not None:
+            with self._condition:
+                self._stats["reconciled"] += 1
+            logger.info("Message à %s déjà créé par une tentative précédente (%s)", message.to, sid)
+        return sid
+
+    def _finish(self, message: OutboundMessage, sid: Optional[str]) -> None:
+        """Retire le message de la file et libère son destinataire"""
+        with self._condition:
+            queue = self._pending[message.to]
+            queue.popleft()
+            self._queued_keys.pop(message.idempotency_key, None)
+            self._size -= 1
+            self._in_flight -= 1
+
+            if sid is not None:
+                self._stats["sent"] += 1
+                self._delivered[message.idempotency_key] = sid
+                if len(self._delivered) > Config.OUTBOUND_IDEMPOTENCY_SIZE:
+                    self._delivered.popitem(last=False)
+            else:
+                self._stats["failed"] += 1
+
+            self._busy.discard(message.to)
+            if queue:
+                self._push_ready(message.to)
+            else:
+                del self._pending[message.to]
+            self._condition.notify()
+
+        if sid is None:
+            logger.error(f"Échec définitif de l'envoi à {message.to} après {message.attempt} tentative(s)")
+        message.future.set_result(sid)
+
+    def _release(self, to: str) -> None:
+        """Rend un destinataire de nouveau éligible après un délai de retry"""
+        with self._condition:
+            self._busy.discard(to)
+            if self._pending.get(to):
+                self._push_ready(to)
+            self._condition.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les statistiques de la file d'envoi
+
+        Returns:
+            Dict avec la profondeur de file, le débit et les latences
+        """
+        with self._condition:
+            running = self._pid == os.getpid()
+            uptime = time.monotonic() - self._started_at if running else 0.0
+            stats = dict(self._stats)
+            stats.update({
+                "running": running,
+                "queue_depth": self._size,
+                "queue_max_size": self.max_queue_size,
+                "in_flight": self._in_flight,
+                "recipients_waiting": len(self._pending),
+                "rate_per_sender": self.rate,
+                "throughput_per_second": round(self._stats["sent"] / uptime, 3) if uptime else 0.0,
+            })
+
+        stats["queue_latency_seconds"] = self.queue_latency.snapshot()
+        stats["send_latency_seconds"] = self.send_latency.snapshot()
+        return stats
+
+
+_dispatcher: Optional[OutboundDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_outbound_dispatcher() -> Optional[OutboundDispatcher]:
+    """
+    Retourne la file d'envoi partagée du processus
+
+    Les gestionnaires synchrone et asynchrone envoient par la même file:
+    un seul seau à jetons par numéro expéditeur. Les envois passent par le
+    service Twilio synchrone du registre, appelé depuis les threads de la file.
+
+    Returns:
+        Instance OutboundDispatcher, ou None si la file d'envoi est désactivée
+    """
+    global _dispatcher
+
+    if not Config.OUTBOUND_QUEUE_ENABLED:
+        return None
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            from app.registry import get_service
+            _dispatcher = OutboundDispatcher(get_service('twilio_service'))
+        return _dispatcher
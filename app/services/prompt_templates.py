@@ -0,0 +1,371 @@
+"""
+Gabarits de prompt par famille de modèle
+Chaque modèle est résolu une seule fois: format du prompt, règle d'extraction
+de la réponse et comptage des tokens avec un tokenizer local
+"""
+
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from app.config import Config
+from app.services.conversation_store import Exchange, estimate_tokens
+from app.utils.logger import setup_logger
+from app.utils.metrics import Histogram
+
+logger = setup_logger(__name__)
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # Comptage exact optionnel
+    Tokenizer = None
+
+# Bornes des seaux pour la taille des prompts (en tokens)
+PROMPT_TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+SYSTEM_INSTRUCTIONS = (
+    "Tu es un assistant WhatsApp utile et amical.\n"
+    "Réponds de manière concise et naturelle en 2-3 phrases maximum."
+)
+
+
+class PromptTemplate:
+    """Format de prompt d'une famille de modèles et sa règle d'extraction"""
+
+    __slots__ = ('family', 'header', 'turn', 'final', 'response_marker', 'context_tokens', 'uses_user_name')
+
+    def __init__(
+        self,
+        family: str,
+        header: str,
+        turn: str,
+        final: str,
+        response_marker: Optional[str],
+        context_tokens: int
+    ):
+        """
+        Initialise le gabarit
+
+        Args:
+            family: Nom de la famille (mistral, llama, flan, generic)
+            header: Début du prompt (instructions système), déjà composé
+            turn: Format d'un échange passé ({user_name}, {user_text}, {assistant_text})
+            final: Format du message courant ({user_name}, {message})
+            response_marker: Marqueur après lequel commence la réponse si le
+                modèle renvoie aussi le prompt (None: texte brut)
+            context_tokens: Fenêtre de contexte utilisable pour le prompt
+        """
+        self.family = family
+        self.header = header
+        self.turn = turn
+        self.final = final
+        self.response_marker = response_marker
+        self.context_tokens = context_tokens
+        # Le nom apparaît dans le prompt: il doit faire partie des clés de cache
+        self.uses_user_name = '{user_name}' in turn + final
+
+    def render(self, message: str, user_name: str, history: List[Exchange]) -> str:
+        """
+        Construit le prompt
+
+        Args:
+            message: Message de l'utilisateur
+            user_name: Nom de l'utilisateur
+            history: Échanges précédents
+
+        Returns:
+            Prompt formaté
+        """
+        turn = self.turn
+        parts = [self.header]
+        for user_text, assistant_text, _ in history:
+            parts.append(turn.format(user_name=user_name, user_text=user_text, assistant_text=assistant_text))
+        parts.append(self.final.format(user_name=user_name, message=message))
+        return "".join(parts)
+
+    def extract(self, generated: str) -> str:
+        """
+        Retire l'éventuel écho du prompt d'un texte généré
+
+        Args:
+            generated: Texte renvoyé par l'API
+
+        Returns:
+            Réponse nettoyée
+        """
+        if self.response_marker is not None:
+            _, found, answer = generated.rpartition(self.response_marker)
+            if found:
+                return answer.strip()
+        return generated.strip()
+
+
+TEMPLATES: Dict[str, PromptTemplate] = {
+    'mistral': PromptTemplate(
+        'mistral',
+        header=f"[INST] {SYSTEM_INSTRUCTIONS}\n\n",
+        turn="{user_name} te demande: {user_text} [/INST] {assistant_text}</s>[INST] ",
+        final="{user_name} te demande: {message} [/INST]",
+        response_marker='[/INST]',
+        context_tokens=4096
+    ),
+    'llama': PromptTemplate(
+        'llama',
+        header=f"<s>[INST] <<SYS>>\n{SYSTEM_INSTRUCTIONS}\n<</SYS>>\n\n",
+        turn="{user_name} te demande: {user_text} [/INST] {assistant_text} </s><s>[INST] ",
+        final="{user_name} te demande: {message} [/INST]",
+        response_marker='[/INST]',
+        context_tokens=2048
+    ),
+    'flan': PromptTemplate(
+        'flan',
+        header="",
+        turn="Question: {user_text}\nRéponse: {assistant_text}\n",
+        final="Réponds à cette question de manière concise: {message}",
+        response_marker=None,
+        context_tokens=512
+    ),
+    'generic': PromptTemplate(
+        'generic',
+        header="Assistant: Tu es un assistant WhatsApp.\n",
+        turn="User ({user_name}): {user_text}\nAssistant: {assistant_text}\n",
+        final="User ({user_name}): {message}\nAssistant:",
+        response_marker='Assistant:',
+        context_tokens=1024
+    ),
+}
+
+# Motifs du nom de modèle -> famille, testés dans l'ordre
+FAMILY_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    ('mistral', 'mistral'),
+    ('mixtral', 'mistral'),
+    ('llama', 'llama'),
+    ('flan', 'flan'),
+)
+
+
+def detect_family(model: str) -> str:
+    """
+    Détermine la famille d'un modèle à partir de son nom
+
+    Args:
+        model: Identifiant du modèle (ex: mistralai/Mistral-7B-Instruct-v0.2)
+
+    Returns:
+        Nom de la famille (generic si aucun motif ne correspond)
+    """
+    model_lower = model.lower()
+    for pattern, family in FAMILY_PATTERNS:
+        if pattern in model_lower:
+            return family
+    return 'generic'
+
+
+class PromptTokenizer:
+    """Compte les tokens avec un tokenizer local, ou par estimation à défaut"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Charge le tokenizer
+
+        Args:
+            path: Fichier tokenizer.json du modèle (vide: estimation ~4 caractères/token)
+        """
+        self._tokenizer = None
+        self.name = "estimate"
+
+        if path:
+            if Tokenizer is None:
+                logger.warning("PROMPT_TOKENIZER_PATH défini mais tokenizers n'est pas installé, estimation utilisée")
+            else:
+                try:
+                    self._tokenizer = Tokenizer.from_file(path)
+                    self.name = path
+                except Exception as e:
+                    logger.error(f"Tokenizer illisible ({path}), estimation utilisée: {e}")
+
+    def count(self, text: str) -> int:
+        """
+        Compte les tokens d'un texte
+
+        Args:
+            text: Texte à mesurer
+
+        Returns:
+            Nombre de tokens
+        """
+        if self._tokenizer is None:
+            return estimate_tokens(text)
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class ModelPrompt:
+    """Gabarit résolu pour un modèle, avec sa comptabilité de tokens"""
+
+    def __init__(self, model: str, template: PromptTemplate, tokenizer: PromptTokenizer, budget: int):
+        """
+        Initialise le gabarit du modèle
+
+        Args:
+            model: Identifiant du modèle
+            template: Gabarit de la famille du modèle
+            tokenizer: Tokenizer utilisé pour les comptes
+            budget: Nombre maximal de tokens d'un prompt
+        """
+        self.model = model
+        self.template = template
+        self.tokenizer = tokenizer
+        self.budget = budget
+        # Coût fixe du gabarit (instructions + balises du message courant)
+        self.overhead_tokens = tokenizer.count(template.header + template.final.format(user_name="", message=""))
+
+        self.prompt_tokens = Histogram(PROMPT_TOKEN_BUCKETS)
+        self._lock = threading.Lock()
+        self._stats = {
+            "prompts": 0,
+            "tokens": 0,
+            "history_trimmed": 0,
+            "over_budget": 0,
+        }
+
+    def count_tokens(self, text: str) -> int:
+        """Compte les tokens d'un texte avec le tokenizer du modèle"""
+        return self.tokenizer.count(text)
+
+    def format(self, message: str, user_name: str, history: List[Exchange]) -> Tuple[str, int]:
+        """
+        Construit le prompt en respectant le budget de tokens
+
+        Les échanges les plus anciens sont retirés tant que le prompt dépasse
+        le budget; le message courant est toujours conservé.
+
+        Args:
+            message: Message de l'utilisateur
+            user_name: Nom de l'utilisateur
+            history: Échanges précédents (déjà présélectionnés par estimation)
+
+        Returns:
+            Tuple (prompt formaté, nombre de tokens du prompt)
+        """
+        prompt = self.template.render(message, user_name, history)
+        tokens = self.tokenizer.count(prompt)
+        trimmed = 0
+
+        while tokens > self.budget and trimmed < len(history):
+            trimmed += 1
+            prompt = self.template.render(message, user_name, history[trimmed:])
+            tokens = self.tokenizer.count(prompt)
+
+        self.prompt_tokens.observe(tokens)
+        with self._lock:
+            self._stats["prompts"] += 1
+            self._stats["tokens"] += tokens
+            if trimmed:
+                self._stats["history_trimmed"] += trimmed
+            if tokens > self.budget:
+                self._stats["over_budget"] += 1
+
+        if tokens > self.budget:
+            logger.warning(f"Prompt de {tokens} tokens au-delà du budget ({self.budget})")
+        return prompt, tokens
+
+    def extract(self, generated: str) -> str:
+        """Retire l'éventuel écho du prompt selon la règle de la famille"""
+        return self.template.extract(generated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne la comptabilité de tokens du modèle
+
+        Returns:
+            Dict avec la famille, le budget, les compteurs et la distribution des tailles
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "family": self.template.family,
+            "tokenizer": self.tokenizer.name,
+            "budget": self.budget,
+            "overhead_tokens": self.overhead_tokens,
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+        })
+        return stats
+
+
+class PromptTemplateRegistry:
+    """Résout et met en cache le gabarit de chaque modèle"""
+
+    def __init__(self, tokenizer_path: Optional[str] = None, max_budget: Optional[int] = None):
+        """
+        Initialise le registre
+
+        Args:
+            tokenizer_path: Fichier tokenizer.json (vide: estimation)
+            max_budget: Plafond du budget de tokens, quelle que soit la famille
+        """
+        self.tokenizer_path = Config.PROMPT_TOKENIZER_PATH if tokenizer_path is None else tokenizer_path
+        self.max_budget = max_budget or Config.PROMPT_TOKEN_BUDGET
+        self._models: Dict[str, ModelPrompt] = {}
+        self._tokenizer: Optional[PromptTokenizer] = None
+        self._lock = threading.Lock()
+
+    def resolve(self, model: str) -> ModelPrompt:
+        """
+        Retourne le gabarit du modèle, résolu au premier appel
+
+        Args:
+            model: Identifiant du modèle
+
+        Returns:
+            Gabarit prêt à l'emploi
+        """
+        resolved = self._models.get(model)
+        if resolved is not None:
+            return resolved
+
+        with self._lock:
+            resolved = self._models.get(model)
+            if resolved is None:
+                if self._tokenizer is None:
+                    self._tokenizer = PromptTokenizer(self.tokenizer_path)
+                template = TEMPLATES[detect_family(model)]
+                resolved = ModelPrompt(
+                    model,
+                    template,
+                    self._tokenizer,
+                    min(template.context_tokens, self.max_budget)
+                )
+                self._models[model] = resolved
+                logger.info(
+                    f"Gabarit '{template.family}' pour {model} "
+                    f"(budget {resolved.budget} tokens, tokenizer: {self._tokenizer.name})"
+                )
+            return resolved
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne la comptabilité de tokens par modèle
+
+        Returns:
+            Dict modèle -> statistiques
+        """
+        with self._lock:
+            models = dict(self._models)
+        return {model: resolved.get_stats() for model, resolved in models.items()}
+
+
+_registry: Optional[PromptTemplateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptTemplateRegistry:
+    """
+    Retourne le registre de gabarits partagé du processus
+
+    Returns:
+        Instance PromptTemplateRegistry
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptTemplateRegistry()
+        return _registry
@@ -0,0 +1,386 @@
+"""
+Quotas d'utilisation par expéditeur
+Fenêtres glissantes approximées par deux compteurs fixes (mémoire O(1) par utilisateur),
+partageables entre workers via SQLite
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SlidingWindowCounter:
+    """
+    Compteur sur fenêtre glissante
+
+    La fenêtre précédente est pondérée par la part qui chevauche encore
+    la fenêtre glissante: deux entiers suffisent, quel que soit le trafic
+    """
+
+    __slots__ = ('window_start', 'previous', 'current')
+
+    def __init__(self, window_start: float):
+        self.window_start = window_start
+        self.previous = 0
+        self.current = 0
+
+    def _roll(self, now: float, window: float) -> None:
+        """Avance jusqu'à la fenêtre fixe contenant `now`"""
+        elapsed_windows = int((now - self.window_start) // window)
+        if elapsed_windows <= 0:
+            return
+        self.previous = self.current if elapsed_windows == 1 else 0
+        self.current = 0
+        self.window_start += elapsed_windows * window
+
+    def value(self, now: float, window: float) -> float:
+        """
+        Estime le total sur les `window` dernières secondes
+
+        Args:
+            now: Instant courant
+            window: Durée de la fenêtre (secondes)
+
+        Returns:
+            Total estimé
+        """
+        self._roll(now, window)
+        overlap = 1 - (now - self.window_start) / window
+        return self.previous * overlap + self.current
+
+    def add(self, now: float, window: float, amount: int = 1) -> None:
+        """Ajoute `amount` au compteur"""
+        self._roll(now, window)
+        self.current += amount
+
+
+class UserUsage:
+    """Compteurs d'un expéditeur"""
+
+    __slots__ = ('messages', 'tokens', 'rejected', 'last_seen')
+
+    def __init__(self, now: float, window: float):
+        window_start = now - (now % window)
+        self.messages = SlidingWindowCounter(window_start)
+        self.tokens = SlidingWindowCounter(window_start)
+        self.rejected = 0
+        self.last_seen = now
+
+
+class QuotaManager:
+    """Limite le nombre de messages et de tokens générés par expéditeur"""
+
+    def __init__(
+        self,
+        window: Optional[float] = None,
+        max_messages: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        max_users: Optional[int] = None,
+        sqlite_path: Optional[str] = None
+    ):
+        """
+        Initialise les quotas
+
+        Args:
+            window: Durée de la fenêtre glissante (secondes)
+            max_messages: Messages autorisés par fenêtre (0 = illimité)
+            max_tokens: Tokens générés autorisés par fenêtre (0 = illimité)
+            max_users: Nombre max d'expéditeurs suivis (les moins récents sont oubliés)
+            sqlite_path: Fichier SQLite partagé entre processus (vide = mémoire du processus)
+        """
+        self.window = window or Config.QUOTA_WINDOW_SECONDS
+        self.max_messages = Config.QUOTA_MAX_MESSAGES if max_messages is None else max_messages
+        self.max_tokens = Config.QUOTA_MAX_TOKENS if max_tokens is None else max_tokens
+        self.max_users = max_users or Config.QUOTA_MAX_USERS
+        self.sqlite_path = Config.QUOTA_SQLITE_PATH if sqlite_path is None else sqlite_path
+
+        self._users: "OrderedDict[str, UserUsage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._checks = 0
+        self._stats = {
+            "allowed": 0,
+            "rejected": 0,
+            "evictions": 0,
+            "disk_errors": 0,
+        }
+
+        if self.sqlite_path:
+            directory = os.path.dirname(self.sqlite_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS quota_usage ("
+                "sender TEXT NOT NULL, window_start REAL NOT NULL, "
+                "messages INTEGER NOT NULL DEFAULT 0, tokens INTEGER NOT NULL DEFAULT 0, "
+                "rejected INTEGER NOT NULL DEFAULT 0, last_seen REAL NOT NULL, "
+                "PRIMARY KEY (sender, window_start))"
+            )
+
+        logger.info(
+            f"Quotas initialisés: {self.max_messages or '∞'} messages et "
+            f"{self.max_tokens or '∞'} tokens par {self.window}s "
+            f"(partagés: {self.sqlite_path or 'non, limite par processus'})"
+        )
+
+    def _get_user(self, sender: str, now: float) -> UserUsage:
+        """Retourne les compteurs d'un expéditeur, en les créant si besoin (verrou pris)"""
+        usage = self._users.get(sender)
+        if usage is None:
+            usage = self._users[sender] = UserUsage(now, self.window)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self._stats["evictions"] += 1
+        else:
+            self._users.move_to_end(sender)
+        usage.last_seen = now
+        return usage
+
+    def allow_message(self, sender: str) -> bool:
+        """
+        Vérifie le quota d'un expéditeur et compte le message s'il est accepté
+
+        Args:
+            sender: Numéro de l'expéditeur
+
+        Returns:
+            True si le message peut être traité par le modèle
+        """
+        now = time.time()
+
+        if self.sqlite_path:
+            allowed = self._allow_shared(sender, now)
+            if allowed is not None:
+                with self._lock:
+                    self._stats["allowed" if allowed else "rejected"] += 1
+                return allowed
+
+        with self._lock:
+            usage = self._get_user(sender, now)
+            over_messages = (
+                self.max_messages and usage.messages.value(now, self.window) >= self.max_messages
+            )
+            over_tokens = (
+                self.max_tokens and usage.tokens.value(now, self.window) >= self.max_tokens
+            )
+            if over_messages or over_tokens:
+                usage.rejected += 1
+                self._stats["rejected"] += 1
+                return False
+
+            usage.messages.add(now, self.window)
+            self._stats["allowed"] += 1
+            return True
+
+    def record_tokens(self, sender: str, tokens: int) -> None:
+        """
+        Comptabilise les tokens générés pour un expéditeur
+
+        Args:
+            sender: Numéro de l'expéditeur
+            tokens: Nombre de tokens générés
+        """
+        now = time.time()
+
+        if self.sqlite_path:
+            cursor = self._execute(
+                "INSERT INTO quota_usage (sender, window_start, tokens, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(sender, window_start) DO UPDATE SET "
+                "tokens = tokens + excluded.tokens, last_seen = excluded.last_seen",
+                (sender, self._window_start(now), tokens, now)
+            )
+            if cursor is not None:
+                return
+
+        with self._lock:
+            self._get_user(sender, now).tokens.add(now, self.window, tokens)
+
+    def get_usage(self, sender: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne la consommation d'un expéditeur sur la fenêtre glissante
+
+        Args:
+            sender: Numéro de l'expéditeur
+
+        Returns:
+            Dict avec messages, tokens et limites, ou None si l'expéditeur est inconnu
+        """
+        now = time.time()
+
+        if self.sqlite_path:
+            usage = self._get_usage_shared(sender, now)
+            if usage is not None:
+                return usage
+
+        with self._lock:
+            usage = self._users.get(sender)
+            if usage is None:
+                return None
+            return {
+                "sender": sender,
+                "window_seconds": self.window,
+                "messages": round(usage.messages.value(now, self.window), 2),
+                "max_messages": self.max_messages,
+                "tokens": round(usage.tokens.value(now, self.window), 2),
+                "max_tokens": self.max_tokens,
+                "rejected": usage.rejected,
+                "last_seen_seconds_ago": round(now - usage.last_seen, 1),
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs globaux des quotas
+
+        Returns:
+            Dict avec messages acceptés, refusés et expéditeurs suivis
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tracked_users"] = len(self._users)
+        stats["shared"] = bool(self.sqlite_path)
+        return stats
+
+    def _window_start(self, now: float) -> float:
+        """Début de la fenêtre fixe contenant `now` (identique dans tous les processus)"""
+        return now - (now % self.window)
+
+    def _sliding_value(self, rows: Dict[float, tuple], column: int, now: float) -> float:
+        """Total glissant d'une colonne à partir des fenêtres fixes courante et précédente"""
+        current_start = self._window_start(now)
+        current = rows.get(current_start)
+        previous = rows.get(current_start - self.window)
+        overlap = 1 - (now - current_start) / self.window
+        return (previous[column] if previous else 0) * overlap + (current[column] if current else 0)
+
+    def _read_rows(self, conn: sqlite3.Connection, sender: str, now: float) -> Dict[float, tuple]:
+        """Fenêtres courante et précédente d'un expéditeur: {window_start: (messages, tokens, rejected, last_seen)}"""
+        current_start = self._window_start(now)
+        rows = conn.execute(
+            "SELECT window_start, messages, tokens, rejected, last_seen FROM quota_usage "
+            "WHERE sender = ? AND window_start IN (?, ?)",
+            (sender, current_start, current_start - self.window)
+        ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def _allow_shared(self, sender: str, now: float) -> Optional[bool]:
+        """
+        Vérifie et compte le message dans le store partagé
+
+        La lecture et l'incrément se font dans une même transaction
+        BEGIN IMMEDIATE: deux workers ne peuvent pas accepter ensemble
+        le dernier message autorisé.
+
+        Returns:
+            True/False selon le quota, None en cas d'erreur SQLite (repli sur la mémoire)
+        """
+        current_start = self._window_start(now)
+        with self._lock:
+            self._checks += 1
+            purge = self._checks % 1000 == 0
+
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._read_rows(conn, sender, now)
+                over_messages = (
+                    self.max_messages and self._sliding_value(rows, 0, now) >= self.max_messages
+                )
+                over_tokens = (
+                    self.max_tokens and self._sliding_value(rows, 1, now) >= self.max_tokens
+                )
+                allowed = not (over_messages or over_tokens)
+                conn.execute(
+                    "INSERT INTO quota_usage (sender, window_start, messages, rejected, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(sender, window_start) DO UPDATE SET "
+                    "messages = messages + excluded.messages, rejected = rejected + excluded.rejected, "
+                    "last_seen = excluded.last_seen",
+                    (sender, current_start, int(allowed), int(not allowed), now)
+                )
+                if purge:
+                    conn.execute(
+                        "DELETE FROM quota_usage WHERE window_start < ?", (current_start - self.window,)
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return allowed
+        except sqlite3.Error as e:
+            self._disk_error(e)
+            return None
+
+    def _get_usage_shared(self, sender: str, now: float) -> Optional[Dict[str, Any]]:
+        """Consommation d'un expéditeur lue dans le store partagé"""
+        try:
+            rows = self._read_rows(self._connection(), sender, now)
+        except sqlite3.Error as e:
+            self._disk_error(e)
+            return None
+        if not rows:
+            return None
+        return {
+            "sender": sender,
+            "window_seconds": self.window,
+            "messages": round(self._sliding_value(rows, 0, now), 2),
+            "max_messages": self.max_messages,
+            "tokens": round(self._sliding_value(rows, 1, now), 2),
+            "max_tokens": self.max_tokens,
+            "rejected": sum(row[2] for row in rows.values()),
+            "last_seen_seconds_ago": round(now - max(row[3] for row in rows.values()), 1),
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retourne la connexion SQLite du thread (recréée après un fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, query: str, params: tuple = ()) -> Optional[sqlite3.Cursor]:
+        """Exécute une requête SQLite sans jamais faire échouer l'appelant"""
+        try:
+            return self._connection().execute(query, params)
+        except sqlite3.Error as e:
+            self._disk_error(e)
+            return None
+
+    def _disk_error(self, error: sqlite3.Error) -> None:
+        """Compte une erreur SQLite: l'appelant se replie sur les compteurs en mémoire"""
+        with self._lock:
+            self._stats["disk_errors"] += 1
+        logger.warning(f"Erreur SQLite des quotas: {error}")
+
+
+_quotas: Optional[QuotaManager] = None
+_quotas_lock = threading.Lock()
+
+
+def get_quota_manager() -> Optional[QuotaManager]:
+    """
+    Retourne le gestionnaire de quotas partagé du processus
+
+    Returns:
+        Instance QuotaManager, ou None si les quotas sont désactivés
+    """
+    global _quotas
+
+    if not Config.QUOTA_ENABLED:
+        return None
+
+    with _quotas_lock:
+        if _quotas is None:
+            _quotas = QuotaManager()
+        return _quotas
@@ -0,0 +1,254 @@
+"""
+Outils de résilience pour les appels aux services externes
+Backoff exponentiel avec jitter, ordonnanceur de retries et disjoncteur
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """
+    Calcule le délai avant une nouvelle tentative (backoff exponentiel, jitter complet)
+
+    Args:
+        attempt: Numéro de la tentative échouée (0 pour la première)
+        base: Délai de base (secondes)
+        cap: Délai maximal (secondes)
+
+    Returns:
+        Délai aléatoire entre 0 et min(cap, base * 2^attempt)
+    """
+    base = base or Config.HF_RETRY_BASE_DELAY
+    cap = cap or Config.HF_RETRY_MAX_DELAY
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryLater(Exception):
+    """Demande de replanifier le traitement au lieu d'attendre sur place"""
+
+    def __init__(self, delay: float, attempt: int):
+        super().__init__(f"Nouvelle tentative n°{attempt + 1} dans {delay:.1f}s")
+        self.delay = delay
+        self.attempt = attempt
+
+
+class CircuitOpenError(Exception):
+    """Le disjoncteur est ouvert: l'appel est refusé immédiatement"""
+
+
+class CircuitBreaker:
+    """Disjoncteur à trois états: fermé, ouvert et semi-ouvert"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        recovery_timeout: Optional[float] = None,
+        half_open_max_calls: Optional[int] = None
+    ):
+        """
+        Initialise le disjoncteur
+
+        Args:
+            name: Nom du service protégé
+            failure_threshold: Échecs consécutifs avant ouverture
+            recovery_timeout: Durée d'ouverture avant un essai (secondes)
+            half_open_max_calls: Appels d'essai autorisés en semi-ouvert
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or Config.CIRCUIT_RECOVERY_TIMEOUT
+        self.half_open_max_calls = half_open_max_calls or Config.CIRCUIT_HALF_OPEN_MAX_CALLS
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
+
+    @property
+    def state(self) -> str:
+        """État courant (passe en semi-ouvert une fois le délai écoulé)"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        """État courant (verrou déjà pris)"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"Disjoncteur '{self.name}' semi-ouvert: appel d'essai autorisé")
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Indique si un appel peut être tenté
+
+        Returns:
+            True si l'appel est autorisé, False s'il doit échouer immédiatement
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def release(self) -> None:
+        """
+        Rend un appel autorisé sans issue connue (flux fermé tôt, appel annulé)
+
+        En semi-ouvert, libère la place d'essai prise par allow_request():
+        sans cela, le disjoncteur resterait semi-ouvert et refuserait tout.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        """Enregistre un appel réussi"""
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            if self._state != self.CLOSED:
+                logger.info(f"Disjoncteur '{self.name}' refermé")
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        """Enregistre un appel en échec"""
+        with self._lock:
+            self._stats["failures"] += 1
+            self._failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    self._stats["opened"] += 1
+                    logger.warning(
+                        f"Disjoncteur '{self.name}' ouvert après {self._failures} échec(s) "
+                        f"(réessai dans {self.recovery_timeout}s)"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état et les compteurs du disjoncteur
+
+        Returns:
+            Dict avec l'état, les échecs consécutifs et les compteurs
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._current_state()
+            stats["consecutive_failures"] = self._failures
+        return stats
+
+
+class RetryScheduler:
+    """Exécute des callbacks après un délai sans bloquer les workers"""
+
+    def __init__(self):
+        """Initialise l'ordonnanceur (le thread démarre au premier appel)"""
+        self._heap: list = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._pid: Optional[int] = None
+        self._stats = {
+            "scheduled": 0,
+            "executed": 0,
+            "errors": 0,
+        }
+
+    def _ensure_started(self) -> None:
+        """Démarre le thread de l'ordonnanceur dans le processus courant (verrou pris)"""
+        if self._pid == os.getpid():
+            return
+        self._heap = []
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="retry-scheduler", daemon=True).start()
+
+    def schedule(self, delay: float, callback: Callable[[], Any]) -> None:
+        """
+        Planifie un callback
+
+        Args:
+            delay: Délai avant exécution (secondes)
+            callback: Fonction rapide à exécuter (ex: remettre en file)
+        """
+        with self._condition:
+            self._ensure_started()
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), callback))
+            self._stats["scheduled"] += 1
+            self._condition.notify()
+
+    def _run(self) -> None:
+        """Boucle du thread: attend la prochaine échéance"""
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                _, _, callback = heapq.heappop(self._heap)
+
+            try:
+                callback()
+                with self._condition:
+                    self._stats["executed"] += 1
+            except Exception as e:
+                with self._condition:
+                    self._stats["errors"] += 1
+                logger.error(f"Erreur dans un retry planifié: {e}", exc_info=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de l'ordonnanceur
+
+        Returns:
+            Dict avec les retries planifiés, exécutés et en attente
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._heap)
+        return stats
+
+
+_scheduler: Optional[RetryScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_retry_scheduler() -> RetryScheduler:
+    """
+    Retourne l'ordonnanceur de retries partagé du processus
+
+    Returns:
+        Instance RetryScheduler
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RetryScheduler()
+        return _scheduler
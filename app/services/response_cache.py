@@ -0,0 +1,251 @@
+"""
+Cache des réponses générées
+LRU en mémoire avec TTL, adossé à un niveau SQLite optionnel sur disque
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Normalise un message pour servir de clé de cache
+
+    Args:
+        text: Message brut de l'utilisateur
+
+    Returns:
+        Message en minuscules, espaces compactés
+    """
+    return _WHITESPACE_RE.sub(' ', text.lower()).strip()
+
+
+class ResponseCache:
+    """Cache à deux niveaux: LRU en mémoire puis SQLite sur disque"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sqlite_path: Optional[str] = None
+    ):
+        """
+        Initialise le cache
+
+        Args:
+            max_entries: Nombre max d'entrées en mémoire
+            ttl: Durée de vie d'une entrée (secondes)
+            sqlite_path: Fichier SQLite du niveau disque (vide = désactivé)
+        """
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.CACHE_TTL
+        self.sqlite_path = Config.CACHE_SQLITE_PATH if sqlite_path is None else sqlite_path
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "sets": 0,
+            "disk_errors": 0,
+        }
+
+        if self.sqlite_path:
+            directory = os.path.dirname(self.sqlite_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+        logger.info(
+            f"Cache de réponses initialisé (max: {self.max_entries}, ttl: {self.ttl}s, "
+            f"disque: {self.sqlite_path or 'désactivé'})"
+        )
+
+    @staticmethod
+    def make_key(
+        prompt: str,
+        model: str,
+        params: Dict[str, Any],
+        history: Optional[list] = None,
+        user_name: Optional[str] = None
+    ) -> str:
+        """
+        Construit la clé de cache
+
+        Args:
+            prompt: Message de l'utilisateur
+            model: Nom du modèle
+            params: Paramètres de génération
+            history: Échanges de conversation inclus dans le prompt
+            user_name: Nom de l'utilisateur, si le gabarit l'insère dans le prompt
+
+        Returns:
+            Empreinte SHA-256 du prompt normalisé, du modèle, des paramètres,
+            de l'historique et du nom éventuels
+        """
+        parts = [normalize_prompt(prompt), model, params]
+        if history:
+            parts.append([[user_text, assistant_text] for user_text, assistant_text, *_ in history])
+        if user_name is not None:
+            parts.append({"user_name": user_name})
+        material = json.dumps(
+            parts,
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Recherche une réponse en mémoire puis sur disque
+
+        Args:
+            key: Clé de cache
+
+        Returns:
+            Réponse en cache ou None
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return response
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+        if self.sqlite_path:
+            row = self._execute(
+                "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+                fetch=True
+            )
+            if row:
+                response, expires_at = row
+                self._store_memory(key, response, expires_at)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return response
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Enregistre une réponse dans les deux niveaux
+
+        Args:
+            key: Clé de cache
+            response: Réponse générée par le modèle
+        """
+        expires_at = time.time() + self.ttl
+        self._store_memory(key, response, expires_at)
+
+        with self._lock:
+            self._stats["sets"] += 1
+            self._writes += 1
+            purge = self._writes % 1000 == 0
+
+        if self.sqlite_path:
+            self._execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at)
+            )
+            if purge:
+                self._execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def _store_memory(self, key: str, response: str, expires_at: float) -> None:
+        """Insère une entrée dans le LRU en évinçant les plus anciennes"""
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retourne la connexion SQLite du thread (recréée après un fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, query: str, params: tuple = (), fetch: bool = False):
+        """Exécute une requête SQLite sans jamais faire échouer l'appelant"""
+        try:
+            cursor = self._connection().execute(query, params)
+            return cursor.fetchone() if fetch else None
+        except sqlite3.Error as e:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+            logger.warning(f"Erreur du cache SQLite: {e}")
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs du cache
+
+        Returns:
+            Dict avec hits, misses, évictions et taux de succès
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._entries)
+
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Retourne le cache de réponses partagé du processus
+
+    Returns:
+        Instance ResponseCache, ou None si le cache est désactivé
+    """
+    global _cache
+
+    if not Config.CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
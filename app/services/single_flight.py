@@ -0,0 +1,110 @@
+"""
+Coalescence des appels identiques en cours
+Les appelants concurrents d'une même clé partagent un seul appel amont
+"""
+
+import threading
+from typing import Callable, Dict, Any, Optional
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SingleFlightTimeout(Exception):
+    """L'appel partagé n'a pas abouti dans le délai imparti"""
+
+
+class _Call:
+    """Appel en cours partagé entre plusieurs appelants"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Exécute une seule fois une fonction par clé pour les appels simultanés"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Initialise le groupe d'appels
+
+        Args:
+            timeout: Attente max d'un appelant sur un appel partagé (secondes)
+        """
+        self.timeout = timeout or Config.SINGLE_FLIGHT_TIMEOUT
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "timeouts": 0,
+        }
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Exécute fn, ou attend le résultat d'un appel identique déjà en cours
+
+        Args:
+            key: Clé identifiant l'appel
+            fn: Fonction à exécuter si aucun appel n'est en cours
+
+        Returns:
+            Résultat de fn (partagé entre les appelants)
+
+        Raises:
+            SingleFlightTimeout: Si l'appel partagé dépasse le délai
+            Exception: Toute exception levée par fn est propagée à tous les appelants
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["leaders"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise SingleFlightTimeout(f"Appel partagé non terminé après {self.timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Retirer la clé avant de réveiller les appelants: un nouvel
+            # appel après cette fin déclenche une nouvelle exécution
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.waiters:
+                logger.info("Résultat partagé avec %d appel(s) identique(s)", call.waiters)
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de coalescence
+
+        Returns:
+            Dict avec le nombre d'appels exécutés, coalescés et expirés
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
@@ -0,0 +1,90 @@
+"""
+Découpage d'un flux de tokens en messages WhatsApp
+Envoie la première phrase dès qu'elle est complète, puis le reste par blocs
+"""
+
+import re
+from typing import Optional, List
+from app.config import Config
+
+# Fin de phrase confirmée par un espace ou un retour à la ligne
+_SENTENCE_END_RE = re.compile(r'[.!?…](?=\s)|\n')
+
+# Taille max d'un message WhatsApp via Twilio
+WHATSAPP_MAX_CHARS = 1600
+
+
+class SentenceChunker:
+    """Accumule des tokens et produit des messages prêts à envoyer"""
+
+    def __init__(self, followup_min_chars: Optional[int] = None, max_chars: int = WHATSAPP_MAX_CHARS):
+        """
+        Initialise le découpeur
+
+        Args:
+            followup_min_chars: Taille minimale des messages après le premier
+            max_chars: Taille maximale d'un message
+        """
+        self.followup_min_chars = followup_min_chars or Config.STREAM_FOLLOWUP_MIN_CHARS
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._first_sent = False
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Ajoute un fragment de texte
+
+        Args:
+            text: Fragment reçu du flux
+
+        Returns:
+            Messages complets prêts à être envoyés (souvent vide)
+        """
+        self._buffer += text
+        chunks = []
+
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+                self._first_sent = True
+
+        return chunks
+
+    def flush(self) -> Optional[str]:
+        """
+        Termine le flux
+
+        Returns:
+            Texte restant, ou None s'il est vide
+        """
+        chunk, self._buffer = self._buffer.strip(), ""
+        return chunk or None
+
+    def _find_cut(self) -> Optional[int]:
+        """Position de coupe dans le tampon, ou None s'il faut attendre"""
+        buffer = self._buffer
+
+        if not self._first_sent:
+            # Premier message: dès la première phrase ou le premier paragraphe
+            match = _SENTENCE_END_RE.search(buffer)
+            if match and buffer[:match.end()].strip():
+                return match.end()
+        elif len(buffer) >= self.followup_min_chars:
+            # Messages suivants: au dernier paragraphe, sinon à la dernière phrase
+            paragraph = buffer.rfind("\n\n")
+            if paragraph >= self.followup_min_chars:
+                return paragraph
+            ends = [m.end() for m in _SENTENCE_END_RE.finditer(buffer, self.followup_min_chars)]
+            if ends:
+                return ends[-1]
+
+        if len(buffer) >= self.max_chars:
+            window = buffer[:self.max_chars]
+            ends = [m.end() for m in _SENTENCE_END_RE.finditer(window)]
+            return ends[-1] if ends else self.max_chars
+
+        return None
@@ -3,15 +3,60 @@ Service pour interagir avec l'API Twilio
 Gère l'envoi et la réception de messages WhatsApp
 """
 
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from twilio.base.exceptions import TwilioRestException
-from typing import Optional
+from typing import Optional, List
+from urllib.parse import urlsplit, urlunsplit
 from app.config import Config
+from app.services.webhook_signature import SIGNATURE_HEADER, WebhookSignatureValidator
 from app.utils.logger import setup_logger
+from app.utils.prometheus import TWILIO_ERRORS, TWILIO_SEND_SECONDS
+from app.utils.profiling import traced
 
 logger = setup_logger(__name__)
 
 
+class RetryAfterHttpClient(TwilioHttpClient):
+    """Client HTTP Twilio qui retient l'en-tête Retry-After de la dernière réponse du thread"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._local = threading.local()
+    
+    def request(self, *args, **kwargs):
+        self._local.retry_after = None
+        response = super().request(*args, **kwargs)
+        if response.status_code == 429 or response.status_code >= 500:
+            self._local.retry_after = (response.headers or {}).get('Retry-After')
+        return response
+    
+    def last_retry_after(self) -> Optional[float]:
+        """
+        Délai demandé par Twilio lors du dernier appel de ce thread
+        
+        Returns:
+            Délai en secondes, ou None si l'en-tête était absent
+        """
+        value = getattr(self._local, 'retry_after', None)
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            # Format date HTTP (RFC 7231)
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
 class TwilioService:
     """Service pour gérer les interactions avec Twilio"""
     
@@ -20,9 +65,16 @@ class TwilioService:
         self.account_sid = Config.TWILIO_ACCOUNT_SID
         self.auth_token = Config.TWILIO_AUTH_TOKEN
         self.whatsapp_number = Config.TWILIO_WHATSAPP_NUMBER
+        self.signature_validator = self._build_signature_validator()
         
         try:
-            self.client = Client(self.account_sid, self.auth_token)
+            self.client = Client(
+                self.account_sid,
+                self.auth_token,
+                http_client=RetryAfterHttpClient()
+            )
+            if Config.TWILIO_API_BASE:
+                self.client.api.base_url = Config.TWILIO_API_BASE.rstrip('/')
             logger.info("Client Twilio initialisé avec succès")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du client Twilio: {e}")
@@ -40,20 +92,12 @@ class TwilioService:
             SID du message si succès, None sinon
         """
         try:
-            # S'assurer que le numéro est au format whatsapp:+...
-            if not to.startswith('whatsapp:'):
-                to = f'whatsapp:{to}'
-            
-            logger.info(f"Envoi message à {to}: {body[:50]}...")
+            logger.info("Envoi message à %s: %.50s...", to, body)
             
-            message = self.client.messages.create(
-                from_=self.whatsapp_number,
-                body=body,
-                to=to
-            )
+            message_sid = self.create_message(to, body)
             
-            logger.info(f"Message envoyé avec succès. SID: {message.sid}")
-            return message.sid
+            logger.info("Message envoyé avec succès. SID: %s", message_sid)
+            return message_sid
             
         except TwilioRestException as e:
             logger.error(f"Erreur Twilio lors de l'envoi: {e.msg} (Code: {e.code})")
@@ -76,20 +120,12 @@ class TwilioService:
             SID du message si succès, None sinon
         """
         try:
-            if not to.startswith('whatsapp:'):
-                to = f'whatsapp:{to}'
-            
-            logger.info(f"Envoi message avec média à {to}")
+            logger.info("Envoi message avec média à %s", to)
             
-            message = self.client.messages.create(
-                from_=self.whatsapp_number,
-                body=body,
-                media_url=[media_url],
-                to=to
-            )
+            message_sid = self.create_message(to, body, media_url)
             
-            logger.info(f"Message avec média envoyé. SID: {message.sid}")
-            return message.sid
+            logger.info("Message avec média envoyé. SID: %s", message_sid)
+            return message_sid
             
         except TwilioRestException as e:
             logger.error(f"Erreur Twilio: {e.msg} (Code: {e.code})")
@@ -99,19 +135,168 @@ class TwilioService:
             logger.error(f"Erreur lors de l'envoi avec média: {e}", exc_info=True)
             return None
     
+    @traced('twilio_api')
+    def create_message(self, to: str, body: str, media_url: Optional[str] = None) -> str:
+        """
+        Crée un message via l'API Twilio sans intercepter les erreurs
+        
+        Args:
+            to: Numéro du destinataire
+            body: Contenu du message
+            media_url: URL d'un média à joindre (optionnel)
+            
+        Returns:
+            SID du message créé
+            
+        Raises:
+            TwilioRestException: Si Twilio refuse la requête
+        """
+        # S'assurer que le numéro est au format whatsapp:+...
+        if not to.startswith('whatsapp:'):
+            to = f'whatsapp:{to}'
+        
+        params = {'from_': self.whatsapp_number, 'body': body, 'to': to}
+        if media_url:
+            params['media_url'] = [media_url]
+        
+        started = time.monotonic()
+        try:
+            return self.client.messages.create(**params).sid
+        except TwilioRestException as e:
+            TWILIO_ERRORS.labels(str(e.code or e.status)).inc()
+            raise
+        except Exception:
+            TWILIO_ERRORS.labels('network').inc()
+            raise
+        finally:
+            TWILIO_SEND_SECONDS.observe(time.monotonic() - started)
+    
+    def get_retry_after(self) -> Optional[float]:
+        """
+        Délai Retry-After renvoyé par Twilio lors du dernier appel de ce thread
+        
+        Returns:
+            Délai en secondes, ou None si inconnu
+        """
+        http_client = getattr(self.client, 'http_client', None)
+        if isinstance(http_client, RetryAfterHttpClient):
+            return http_client.last_retry_after()
+        return None
+    
+    def find_sent_message(self, to: str, body: str, since: datetime) -> Optional[str]:
+        """
+        Cherche un message déjà créé (réconciliation après une erreur ambiguë)
+        
+        Args:
+            to: Numéro du destinataire
+            body: Contenu du message
+            since: Date (UTC) de la première tentative d'envoi
+            
+        Returns:
+            SID du message s'il existe déjà, None sinon
+        """
+        if not to.startswith('whatsapp:'):
+            to = f'whatsapp:{to}'
+        
+        # date_created est à la seconde près
+        since = since - timedelta(seconds=1)
+        recent: List = self.client.messages.list(to=to, from_=self.whatsapp_number, limit=20)
+        for message in recent:
+            if message.date_created and message.date_created < since:
+                break
+            if message.body == body:
+                return message.sid
+        return None
+    
+    def _build_signature_validator(self) -> Optional[WebhookSignatureValidator]:
+        """Crée le validateur de signature (None si la validation est désactivée)"""
+        if not Config.WEBHOOK_SIGNATURE_VALIDATION:
+            logger.warning("Validation de signature des webhooks désactivée (WEBHOOK_SIGNATURE_VALIDATION)")
+            return None
+        if not Config.WEBHOOK_PUBLIC_URL and not Config.WEBHOOK_TRUSTED_PROXY:
+            logger.warning(
+                "Ni WEBHOOK_PUBLIC_URL ni WEBHOOK_TRUSTED_PROXY: derrière un proxy TLS ou ngrok, "
+                "l'URL vue par le bot diffère de l'URL signée et tous les webhooks seront refusés"
+            )
+        return WebhookSignatureValidator(
+            self.auth_token or '',
+            self.account_sid,
+            Config.WEBHOOK_MAX_BODY_BYTES
+        )
+    
+    def precheck_webhook(self, headers, content_length: Optional[int]) -> Optional[str]:
+        """
+        Refus bon marché sur les en-têtes, à appeler avant de lire le corps
+        
+        Args:
+            headers: En-têtes de la requête
+            content_length: Taille annoncée du corps
+            
+        Returns:
+            Raison du refus (oversized, missing_signature...), ou None
+        """
+        if self.signature_validator is None:
+            if content_length is not None and content_length > Config.WEBHOOK_MAX_BODY_BYTES:
+                return "oversized"
+            return None
+        return self.signature_validator.precheck(headers.get(SIGNATURE_HEADER), content_length)
+    
+    def reject_oversized(self) -> str:
+        """
+        Compte un corps trop gros découvert pendant la lecture (sans Content-Length)
+        
+        Returns:
+            Raison du refus
+        """
+        if self.signature_validator is not None:
+            return self.signature_validator.reject("oversized")
+        return "oversized"
+    
+    @staticmethod
+    def _signed_url(url: str, headers) -> str:
+        """
+        URL signée par Twilio
+        
+        WEBHOOK_PUBLIC_URL si elle est configurée; sinon, avec
+        WEBHOOK_TRUSTED_PROXY, le schéma et l'hôte transmis par le proxy
+        (X-Forwarded-Proto, X-Forwarded-Host); sinon l'URL vue par le bot.
+        
+        Args:
+            url: URL de la requête reçue
+            headers: En-têtes de la requête
+            
+        Returns:
+            URL à signer, query string comprise
+        """
+        parts = urlsplit(url)
+        if Config.WEBHOOK_PUBLIC_URL:
+            query = parts.query
+            return f"{Config.WEBHOOK_PUBLIC_URL}?{query}" if query else Config.WEBHOOK_PUBLIC_URL
+        if not Config.WEBHOOK_TRUSTED_PROXY:
+            return url
+        # Chaîne de proxies: la première valeur est celle du proxy le plus proche du client
+        scheme = headers.get('X-Forwarded-Proto', '').split(',')[0].strip() or parts.scheme
+        netloc = headers.get('X-Forwarded-Host', '').split(',')[0].strip() or parts.netloc
+        return urlunsplit((scheme, netloc, parts.path, parts.query, ''))
+    
     def validate_webhook(self, request) -> bool:
         """
         Valide que la requête provient bien de Twilio
         
+        Vérifie le compte dans le corps brut, les champs requis puis la
+        signature HMAC X-Twilio-Signature. precheck_webhook() doit avoir été
+        appelé avant.
+        
         Args:
-            request: Objet Flask request
+            request: Objet Flask request (ou adaptateur exposant headers, url,
+                get_data() et form)
             
         Returns:
             True si valide, False sinon
         """
-        # Note: Pour une validation complète en production,
-        # utilisez twilio.request_validator.RequestValidator
-        # avec la signature X-Twilio-Signature
+        validator = self.signature_validator
+        if validator is not None and validator.check_account(request.get_data()):
+            return False
         
         # Vérification basique des champs requis
         required_fields = ['From', 'Body']
@@ -128,7 +313,14 @@ class TwilioService:
             logger.warning(f"Numéro source invalide: {from_number}")
             return False
         
-        return True
+        if validator is None:
+            return True
+        
+        return validator.verify(
+            self._signed_url(str(request.url), request.headers),
+            form_data,
+            request.headers.get(SIGNATURE_HEADER, '')
+        )
     
     def parse_incoming_message(self, request) -> Optional[dict]:
         """
@@ -163,8 +355,8 @@ class TwilioService:
                     }
                     message_data['media'].append(media_info)
             
-            logger.info(f"Message reçu de {message_data['profile_name']} ({message_data['from']})")
-            logger.debug(f"Contenu: {message_data['body'][:100]}...")
+            logger.info("Message reçu de %s (%s)", message_data['profile_name'], message_data['from'])
+            logger.debug("Contenu: %.100s...", message_data['body'])
             
             return message_data
             
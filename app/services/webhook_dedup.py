@@ -0,0 +1,187 @@
+"""
+Déduplication des webhooks Twilio
+Ensemble borné de MessageSid déjà reçus, partageable entre workers via SQLite
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class WebhookDeduplicator:
+    """Reconnaît les retries Twilio d'un même message (clé: MessageSid)"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sqlite_path: Optional[str] = None
+    ):
+        """
+        Initialise l'ensemble des messages vus
+
+        Args:
+            max_entries: Nombre max de SID gardés en mémoire
+            ttl: Durée pendant laquelle un SID est considéré comme vu (secondes)
+            sqlite_path: Fichier SQLite partagé entre processus (vide = mémoire seule)
+        """
+        self.max_entries = max_entries or Config.WEBHOOK_DEDUP_MAX_ENTRIES
+        self.ttl = ttl or Config.WEBHOOK_DEDUP_TTL
+        self.sqlite_path = Config.WEBHOOK_DEDUP_SQLITE_PATH if sqlite_path is None else sqlite_path
+
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._claims = 0
+
+        self._stats = {
+            "checked": 0,
+            "duplicates": 0,
+            "forgotten": 0,
+            "evictions": 0,
+            "disk_errors": 0,
+        }
+
+        if self.sqlite_path:
+            directory = os.path.dirname(self.sqlite_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS seen_messages ("
+                "message_sid TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+
+        logger.info(
+            f"Déduplication des webhooks initialisée (max: {self.max_entries}, ttl: {self.ttl}s, "
+            f"partagée: {self.sqlite_path or 'non'})"
+        )
+
+    def check_and_mark(self, message_sid: str) -> bool:
+        """
+        Marque un message comme reçu
+
+        Args:
+            message_sid: SID Twilio du message entrant
+
+        Returns:
+            True si c'est la première réception, False pour un doublon
+        """
+        now = time.time()
+        expires_at = now + self.ttl
+
+        with self._lock:
+            self._stats["checked"] += 1
+            seen_until = self._seen.get(message_sid)
+            if seen_until is not None and seen_until > now:
+                self._stats["duplicates"] += 1
+                return False
+            self._remember(message_sid, expires_at)
+            self._claims += 1
+            purge = self._claims % 1000 == 0
+
+        if self.sqlite_path and not self._claim_shared(message_sid, now, expires_at, purge):
+            # Un autre worker a déjà reçu ce message: c'est lui qui peut l'oublier,
+            # on ne le garde donc pas en mémoire locale
+            with self._lock:
+                self._seen.pop(message_sid, None)
+                self._stats["duplicates"] += 1
+            return False
+
+        return True
+
+    def forget(self, message_sid: str) -> None:
+        """
+        Oublie un message pour que le prochain retry Twilio soit traité
+
+        Args:
+            message_sid: SID Twilio du message entrant
+        """
+        with self._lock:
+            self._seen.pop(message_sid, None)
+            self._stats["forgotten"] += 1
+
+        if self.sqlite_path:
+            self._execute("DELETE FROM seen_messages WHERE message_sid = ?", (message_sid,))
+
+    def _remember(self, message_sid: str, expires_at: float) -> None:
+        """Ajoute un SID en mémoire en évinçant les plus anciens (verrou pris)"""
+        self._seen[message_sid] = expires_at
+        self._seen.move_to_end(message_sid)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _claim_shared(self, message_sid: str, now: float, expires_at: float, purge: bool) -> bool:
+        """Réserve le SID dans le store partagé (insertion atomique)"""
+        cursor = self._execute(
+            "INSERT INTO seen_messages (message_sid, expires_at) VALUES (?, ?) "
+            "ON CONFLICT(message_sid) DO UPDATE SET expires_at = excluded.expires_at "
+            "WHERE seen_messages.expires_at <= ?",
+            (message_sid, expires_at, now)
+        )
+        if purge:
+            self._execute("DELETE FROM seen_messages WHERE expires_at <= ?", (now,))
+        # En cas d'erreur SQLite, on laisse passer le message plutôt que de le perdre
+        return cursor is None or cursor.rowcount != 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retourne la connexion SQLite du thread (recréée après un fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, query: str, params: tuple = ()) -> Optional[sqlite3.Cursor]:
+        """Exécute une requête SQLite sans jamais faire échouer l'appelant"""
+        try:
+            return self._connection().execute(query, params)
+        except sqlite3.Error as e:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+            logger.warning(f"Erreur SQLite de déduplication: {e}")
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de déduplication
+
+        Returns:
+            Dict avec messages vérifiés, doublons et entrées en mémoire
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._seen)
+        return stats
+
+
+_deduplicator: Optional[WebhookDeduplicator] = None
+_deduplicator_lock = threading.Lock()
+
+
+def get_webhook_deduplicator() -> Optional[WebhookDeduplicator]:
+    """
+    Retourne le dédoublonneur de webhooks partagé du processus
+
+    Returns:
+        Instance WebhookDeduplicator, ou None si la déduplication est désactivée
+    """
+    global _deduplicator
+
+    if not Config.WEBHOOK_DEDUP_ENABLED:
+        return None
+
+    with _deduplicator_lock:
+        if _deduplicator is None:
+            _deduplicator = WebhookDeduplicator()
+        return _deduplicator
@@ -0,0 +1,177 @@
+"""
+Validation de la signature X-Twilio-Signature des webhooks
+Les refus bon marché (en-tête absent, corps trop gros, mauvais compte) passent
+avant le parsing du formulaire; la clé HMAC est préparée une seule fois
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable, Tuple
+from urllib.parse import urlsplit, urlunsplit
+from app.utils.prometheus import WEBHOOK_REJECTED
+
+SIGNATURE_HEADER = 'X-Twilio-Signature'
+
+# HMAC-SHA1 encodé en base64: 20 octets -> 28 caractères
+SIGNATURE_LENGTH = 28
+
+DEFAULT_PORTS = {'https': 443, 'http': 80}
+
+
+def _port_variant(url: str) -> Optional[str]:
+    """
+    URL avec le port par défaut ajouté (ou retiré s'il est présent)
+
+    Twilio signe selon les cas l'URL avec ou sans port explicite.
+    """
+    parts = urlsplit(url)
+    default_port = DEFAULT_PORTS.get(parts.scheme)
+    if parts.port:
+        netloc = parts.netloc.rsplit(':', 1)[0]
+    elif default_port:
+        netloc = f"{parts.netloc}:{default_port}"
+    else:
+        return None
+    return urlunsplit(parts._replace(netloc=netloc))
+
+
+def _sorted_params(params: Any) -> Iterable[Tuple[str, str]]:
+    """Paires (nom, valeur) triées comme dans l'algorithme de Twilio"""
+    getlist = getattr(params, 'getlist', None)
+    for name in sorted(set(params.keys())):
+        values = getlist(name) if getlist is not None else [params[name]]
+        for value in sorted(set(values)):
+            yield name, value
+
+
+class WebhookSignatureValidator:
+    """Vérifie qu'un webhook a été signé par Twilio avec le jeton du compte"""
+
+    def __init__(self, auth_token: str, account_sid: Optional[str], max_body_bytes: int):
+        """
+        Initialise le validateur
+
+        Args:
+            auth_token: Jeton d'authentification Twilio (clé HMAC)
+            account_sid: SID du compte attendu dans le formulaire (vide = non vérifié)
+            max_body_bytes: Taille maximale acceptée d'un webhook
+        """
+        # Clé préparée une fois: chaque validation copie l'état HMAC initial
+        self._mac = hmac.new(auth_token.encode('utf-8'), digestmod=hashlib.sha1)
+        self._account_marker = f"AccountSid={account_sid}".encode() if account_sid else None
+        self.max_body_bytes = max_body_bytes
+        self._lock = threading.Lock()
+        self._stats = {
+            "accepted": 0,
+            "rejected": Counter(),
+        }
+
+    def reject(self, reason: str) -> str:
+        """Compte un refus et retourne sa raison"""
+        with self._lock:
+            self._stats["rejected"][reason] += 1
+        WEBHOOK_REJECTED.labels(reason).inc()
+        return reason
+
+    def precheck(self, signature: Optional[str], content_length: Optional[int]) -> Optional[str]:
+        """
+        Refus sur les seuls en-têtes, avant de lire le corps
+
+        Args:
+            signature: Valeur de l'en-tête X-Twilio-Signature
+            content_length: Taille annoncée du corps
+
+        Returns:
+            Raison du refus (missing_signature, malformed_signature, oversized), ou None
+        """
+        if not signature:
+            return self.reject("missing_signature")
+        if len(signature) != SIGNATURE_LENGTH:
+            return self.reject("malformed_signature")
+        if content_length is not None and content_length > self.max_body_bytes:
+            return self.reject("oversized")
+        return None
+
+    def check_account(self, body: bytes) -> Optional[str]:
+        """
+        Vérifie le compte dans le corps brut, sans parser le formulaire
+
+        Args:
+            body: Corps application/x-www-form-urlencoded
+
+        Returns:
+            Raison du refus (oversized, account_mismatch), ou None
+        """
+        if len(body) > self.max_body_bytes:
+            return self.reject("oversized")
+        # Un SID Twilio est alphanumérique: identique une fois encodé en URL
+        if self._account_marker is not None and self._account_marker not in body:
+            return self.reject("account_mismatch")
+        return None
+
+    def compute(self, url: str, params: Any) -> str:
+        """
+        Calcule la signature attendue
+
+        Args:
+            url: URL complète appelée par Twilio (avec la query string)
+            params: Champs du formulaire (dict, MultiDict ou FormData)
+
+        Returns:
+            Signature encodée en base64
+        """
+        payload = url + ''.join(name + value for name, value in _sorted_params(params))
+        mac = self._mac.copy()
+        mac.update(payload.encode('utf-8'))
+        return base64.b64encode(mac.digest()).decode()
+
+    def verify(self, url: str, params: Any, signature: str) -> bool:
+        """
+        Vérifie la signature HMAC-SHA1 d'un webhook
+
+        Args:
+            url: URL complète appelée par Twilio
+            params: Champs du formulaire
+            signature: Valeur de l'en-tête X-Twilio-Signature
+
+        Returns:
+            True si la signature correspond (URL avec ou sans port)
+        """
+        try:
+            expected = base64.b64decode(signature, validate=True)
+        except (binascii.Error, ValueError):
+            self.reject("malformed_signature")
+            return False
+
+        # La chaîne des paramètres est construite une fois pour les deux variantes d'URL
+        suffix = ''.join(name + value for name, value in _sorted_params(params)).encode('utf-8')
+        for candidate in (url, _port_variant(url)):
+            if candidate is None:
+                continue
+            mac = self._mac.copy()
+            mac.update(candidate.encode('utf-8'))
+            mac.update(suffix)
+            if hmac.compare_digest(mac.digest(), expected):
+                with self._lock:
+                    self._stats["accepted"] += 1
+                return True
+
+        self.reject("bad_signature")
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de validation
+
+        Returns:
+            Dict avec les webhooks acceptés et les refus par raison
+        """
+        with self._lock:
+            return {
+                "accepted": self._stats["accepted"],
+                "rejected": dict(self._stats["rejected"]),
+            }
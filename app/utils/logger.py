@@ -1,65 +1,339 @@
 """
 Configuration du système de logging
+File d'attente unique par processus: les threads de requête déposent les
+enregistrements, un thread d'arrière-plan les formate et les écrit
 """
 
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Any, List, Optional
 from app.config import Config
 
+try:
+    import fcntl
+except ImportError:  # Windows: rotation sans verrou inter-processus
+    fcntl = None
+
+# Nombre maximal de gabarits suivis par la limitation de débit
+RATE_LIMIT_MAX_KEYS = 10000
+
+# Attributs standards d'un LogRecord (le reste est exporté en JSON via extra=)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'suppressed'}
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limite le débit des lignes INFO/DEBUG par gabarit de message
+
+    Le gabarit est le format %-style avant interpolation: les appels
+    logger.info("Envoi à %s", to) d'un même site partagent un seau de jetons.
+    Les avertissements et erreurs passent toujours.
+    """
+
+    def __init__(self, rate: float):
+        """
+        Initialise le filtre
+
+        Args:
+            rate: Lignes par seconde autorisées par gabarit (rafale égale au débit)
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.suppressed = 0
+        # (logger, gabarit) -> [jetons, dernier passage, lignes supprimées depuis]
+        self._buckets: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                if len(self._buckets) >= RATE_LIMIT_MAX_KEYS:
+                    self._buckets.clear()
+                state = self._buckets[key] = [self.burst, now, 0]
+
+            tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            state[1] = now
+            if tokens < 1:
+                state[0] = tokens
+                state[2] += 1
+                self.suppressed += 1
+                return False
+
+            state[0] = tokens - 1
+            suppressed = state[2]
+            state[2] = 0
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """Format texte historique, avec le nombre de lignes similaires supprimées"""
+
+    def __init__(self):
+        super().__init__(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" [+{suppressed} lignes similaires supprimées]"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement (collecte par Loki, ELK, Datadog...)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        # Champs passés avec extra={...}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LockedRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotation par taille partagée entre processus (workers gunicorn)
+
+    Chaque écriture prend un verrou fcntl sur <fichier>.lock. Un processus dont
+    le fichier a été tourné par un autre le rouvre avant d'écrire, ce qui évite
+    les rotations multiples et les écritures dans un fichier renommé.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        super().__init__(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding='utf-8',
+            delay=True
+        )
+        self._lock_file = None
+
+    def _reopen_if_rotated(self) -> None:
+        """Ferme le flux si le fichier sur disque n'est plus celui ouvert"""
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if fcntl is None:
+            super().emit(record)
+            return
+
+        try:
+            if self._lock_file is None:
+                self._lock_file = open(self.baseFilename + '.lock', 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class AsyncLogHandler(QueueHandler):
+    """
+    Dépose les enregistrements dans une file bornée, sans formatage ni écriture
+
+    Le formatage (y compris l'interpolation %-style) a lieu dans le thread
+    d'écriture. Le thread d'écriture est relancé dans chaque processus forké.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__(queue.Queue(max_size))
+        self.max_size = max_size
+        self._pid: Optional[int] = None
+        self._listener: Optional[QueueListener] = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self.file_error: Optional[str] = None
+
+    def _build_handlers(self) -> List[logging.Handler]:
+        """Crée les handlers de sortie (console et fichier) du processus"""
+        formatter = JsonFormatter() if Config.LOG_FORMAT.lower() == 'json' else TextFormatter()
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers: List[logging.Handler] = [console_handler]
+
+        try:
+            log_dir = os.path.dirname(Config.LOG_FILE)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            file_handler = LockedRotatingFileHandler(
+                Config.LOG_FILE, Config.LOG_MAX_BYTES, Config.LOG_BACKUP_COUNT
+            )
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        except Exception as e:
+            self.file_error = str(e)
+
+        return handlers
+
+    def _ensure_started(self) -> None:
+        """Démarre le thread d'écriture (une fois par processus)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Processus forké: la file et le thread hérités ne sont pas utilisables
+                self.queue = queue.Queue(self.max_size)
+            self._listener = QueueListener(self.queue, *self._build_handlers())
+            self._listener.start()
+            self._pid = os.getpid()
+
+            if self.file_error:
+                self.queue.put_nowait(logging.LogRecord(
+                    __name__, logging.WARNING, __file__, 0,
+                    "Impossible de créer le fichier de log: %s", (self.file_error,), None
+                ))
+                self.file_error = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # File en mémoire: pas besoin de rendre l'enregistrement sérialisable
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Le thread d'écriture ne suit pas: perdre la ligne plutôt que bloquer la requête
+            self.dropped += 1
+
+    def stop(self) -> None:
+        """Vide la file et arrête le thread d'écriture"""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+            self._listener = None
+            self._pid = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état de la file de logs
+
+        Returns:
+            Dict avec la profondeur de file et les lignes perdues ou supprimées
+        """
+        rate_limited = sum(
+            f.suppressed for f in self.filters if isinstance(f, RateLimitFilter)
+        )
+        return {
+            "queued": self.queue.qsize(),
+            "max_queue_size": self.max_size,
+            "dropped": self.dropped,
+            "rate_limited": rate_limited,
+            "format": Config.LOG_FORMAT.lower(),
+        }
+
+
+_log_handler: Optional[AsyncLogHandler] = None
+_log_handler_lock = threading.Lock()
+
+
+def get_log_handler() -> AsyncLogHandler:
+    """
+    Retourne le handler partagé par tous les loggers de l'application
+
+    Returns:
+        Instance AsyncLogHandler
+    """
+    global _log_handler
+
+    with _log_handler_lock:
+        if _log_handler is None:
+            handler = AsyncLogHandler(Config.LOG_QUEUE_SIZE)
+            if Config.LOG_RATE_LIMIT_PER_SECOND > 0:
+                handler.addFilter(RateLimitFilter(Config.LOG_RATE_LIMIT_PER_SECOND))
+            _log_handler = handler
+            atexit.register(shutdown_logging)
+        return _log_handler
+
+
+def shutdown_logging() -> None:
+    """Écrit les lignes encore en file (arrêt du processus)"""
+    if _log_handler is not None:
+        _log_handler.stop()
+
 
 def setup_logger(name):
     """
     Configure et retourne un logger
-    
+
     Args:
         name: Nom du logger (généralement __name__ du module)
-        
+
     Returns:
         Logger configuré
     """
     logger = logging.getLogger(name)
-    
+
     # Éviter de dupliquer les handlers
     if logger.handlers:
         return logger
-    
+
     # Définir le niveau de log
     log_level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
     logger.setLevel(log_level)
-    
-    # Format des logs
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Handler pour la console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Handler pour le fichier (avec rotation)
-    try:
-        log_file = Config.LOG_FILE
-        log_dir = os.path.dirname(log_file)
-        
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        
-        # Rotation: max 10MB par fichier, garder 5 fichiers
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=10 * 1024 * 1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        file_handler.setLevel(log_level)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-        
-    except Exception as e:
-        logger.warning(f"Impossible de créer le fichier de log: {e}")
-    
-    return logger
\ No newline at end of file
+
+    logger.addHandler(get_log_handler())
+    # Le logger parent "app" a le même handler: ne pas écrire chaque ligne deux fois
+    logger.propagate = False
+
+    return logger
@@ -0,0 +1,96 @@
+"""
+Primitives de mesure en mémoire
+Histogrammes thread-safe utilisés pour exposer les statistiques internes
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Sequence
+
+# Bornes par défaut (en secondes) adaptées aux latences réseau
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class Histogram:
+    """Histogramme à seaux fixes, sûr entre threads"""
+
+    def __init__(self, buckets: Optional[Sequence[float]] = None):
+        """
+        Initialise l'histogramme
+
+        Args:
+            buckets: Bornes supérieures des seaux, triées par ordre croissant
+        """
+        self.buckets = tuple(buckets or DEFAULT_LATENCY_BUCKETS)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Enregistre une observation
+
+        Args:
+            value: Valeur mesurée
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def percentile(self, q: float) -> float:
+        """
+        Estime un percentile à partir des seaux
+
+        Args:
+            q: Percentile entre 0 et 1
+
+        Returns:
+            Borne supérieure du seau contenant le percentile
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            maximum = self._max
+
+        if total == 0:
+            return 0.0
+
+        target = q * total
+        cumulated = 0
+        for index, count in enumerate(counts):
+            cumulated += count
+            if cumulated >= target:
+                if index < len(self.buckets):
+                    return min(self.buckets[index], maximum)
+                return maximum
+        return maximum
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retourne un résumé de l'histogramme
+
+        Returns:
+            Dict avec le nombre, la moyenne, le max et les percentiles
+        """
+        with self._lock:
+            count = self._count
+            total = self._sum
+            maximum = self._max
+
+        return {
+            "count": count,
+            "avg": round(total / count, 6) if count else 0.0,
+            "max": round(maximum, 6),
+            "p50": round(self.percentile(0.50), 6),
+            "p95": round(self.percentile(0.95), 6),
+            "p99": round(self.percentile(0.99), 6),
+        }
@@ -0,0 +1,480 @@
+"""
+Profilage à la demande
+Décomposition en étapes (spans) des requêtes tracées et profileur par
+échantillonnage au format « folded stacks » (flamegraph.pl, speedscope)
+"""
+
+import cProfile
+import functools
+import hmac
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+from app.config import Config
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# (trace active, profondeur du span courant) dans le contexte d'exécution
+_current: ContextVar[Optional[Tuple["Trace", int]]] = ContextVar('profiling_trace', default=None)
+
+# En-tête qui force le traçage d'une requête ("1" ou "cprofile"), pris en compte
+# seulement avec un jeton admin valide: sinon n'importe qui pourrait tracer ses requêtes
+PROFILE_HEADER = 'X-Profile'
+
+
+class Trace:
+    """Étapes chronométrées d'une requête, éventuellement réparties sur plusieurs threads"""
+
+    def __init__(self, name: str, cprofile: bool = False):
+        """
+        Initialise la trace
+
+        Args:
+            name: Point d'entrée (webhook, test_ai...)
+            cprofile: Profiler aussi process_message avec cProfile
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.cprofile = cprofile
+        self.started_at = datetime.now(timezone.utc)
+        self.t0 = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.profile_path: Optional[str] = None
+        # (nom, profondeur, début, fin, thread) en secondes depuis t0
+        self.spans: List[Tuple[str, int, float, float, str]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, depth: int, start: float, end: float) -> None:
+        """
+        Enregistre une étape terminée
+
+        Args:
+            name: Nom de l'étape
+            depth: Profondeur d'imbrication
+            start: Début (time.perf_counter())
+            end: Fin (time.perf_counter())
+        """
+        span = (name, depth, start - self.t0, end - self.t0, threading.current_thread().name)
+        with self._lock:
+            self.spans.append(span)
+
+    def add_wait(self, name: str, seconds: float) -> None:
+        """
+        Enregistre une attente mesurée ailleurs (file d'attente) qui se termine maintenant
+
+        Args:
+            name: Nom de l'étape
+            seconds: Durée de l'attente
+        """
+        end = time.perf_counter()
+        self.add_span(name, 0, end - seconds, end)
+
+    def finish(self) -> None:
+        """Marque la fin du traitement (les envois différés peuvent encore s'ajouter)"""
+        self.finished_at = time.perf_counter() - self.t0
+
+    def summary(self) -> str:
+        """Résumé d'une ligne: étapes de premier niveau et leur durée"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[2])
+        parts = [f"{name} {(end - start) * 1000:.1f}ms" for name, depth, start, end, _ in spans if depth <= 1]
+        return " > ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Retourne la trace sérialisable
+
+        Returns:
+            Dict avec l'identifiant, la durée totale et les étapes triées par début
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[2])
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.finished_at * 1000, 3) if self.finished_at is not None else None,
+            "cprofile": self.profile_path,
+            "spans": [
+                {
+                    "name": name,
+                    "depth": depth,
+                    "start_ms": round(start * 1000, 3),
+                    "duration_ms": round((end - start) * 1000, 3),
+                    "thread": thread,
+                }
+                for name, depth, start, end, thread in spans
+            ],
+        }
+
+
+class _Span:
+    """Chronomètre une étape de la trace active"""
+
+    __slots__ = ('trace', 'name', 'depth', 'start', 'token')
+
+    def __init__(self, trace: Trace, depth: int, name: str):
+        self.trace = trace
+        self.depth = depth
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.token = _current.set((self.trace, self.depth + 1))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = time.perf_counter()
+        _current.reset(self.token)
+        self.trace.add_span(self.name, self.depth, self.start, end)
+
+
+class _NoopSpan:
+    """Span inerte: coût quasi nul hors requêtes tracées"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """
+    Vérifie le jeton des endpoints d'administration
+
+    Args:
+        token: Valeur de l'en-tête X-Admin-Token
+
+    Returns:
+        True si ADMIN_TOKEN est configuré et correspond
+    """
+    if not Config.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+
+def current_trace() -> Optional[Trace]:
+    """Retourne la trace active dans ce contexte, ou None"""
+    state = _current.get()
+    return state[0] if state is not None else None
+
+
+def span(name: str):
+    """
+    Chronomètre un bloc dans la trace active (sans effet hors trace)
+
+    Args:
+        name: Nom de l'étape
+
+    Returns:
+        Gestionnaire de contexte
+    """
+    state = _current.get()
+    if state is None:
+        return _NOOP_SPAN
+    return _Span(state[0], state[1], name)
+
+
+def traced(name: str):
+    """
+    Décorateur: chronomètre chaque appel de la fonction (ou coroutine) dans la trace active
+
+    Args:
+        name: Nom de l'étape
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                state = _current.get()
+                if state is None:
+                    return await func(*args, **kwargs)
+                with _Span(state[0], state[1], name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            state = _current.get()
+            if state is None:
+                return func(*args, **kwargs)
+            with _Span(state[0], state[1], name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class activate:
+    """
+    Rend une trace active dans le thread courant (ex: un worker qui reprend le message)
+
+    Sans effet si la trace est None.
+    """
+
+    __slots__ = ('trace', 'token')
+
+    def __init__(self, trace: Optional[Trace]):
+        self.trace = trace
+        self.token = None
+
+    def __enter__(self) -> Optional[Trace]:
+        if self.trace is not None:
+            self.token = _current.set((self.trace, 0))
+        return self.trace
+
+    def __exit__(self, *exc) -> None:
+        if self.token is not None:
+            _current.reset(self.token)
+
+
+class SamplingProfiler:
+    """Échantillonne les piles de tous les threads à intervalle fixe"""
+
+    def __init__(self):
+        """Initialise le profileur (inactif)"""
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_output: Optional[str] = None
+        self.last_samples = 0
+
+    @property
+    def running(self) -> bool:
+        """True si un échantillonnage est en cours"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, interval: float) -> bool:
+        """
+        Lance un échantillonnage en arrière-plan
+
+        Args:
+            duration: Durée de la fenêtre (secondes)
+            interval: Intervalle entre deux échantillons (secondes)
+
+        Returns:
+            False si un échantillonnage est déjà en cours
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(duration, interval),
+                name="sampling-profiler",
+                daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Profilage par échantillonnage démarré ({duration}s, {interval * 1000:.0f}ms)")
+        return True
+
+    def stop(self) -> None:
+        """Arrête l'échantillonnage en cours (le résultat est tout de même écrit)"""
+        self._stop.set()
+
+    def _run(self, duration: float, interval: float) -> None:
+        """Boucle d'échantillonnage puis écriture du fichier folded"""
+        stacks: Counter = Counter()
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration
+        samples = 0
+
+        while time.monotonic() < deadline and not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(frames))] += 1
+            samples += 1
+            self._stop.wait(interval)
+
+        os.makedirs(Config.PROFILING_DIR, exist_ok=True)
+        path = os.path.join(
+            Config.PROFILING_DIR,
+            f"sample-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.folded"
+        )
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self.last_output = path
+        self.last_samples = samples
+        logger.info(f"Profil écrit: {path} ({samples} échantillons, {len(stacks)} piles)")
+
+
+class Profiler:
+    """Décide quelles requêtes tracer et conserve les traces récentes"""
+
+    def __init__(self):
+        """Initialise le profileur avec la configuration"""
+        self.sample_rate = Config.PROFILING_SAMPLE_RATE
+        self._override_rate: Optional[float] = None
+        self._override_until = 0.0
+        self.traces: deque = deque(maxlen=Config.PROFILING_MAX_TRACES)
+        self.sampler = SamplingProfiler()
+        self._lock = threading.Lock()
+        self._stats = {
+            "traced": 0,
+            "cprofiled": 0,
+        }
+
+    def current_sample_rate(self) -> float:
+        """Taux d'échantillonnage effectif (réglage temporaire inclus)"""
+        if self._override_rate is not None and time.monotonic() < self._override_until:
+            return self._override_rate
+        return self.sample_rate
+
+    def set_sample_rate(self, rate: float, duration: float) -> None:
+        """
+        Change temporairement le taux de requêtes tracées
+
+        Args:
+            rate: Fraction des requêtes tracées (0 à 1)
+            duration: Durée du réglage (secondes)
+        """
+        with self._lock:
+            self._override_rate = max(0.0, min(1.0, rate))
+            self._override_until = time.monotonic() + duration
+        logger.info(f"Traçage de {rate:.1%} des requêtes pendant {duration}s")
+
+    def start_trace(self, name: str, header: Optional[str] = None, admin: bool = False) -> Optional[Trace]:
+        """
+        Crée une trace si la requête est sélectionnée (à rendre active avec activate())
+
+        Args:
+            name: Point d'entrée
+            header: Valeur de l'en-tête X-Profile (optionnel)
+            admin: La requête porte un jeton admin valide (requis pour que l'en-tête compte)
+
+        Returns:
+            Trace active, ou None si la requête n'est pas tracée
+        """
+        if header and admin:
+            cprofile = header.lower() == 'cprofile' and admin
+        else:
+            rate = self.current_sample_rate()
+            if not rate or random.random() >= rate:
+                return None
+            cprofile = False
+
+        return Trace(name, cprofile=cprofile)
+
+    def record(self, trace: Trace) -> None:
+        """
+        Termine une trace et la conserve pour /admin/profiling/traces
+
+        Args:
+            trace: Trace terminée
+        """
+        trace.finish()
+        with self._lock:
+            self.traces.append(trace)
+            self._stats["traced"] += 1
+        logger.info("Trace %s (%.1fms): %s", trace.id, trace.finished_at * 1000, trace.summary())
+
+    def run_profiled(self, trace: Optional[Trace], func, *args, **kwargs):
+        """
+        Exécute func sous cProfile si la trace le demande
+
+        Le profil est écrit au format pstats (snakeviz, flameprof, gprof2dot).
+
+        Args:
+            trace: Trace active (ou None)
+            func: Fonction à exécuter
+        """
+        if trace is None or not trace.cprofile:
+            return func(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Un autre profileur est déjà actif dans le processus
+            return func(*args, **kwargs)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            os.makedirs(Config.PROFILING_DIR, exist_ok=True)
+            trace.profile_path = os.path.join(Config.PROFILING_DIR, f"trace-{trace.id}.prof")
+            profile.dump_stats(trace.profile_path)
+            with self._lock:
+                self._stats["cprofiled"] += 1
+
+    def get_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Retourne les traces les plus récentes
+
+        Args:
+            limit: Nombre maximal de traces (borné à PROFILING_MAX_TRACES)
+
+        Returns:
+            Traces de la plus récente à la plus ancienne
+        """
+        limit = min(limit, self.traces.maxlen)
+        if limit <= 0:
+            return []
+        with self._lock:
+            traces = list(self.traces)[-limit:]
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du profilage
+
+        Returns:
+            Dict avec le taux effectif, les compteurs et l'état de l'échantillonneur
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "sample_rate": self.current_sample_rate(),
+            "kept_traces": len(self.traces),
+            "sampler": {
+                "running": self.sampler.running,
+                "last_output": self.sampler.last_output,
+                "last_samples": self.sampler.last_samples,
+            },
+        })
+        return stats
+
+
+_profiler: Optional[Profiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    """
+    Retourne le profileur partagé du processus
+
+    Returns:
+        Instance Profiler
+    """
+    global _profiler
+
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler()
+        return _profiler
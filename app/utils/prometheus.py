@@ -0,0 +1,149 @@
+"""
+Métriques Prometheus exposées sur /metrics
+Compteurs et histogrammes par étape; compatibles avec le mode multi-processus
+de gunicorn (PROMETHEUS_MULTIPROC_DIR)
+"""
+
+import os
+from typing import Tuple
+from app.config import Config
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:  # Métriques optionnelles
+    Counter = None
+    Histogram = None
+
+# Bornes (secondes) des étapes locales, rapides
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Bornes (secondes) des appels réseau et de la génération
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+METRICS_AVAILABLE = Counter is not None and Config.METRICS_ENABLED
+
+
+class _NoopMetric:
+    """Métrique inerte quand prometheus_client est absent ou désactivé"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, buckets: Tuple[float, ...], labelnames: Tuple[str, ...] = ()):
+    if not METRICS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+    if not METRICS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+WEBHOOK_PARSE_SECONDS = _histogram(
+    'whatsapp_webhook_parse_seconds',
+    "Validation, déduplication et parsing d'un webhook Twilio",
+    FAST_BUCKETS
+)
+QUEUE_WAIT_SECONDS = _histogram(
+    'whatsapp_queue_wait_seconds',
+    "Attente d'un message dans la file des workers",
+    SLOW_BUCKETS
+)
+GENERATION_SECONDS = _histogram(
+    'whatsapp_generation_seconds',
+    "Durée d'une tentative de génération, par statut et numéro de tentative",
+    SLOW_BUCKETS,
+    ('status', 'attempt')
+)
+TWILIO_SEND_SECONDS = _histogram(
+    'whatsapp_twilio_send_seconds',
+    "Durée d'un appel d'envoi à l'API Twilio",
+    SLOW_BUCKETS
+)
+TWILIO_ERRORS = _counter(
+    'whatsapp_twilio_errors',
+    "Envois Twilio en échec, par code d'erreur",
+    ('code',)
+)
+CACHE_LOOKUPS = _counter(
+    'whatsapp_cache_lookups',
+    "Recherches dans les caches de réponses, par cache et résultat",
+    ('cache', 'result')
+)
+WEBHOOK_REJECTED = _counter(
+    'whatsapp_webhook_rejected',
+    "Webhooks refusés avant traitement, par raison",
+    ('reason',)
+)
+MEDIA_DOWNLOADS = _counter(
+    'whatsapp_media_downloads',
+    "Médias entrants, par résultat (stored, duplicate, rejected, error)",
+    ('result',)
+)
+MEDIA_DOWNLOAD_SECONDS = _histogram(
+    'whatsapp_media_download_seconds',
+    "Téléchargement et hachage d'un média entrant",
+    SLOW_BUCKETS
+)
+MESSAGES = _counter(
+    'whatsapp_messages',
+    "Messages entrants traités, par type",
+    ('type',)
+)
+
+# Séries à libellés fixes résolues une fois (évite la recherche à chaque appel)
+CACHE_EXACT_HIT = CACHE_LOOKUPS.labels('exact', 'hit')
+CACHE_EXACT_MISS = CACHE_LOOKUPS.labels('exact', 'miss')
+CACHE_NEAR_HIT = CACHE_LOOKUPS.labels('near', 'hit')
+CACHE_NEAR_MISS = CACHE_LOOKUPS.labels('near', 'miss')
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Produit le texte d'exposition Prometheus
+
+    En mode multi-processus, agrège les fichiers de tous les workers.
+
+    Returns:
+        Tuple (corps, content-type)
+
+    Raises:
+        RuntimeError: Si prometheus_client n'est pas installé ou que les métriques sont désactivées
+    """
+    if not METRICS_AVAILABLE:
+        raise RuntimeError("Métriques indisponibles (METRICS_ENABLED ou prometheus_client manquant)")
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """
+    Nettoie les fichiers d'un worker arrêté (hook child_exit de gunicorn)
+
+    Args:
+        pid: PID du worker arrêté
+    """
+    if METRICS_AVAILABLE and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,4 @@
+"""
+Benchmarks hors ligne
+Faux serveurs Twilio et Hugging Face locaux et générateur de charge sur /webhook
+"""
@@ -0,0 +1,436 @@
+"""
+Faux serveurs Twilio REST et Hugging Face Inference
+Latence, taux d'erreur et chargement de modèle (503) configurables, pour
+mesurer la capacité du bot sans compte ni quota réel
+
+Utilisation autonome:
+    python -m benchmarks.fake_servers --twilio-port 8901 --hf-port 8902 --hf-latency-ms 800
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Réponses renvoyées par le faux modèle (choisies selon le prompt)
+FAKE_ANSWERS = (
+    "Bonjour ! Je suis un modèle simulé pour les benchmarks.",
+    "Voici une réponse de test, générée sans appel au vrai modèle.",
+    "Réponse simulée: la latence est celle configurée sur le faux serveur.",
+)
+
+ACCOUNT_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<account>[^/]+)\.json$')
+MESSAGES_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages\.json$')
+MEDIA_PATH = re.compile(
+    r'^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages/(?P<message>[^/]+)/Media/(?P<media>[^/]+)$'
+)
+
+# Morceau d'écriture des faux médias
+MEDIA_CHUNK = 64 * 1024
+
+
+class Behaviour:
+    """Comportement simulé d'un service amont"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        throttle_rate: float = 0,
+        loading_rate: float = 0,
+        cold_start: float = 0
+    ):
+        """
+        Args:
+            latency_ms: Latence de base de chaque réponse
+            jitter_ms: Variation aléatoire ajoutée (uniforme, 0 à jitter_ms)
+            error_rate: Fraction de réponses 500
+            throttle_rate: Fraction de réponses 429 (Twilio, avec Retry-After)
+            loading_rate: Fraction de réponses 503 "modèle en chargement" (HF)
+            cold_start: Secondes après le démarrage pendant lesquelles le modèle répond 503
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.loading_rate = loading_rate
+        self.cold_start = cold_start
+        self.started_at = time.monotonic()
+
+    def sleep(self) -> None:
+        """Simule la latence du service"""
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def pick_failure(self) -> Optional[int]:
+        """Tire au sort une réponse d'erreur (code HTTP) ou None"""
+        if self.cold_start and time.monotonic() - self.started_at < self.cold_start:
+            return 503
+        roll = random.random()
+        for status, rate in ((500, self.error_rate), (429, self.throttle_rate), (503, self.loading_rate)):
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+
+class FakeServer:
+    """Serveur HTTP local dans un thread, avec compteurs de requêtes"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, behaviour: Behaviour, port: int = 0, host: str = '127.0.0.1'):
+        """
+        Args:
+            behaviour: Comportement simulé
+            port: Port d'écoute (0 = port libre choisi par le système)
+            host: Adresse d'écoute
+        """
+        self.behaviour = behaviour
+        self.counters: Counter = Counter()
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(self.handler_class):
+            fake = server
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionError:
+                    # Client parti en cours de réponse (téléchargement abandonné)
+                    pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counters[key] += 1
+
+    def start(self) -> "FakeServer":
+        """Démarre le serveur en arrière-plan"""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever,
+            name=type(self).__name__,
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Arrête le serveur"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs de requêtes par résultat"""
+        with self.lock:
+            return dict(self.counters)
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    """Lecture du corps et envoi de réponses JSON"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _TwilioHandler(_JsonHandler):
+    """Sous-ensemble de l'API REST Twilio utilisé par le bot"""
+
+    def do_GET(self):
+        fake: FakeTwilioServer = self.fake
+        parsed = urlparse(self.path)
+
+        match = ACCOUNT_PATH.match(parsed.path)
+        if match:
+            fake.count('account')
+            self._send_json(200, {
+                "sid": match.group('account'),
+                "friendly_name": "Compte de benchmark",
+                "status": "active",
+                "type": "Full",
+            })
+            return
+
+        match = MEDIA_PATH.match(parsed.path)
+        if match:
+            self._send_media(match.group('media'), parse_qs(parsed.query))
+            return
+
+        match = MESSAGES_PATH.match(parsed.path)
+        if match:
+            # Liste utilisée par la réconciliation des envois ambigus
+            fake.count('list')
+            to = parse_qs(parsed.query).get('To', [None])[0]
+            messages = [m for m in fake.recent_messages() if to is None or m["to"] == to]
+            self._send_json(200, {"messages": messages[:20], "next_page_uri": None, "page": 0})
+            return
+
+        self._send_json(404, {"code": 20404, "message": "Not found", "status": 404})
+
+    def _send_media(self, media_sid: str, query: Dict[str, List[str]]) -> None:
+        """Contenu déterministe par SID: un même média donne les mêmes octets"""
+        fake: FakeTwilioServer = self.fake
+        size = int(query.get('size', ['200000'])[0])
+        content_type = query.get('type', ['image/jpeg'])[0]
+        fake.count('media')
+        fake.behaviour.sleep()
+
+        block = random.Random(media_sid).randbytes(MEDIA_CHUNK)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        remaining = size
+        try:
+            while remaining > 0:
+                chunk = block[:min(remaining, MEDIA_CHUNK)]
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+        except ConnectionError:
+            fake.count('media_aborted')
+            self.close_connection = True
+
+    def do_POST(self):
+        fake: FakeTwilioServer = self.fake
+        form = {key: values[0] for key, values in parse_qs(self._read_body().decode()).items()}
+
+        match = MESSAGES_PATH.match(urlparse(self.path).path)
+        if not match:
+            self._send_json(404, {"code": 20404, "message": "Not found", "status": 404})
+            return
+
+        fake.behaviour.sleep()
+        failure = fake.behaviour.pick_failure()
+        if failure == 429:
+            fake.count('throttled')
+            self._send_json(429, {"code": 20429, "message": "Too Many Requests", "status": 429}, {"Retry-After": "1"})
+            return
+        if failure is not None:
+            fake.count('error')
+            self._send_json(500, {"code": 20500, "message": "Internal Server Error", "status": 500})
+            return
+
+        fake.count('sent')
+        self._send_json(201, fake.record_message(match.group('account'), form))
+
+
+class FakeTwilioServer(FakeServer):
+    """Faux Twilio: enregistre les messages envoyés et sert des médias entrants"""
+
+    handler_class = _TwilioHandler
+
+    def __init__(self, behaviour: Behaviour, port: int = 0, host: str = '127.0.0.1'):
+        super().__init__(behaviour, port, host)
+        # (destinataire, instant monotonic de réception)
+        self.deliveries: List[Tuple[str, float]] = []
+        self._messages: List[Dict[str, Any]] = []
+
+    def record_message(self, account: str, form: Dict[str, str]) -> Dict[str, Any]:
+        """Enregistre un message créé et retourne sa représentation API"""
+        message = {
+            "sid": f"SM{uuid.uuid4().hex}",
+            "account_sid": account,
+            "to": form.get('To'),
+            "from": form.get('From'),
+            "body": form.get('Body'),
+            "status": "queued",
+            "num_media": "1" if form.get('MediaUrl') else "0",
+            "date_created": formatdate(usegmt=True),
+        }
+        with self.lock:
+            self.deliveries.append((message["to"], time.monotonic()))
+            self._messages.append(message)
+            if len(self._messages) > 1000:
+                del self._messages[:500]
+        return message
+
+    def recent_messages(self) -> List[Dict[str, Any]]:
+        """Messages créés, du plus récent au plus ancien"""
+        with self.lock:
+            return list(reversed(self._messages))
+
+    def media_url(self, media_sid: str, size: int, content_type: str = 'image/jpeg') -> str:
+        """URL d'un faux média entrant, comme MediaUrl0 dans un webhook"""
+        return (
+            f"{self.url}/2010-04-01/Accounts/AC{'0' * 32}/Messages/MM{'0' * 32}/Media/{media_sid}"
+            f"?size={size}&type={content_type}"
+        )
+
+    def drain_deliveries(self) -> List[Tuple[str, float]]:
+        """Retire et retourne les messages reçus depuis le dernier appel"""
+        with self.lock:
+            deliveries, self.deliveries = self.deliveries, []
+        return deliveries
+
+
+class _HuggingFaceHandler(_JsonHandler):
+    """API d'inférence: génération simple, groupée et en flux (SSE)"""
+
+    def do_GET(self):
+        self.fake.count('status')
+        self._send_json(200, {"loaded": True, "state": "Loaded"})
+
+    def do_POST(self):
+        fake: FakeHuggingFaceServer = self.fake
+        try:
+            payload = json.loads(self._read_body() or b'{}')
+        except ValueError:
+            self._send_json(400, {"error": "JSON invalide"})
+            return
+
+        fake.behaviour.sleep()
+        failure = fake.behaviour.pick_failure()
+        if failure == 503:
+            fake.count('loading')
+            self._send_json(503, {"error": "Model is currently loading", "estimated_time": fake.estimated_time})
+            return
+        if failure is not None:
+            fake.count('error')
+            self._send_json(500, {"error": "Internal Server Error"})
+            return
+
+        inputs = payload.get('inputs', '')
+        if payload.get('stream'):
+            fake.count('stream')
+            self._send_stream(fake.answer(inputs))
+            return
+
+        if isinstance(inputs, list):
+            fake.count('batch')
+            self._send_json(200, [[{"generated_text": prompt + fake.answer(prompt)}] for prompt in inputs])
+            return
+
+        fake.count('generated')
+        # Comme l'API réelle: le texte généré reprend le prompt
+        self._send_json(200, [{"generated_text": inputs + fake.answer(inputs)}])
+
+    def _send_stream(self, answer: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for word in answer.split(' '):
+            event = {"token": {"text": word + ' ', "special": False}}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class FakeHuggingFaceServer(FakeServer):
+    """Faux serveur d'inférence (chemin /models/<modèle>)"""
+
+    handler_class = _HuggingFaceHandler
+
+    def __init__(self, behaviour: Behaviour, port: int = 0, host: str = '127.0.0.1', estimated_time: float = 1.0):
+        """
+        Args:
+            estimated_time: Valeur "estimated_time" des réponses 503
+        """
+        super().__init__(behaviour, port, host)
+        self.estimated_time = estimated_time
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        """Réponse déterministe pour un prompt"""
+        return FAKE_ANSWERS[len(prompt) % len(FAKE_ANSWERS)]
+
+
+def add_behaviour_arguments(parser: argparse.ArgumentParser) -> None:
+    """Ajoute les options de comportement des faux serveurs"""
+    group = parser.add_argument_group("faux Twilio")
+    group.add_argument('--twilio-latency-ms', type=float, default=150)
+    group.add_argument('--twilio-jitter-ms', type=float, default=50)
+    group.add_argument('--twilio-error-rate', type=float, default=0.0)
+    group.add_argument('--twilio-throttle-rate', type=float, default=0.0)
+
+    group = parser.add_argument_group("faux Hugging Face")
+    group.add_argument('--hf-latency-ms', type=float, default=800)
+    group.add_argument('--hf-jitter-ms', type=float, default=400)
+    group.add_argument('--hf-error-rate', type=float, default=0.0)
+    group.add_argument('--hf-loading-rate', type=float, default=0.0,
+                       help="Fraction de réponses 503 'model loading'")
+    group.add_argument('--hf-cold-start', type=float, default=0.0,
+                       help="Secondes de 503 au démarrage")
+    group.add_argument('--hf-estimated-time', type=float, default=1.0)
+
+
+def start_fake_servers(args, twilio_port: int = 0, hf_port: int = 0) -> Tuple[FakeTwilioServer, FakeHuggingFaceServer]:
+    """
+    Démarre les deux faux serveurs selon les options
+
+    Returns:
+        Tuple (faux Twilio, faux Hugging Face) déjà démarrés
+    """
+    twilio = FakeTwilioServer(Behaviour(
+        latency_ms=args.twilio_latency_ms,
+        jitter_ms=args.twilio_jitter_ms,
+        error_rate=args.twilio_error_rate,
+        throttle_rate=args.twilio_throttle_rate,
+    ), port=twilio_port).start()
+    hf = FakeHuggingFaceServer(Behaviour(
+        latency_ms=args.hf_latency_ms,
+        jitter_ms=args.hf_jitter_ms,
+        error_rate=args.hf_error_rate,
+        loading_rate=args.hf_loading_rate,
+        cold_start=args.hf_cold_start,
+    ), port=hf_port, estimated_time=args.hf_estimated_time).start()
+    return twilio, hf
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveurs Twilio et Hugging Face")
+    parser.add_argument('--twilio-port', type=int, default=8901)
+    parser.add_argument('--hf-port', type=int, default=8902)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    twilio, hf = start_fake_servers(args, args.twilio_port, args.hf_port)
+    print(f"TWILIO_API_BASE={twilio.url}")
+    print(f"HUGGINGFACE_API_BASE={hf.url}/models")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"twilio={twilio.get_stats()} hf={hf.get_stats()}")
+    except KeyboardInterrupt:
+        twilio.stop()
+        hf.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Test de charge hors ligne du webhook
+Démarre les faux serveurs, lance le bot pointé sur eux, envoie des webhooks
+signés à débit fixe et écrit les résultats en JSON
+
+    python -m benchmarks.load_test --rate 20 --duration 60
+    python -m benchmarks.load_test --server gunicorn --workers 4 --rate 50 \\
+        --compare benchmarks/results/reference.json
+
+La latence du webhook est mesurée depuis l'instant prévu d'envoi (boucle
+ouverte): un serveur saturé ne ralentit pas le générateur, ce qui évite de
+sous-estimer les percentiles élevés. La latence de bout en bout va de l'envoi
+du webhook à la réception de la réponse par le faux Twilio.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+
+import requests
+from twilio.request_validator import RequestValidator
+
+from benchmarks.fake_servers import add_behaviour_arguments, start_fake_servers
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+# Identifiants factices transmis au bot (aucun appel ne sort de la machine)
+BENCH_ACCOUNT_SID = 'AC' + '0' * 32
+BENCH_AUTH_TOKEN = 'benchmark-auth-token'
+BENCH_NUMBER = 'whatsapp:+15550000000'
+
+# Vocabulaire des prompts générés (assez varié pour ne pas toucher le cache approximatif)
+PROMPT_WORDS = (
+    "météo", "recette", "voyage", "musique", "histoire", "football", "jardin", "banque",
+    "train", "cinéma", "livre", "santé", "sport", "école", "emploi", "vacances",
+    "voiture", "chat", "montagne", "plage", "ordinateur", "téléphone", "impôts", "loyer",
+    "restaurant", "concert", "musée", "piscine", "vélo", "avion", "hôtel", "marché",
+)
+
+# Métriques comparées avec --compare (plus petit = meilleur, sauf débit)
+COMPARED_METRICS = (
+    ('webhook', 'throughput_rps'),
+    ('webhook', 'error_rate'),
+    ('webhook', 'latency_ms', 'p50'),
+    ('webhook', 'latency_ms', 'p99'),
+    ('end_to_end', 'latency_ms', 'p50'),
+    ('end_to_end', 'latency_ms', 'p99'),
+    ('end_to_end', 'missing_rate'),
+)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Percentiles d'une série de latences
+
+    Args:
+        values: Latences en secondes
+
+    Returns:
+        Dict en millisecondes (p50, p90, p95, p99, max, mean)
+    """
+    if not values:
+        return {key: None for key in ('p50', 'p90', 'p95', 'p99', 'max', 'mean')}
+    ordered = sorted(values)
+
+    def percentile(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1] * 1000, 3),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def server_command(args, port: int) -> List[str]:
+    """Commande de lancement du bot selon --server"""
+    if args.server == 'gunicorn':
+        return [
+            'gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+            '-b', f'127.0.0.1:{port}', 'app:create_app()'
+        ]
+    if args.server == 'uvicorn':
+        return [
+            sys.executable, '-m', 'uvicorn', 'app.asgi:app',
+            '--host', '127.0.0.1', '--port', str(port), '--workers', str(args.workers),
+            '--log-level', 'warning'
+        ]
+    return [sys.executable, 'main.py']
+
+
+def start_bot(args, twilio_url: str, hf_url: str, log_dir: str) -> subprocess.Popen:
+    """Lance le bot dans un sous-processus, configuré sur les faux serveurs"""
+    env = dict(os.environ)
+    env.update({
+        'HOST': '127.0.0.1',
+        'PORT': str(args.port),
+        'DEBUG': 'False',
+        'TWILIO_ACCOUNT_SID': BENCH_ACCOUNT_SID,
+        'TWILIO_AUTH_TOKEN': BENCH_AUTH_TOKEN,
+        'TWILIO_WHATSAPP_NUMBER': BENCH_NUMBER,
+        'TWILIO_API_BASE': twilio_url,
+        'HUGGINGFACE_API_KEY': 'benchmark',
+        'HUGGINGFACE_API_BASE': f'{hf_url}/models',
+        'INFERENCE_BACKEND': 'huggingface',
+        # Quotas conçus pour des humains: ils bloqueraient le générateur
+        'QUOTA_ENABLED': 'False',
+        'LOG_LEVEL': args.app_log_level,
+        'LOG_FILE': os.path.join(log_dir, 'bot.log'),
+        'MEDIA_DIR': os.path.join(log_dir, 'media'),
+    })
+    for assignment in args.env:
+        key, _, value = assignment.partition('=')
+        env[key] = value
+
+    stdout = open(os.path.join(log_dir, 'server.out'), 'w')
+    return subprocess.Popen(
+        server_command(args, args.port),
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=stdout,
+        stderr=subprocess.STDOUT
+    )
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    """Attend que le bot réponde sur /health/live"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le bot s'est arrêté au démarrage (code {process.returncode})")
+        try:
+            if requests.get(f'{base_url}/health/live', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Le bot n'a pas répondu sur {base_url} en {timeout}s")
+
+
+class LoadGenerator:
+    """Envoie des webhooks signés à débit fixe et collecte les latences"""
+
+    def __init__(self, args, base_url: str, twilio=None):
+        self.args = args
+        # Faux Twilio hébergeant les médias des webhooks (--media-every)
+        self.twilio = twilio
+        self.webhook_url = f'{base_url}/webhook'
+        self.validator = RequestValidator(BENCH_AUTH_TOKEN)
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=args.concurrency
+        ))
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        # Instants d'envoi par expéditeur, pour apparier les réponses (FIFO)
+        self.pending: Dict[str, deque] = defaultdict(deque)
+        self.sent = 0
+
+    def _payload(self, index: int) -> Dict[str, str]:
+        sender = f'whatsapp:+1555{index % self.args.senders:07d}'
+        # Prompts distincts par défaut: le cache ne fausse pas la mesure
+        variant = index % self.args.distinct_prompts if self.args.distinct_prompts else index
+        words = random.Random(variant).sample(PROMPT_WORDS, 6)
+        payload = {
+            'From': sender,
+            'To': BENCH_NUMBER,
+            'Body': f"Parle-moi de {', '.join(words)} ({variant})",
+            'MessageSid': f'SM{uuid.uuid4().hex}',
+            'AccountSid': BENCH_ACCOUNT_SID,
+            'NumMedia': '0',
+            'ProfileName': f'Bench {index % self.args.senders}',
+        }
+        if self.twilio is not None and self.args.media_every and index % self.args.media_every == 0:
+            # Médias distincts limités: les suivants sont des doublons (dédupliqués par SHA-256)
+            media = index // self.args.media_every
+            if self.args.distinct_media:
+                media %= self.args.distinct_media
+            payload.update({
+                'NumMedia': '1',
+                'MediaUrl0': self.twilio.media_url(f'ME{media:032d}', self.args.media_size),
+                'MediaContentType0': 'image/jpeg',
+            })
+        return payload
+
+    def _send(self, index: int, scheduled: float, measured: bool) -> None:
+        payload = self._payload(index)
+        headers = {'X-Twilio-Signature': self.validator.compute_signature(self.webhook_url, payload)}
+        with self.lock:
+            self.pending[payload['From']].append(scheduled)
+        try:
+            response = self.session.post(self.webhook_url, data=payload, headers=headers, timeout=30)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.monotonic() - scheduled
+
+        with self.lock:
+            if status != '200':
+                # Pas de réponse attendue pour un webhook refusé
+                try:
+                    self.pending[payload['From']].remove(scheduled)
+                except ValueError:
+                    pass
+            if measured:
+                self.latencies.append(elapsed)
+                self.statuses[status] += 1
+
+    def run(self) -> float:
+        """
+        Envoie les webhooks pendant la durée demandée
+
+        Returns:
+            Instant (monotonic) de début de la fenêtre mesurée
+        """
+        interval = 1.0 / self.args.rate
+        total = int((self.args.warmup + self.args.duration) * self.args.rate)
+        warmup_count = int(self.args.warmup * self.args.rate)
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            for index in range(total):
+                scheduled = start + index * interval
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, index, scheduled, index >= warmup_count)
+                self.sent += 1
+        return start + warmup_count * interval
+
+
+def match_deliveries(generator: LoadGenerator, twilio, measured_from: float, drain: float) -> Dict[str, Any]:
+    """
+    Apparie les messages reçus par le faux Twilio aux webhooks envoyés
+
+    Args:
+        generator: Générateur (instants d'envoi par expéditeur)
+        twilio: Faux serveur Twilio
+        measured_from: Début de la fenêtre mesurée (les envois antérieurs sont ignorés)
+        drain: Attente maximale des réponses restantes (secondes)
+
+    Returns:
+        Latences de bout en bout et nombre de réponses manquantes
+    """
+    latencies: List[float] = []
+    deadline = time.monotonic() + drain
+
+    while True:
+        for to, received_at in twilio.drain_deliveries():
+            with generator.lock:
+                queue = generator.pending.get(to)
+                if not queue:
+                    continue
+                sent_at = queue.popleft()
+            if sent_at >= measured_from:
+                latencies.append(received_at - sent_at)
+
+        with generator.lock:
+            outstanding = sum(
+                1 for queue in generator.pending.values() for sent_at in queue if sent_at >= measured_from
+            )
+        if not outstanding or time.monotonic() >= deadline:
+            break
+        time.sleep(0.1)
+
+    expected = len(latencies) + outstanding
+    return {
+        "replies": len(latencies),
+        "missing": outstanding,
+        "missing_rate": round(outstanding / expected, 4) if expected else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Commit courant (pour comparer les résultats dans le temps)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metric(results: Dict[str, Any], path: tuple) -> Optional[float]:
+    value: Any = results
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Compare aux résultats de référence
+
+    Args:
+        results: Résultats de ce run
+        baseline: Résultats de référence
+        tolerance: Dégradation relative tolérée (0.2 = 20%)
+
+    Returns:
+        Liste des régressions détectées (vide si aucune)
+    """
+    regressions = []
+    for path in COMPARED_METRICS:
+        current, reference = _metric(results, path), _metric(baseline, path)
+        if current is None or reference is None:
+            continue
+        name = '.'.join(path)
+        higher_is_better = path[-1] == 'throughput_rps'
+        if reference:
+            change = (current - reference) / reference
+        else:
+            change = 0.0 if current == reference else float('inf')
+        print(f"  {name:<32} {reference:>10} -> {current:>10} ({change:+.1%})")
+        worse = -change if higher_is_better else change
+        # Les taux nuls de référence tolèrent un bruit absolu de 1%
+        if worse > tolerance and not (not reference and abs(current) <= 0.01):
+            regressions.append(f"{name}: {reference} -> {current}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge hors ligne du webhook")
+    parser.add_argument('--rate', type=float, default=10, help="Webhooks par seconde")
+    parser.add_argument('--duration', type=float, default=30, help="Durée mesurée (secondes)")
+    parser.add_argument('--warmup', type=float, default=5, help="Durée d'échauffement non mesurée")
+    parser.add_argument('--drain', type=float, default=60, help="Attente maximale des réponses restantes")
+    parser.add_argument('--concurrency', type=int, default=64, help="Requêtes webhook simultanées max")
+    parser.add_argument('--senders', type=int, default=200, help="Nombre d'expéditeurs distincts")
+    parser.add_argument('--distinct-prompts', type=int, default=0,
+                        help="Nombre de prompts distincts (0 = tous différents, pas de cache)")
+    parser.add_argument('--media-every', type=int, default=0,
+                        help="Un webhook avec média tous les N (0 = texte seul)")
+    parser.add_argument('--media-size', type=int, default=200000, help="Taille des médias (octets)")
+    parser.add_argument('--distinct-media', type=int, default=0,
+                        help="Nombre de médias distincts (0 = tous différents)")
+    parser.add_argument('--server', choices=('flask', 'gunicorn', 'uvicorn'), default='flask')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--url', default='', help="Bot déjà lancé (ne démarre pas de sous-processus)")
+    parser.add_argument('--env', action='append', default=[], metavar='CLÉ=VALEUR',
+                        help="Variable d'environnement supplémentaire pour le bot")
+    parser.add_argument('--app-log-level', default='WARNING')
+    parser.add_argument('--twilio-port', type=int, default=0)
+    parser.add_argument('--hf-port', type=int, default=0)
+    parser.add_argument('--output', default='', help="Fichier de résultats (défaut: benchmarks/results/<date>.json)")
+    parser.add_argument('--compare', default='', help="Résultats de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Régression relative tolérée")
+    add_behaviour_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    twilio, hf = start_fake_servers(args, args.twilio_port, args.hf_port)
+    log_dir = tempfile.mkdtemp(prefix='bench-')
+    process = None
+    base_url = args.url.rstrip('/') or f'http://127.0.0.1:{args.port}'
+
+    try:
+        if not args.url:
+            process = start_bot(args, twilio.url, hf.url, log_dir)
+            wait_ready(base_url, process)
+        print(f"Bot: {base_url} | faux Twilio: {twilio.url} | faux HF: {hf.url} | logs: {log_dir}")
+
+        generator = LoadGenerator(args, base_url, twilio)
+        started = time.monotonic()
+        measured_from = generator.run()
+        send_elapsed = time.monotonic() - started
+
+        end_to_end = match_deliveries(generator, twilio, measured_from, args.drain)
+
+        try:
+            app_stats = requests.get(f'{base_url}/stats', timeout=5).json()
+        except (requests.RequestException, ValueError):
+            app_stats = None
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        twilio.stop()
+        hf.stop()
+
+    requests_measured = sum(generator.statuses.values())
+    errors = requests_measured - generator.statuses.get('200', 0)
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key not in ('compare', 'output')},
+        "webhook": {
+            "requests": requests_measured,
+            "throughput_rps": round(requests_measured / max(send_elapsed - args.warmup, 1e-9), 3),
+            "status_counts": dict(generator.statuses),
+            "error_rate": round(errors / requests_measured, 4) if requests_measured else 0.0,
+            "latency_ms": summarize(generator.latencies),
+        },
+        "end_to_end": end_to_end,
+        "upstream": {
+            "twilio": twilio.get_stats(),
+            "huggingface": hf.get_stats(),
+        },
+        "app_stats": app_stats,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{args.server}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    webhook = results["webhook"]
+    print(f"Webhook: {webhook['requests']} requêtes, {webhook['throughput_rps']} req/s, "
+          f"erreurs {webhook['error_rate']:.2%}, latence {webhook['latency_ms']}")
+    print(f"Bout en bout: {end_to_end['replies']} réponses, {end_to_end['missing']} manquantes, "
+          f"latence {end_to_end['latency_ms']}")
+    print(f"Résultats: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Comparaison avec {args.compare}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Régressions: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Coût de la validation des webhooks et tenue face à un flot de requêtes forgées
+
+    python -m benchmarks.signature_bench --iterations 20000 --flood 5000
+
+1. Micro-benchmark: refus sur en-têtes, refus sur le compte, signature HMAC
+   complète, comparée au RequestValidator du SDK Twilio.
+2. Flot: webhooks forgés (sans signature, signature fausse, mauvais compte,
+   corps trop gros) mêlés à des webhooks valides, envoyés à l'application
+   Flask en processus. Vérifie qu'aucun webhook forgé n'atteint la file de
+   traitement.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable
+
+from twilio.request_validator import RequestValidator
+
+from benchmarks.fake_servers import Behaviour, FakeTwilioServer
+from benchmarks.load_test import BENCH_ACCOUNT_SID, BENCH_AUTH_TOKEN, BENCH_NUMBER, RESULTS_DIR
+
+WEBHOOK_URL = 'http://localhost/webhook'
+
+
+def _form(index: int, account_sid: str = BENCH_ACCOUNT_SID) -> Dict[str, str]:
+    return {
+        'From': f'whatsapp:+1555{index % 1000:07d}',
+        'To': BENCH_NUMBER,
+        'Body': f'Message de test {index}',
+        'MessageSid': f'SM{index:032d}',
+        'AccountSid': account_sid,
+        'NumMedia': '0',
+        'ProfileName': 'Bench',
+    }
+
+
+def time_per_call(func: Callable[[], Any], iterations: int) -> float:
+    """Durée moyenne d'un appel, en microsecondes"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return round((time.perf_counter() - started) / iterations * 1e6, 3)
+
+
+def micro_benchmark(iterations: int) -> Dict[str, float]:
+    """Coût unitaire de chaque étape de validation (µs)"""
+    from app.services.webhook_signature import WebhookSignatureValidator
+
+    validator = WebhookSignatureValidator(BENCH_AUTH_TOKEN, BENCH_ACCOUNT_SID, 64 * 1024)
+    sdk_validator = RequestValidator(BENCH_AUTH_TOKEN)
+    form = _form(1)
+    signature = sdk_validator.compute_signature(WEBHOOK_URL, form)
+    body = '&'.join(f'{key}={value}' for key, value in form.items()).encode()
+    foreign_body = body.replace(BENCH_ACCOUNT_SID.encode(), b'AC' + b'f' * 32)
+
+    assert validator.verify(WEBHOOK_URL, form, signature)
+
+    return {
+        "precheck_missing_signature_us": time_per_call(lambda: validator.precheck(None, len(body)), iterations),
+        "precheck_ok_us": time_per_call(lambda: validator.precheck(signature, len(body)), iterations),
+        "account_mismatch_us": time_per_call(lambda: validator.check_account(foreign_body), iterations),
+        "verify_valid_us": time_per_call(lambda: validator.verify(WEBHOOK_URL, form, signature), iterations),
+        "verify_invalid_us": time_per_call(lambda: validator.verify(WEBHOOK_URL, form, 'A' * 27 + '='), iterations),
+        "twilio_sdk_validate_us": time_per_call(
+            lambda: sdk_validator.validate(WEBHOOK_URL, form, signature), iterations
+        ),
+    }
+
+
+def flood(count: int, valid_every: int) -> Dict[str, Any]:
+    """
+    Envoie un flot de webhooks forgés à l'application Flask
+
+    Args:
+        count: Nombre total de webhooks
+        valid_every: Un webhook valide tous les N (0 = aucun)
+
+    Returns:
+        Débit et codes HTTP par catégorie, messages réellement mis en file
+    """
+    from app import create_app
+    from app.registry import get_service
+
+    app = create_app()
+    client = app.test_client()
+    sdk_validator = RequestValidator(BENCH_AUTH_TOKEN)
+    oversized = {'Body': 'x' * (128 * 1024)}
+
+    def forged(index: int):
+        kind = ('missing_signature', 'bad_signature', 'account_mismatch', 'oversized')[index % 4]
+        if kind == 'missing_signature':
+            return kind, _form(index), {}
+        if kind == 'bad_signature':
+            return kind, _form(index), {'X-Twilio-Signature': 'A' * 27 + '='}
+        if kind == 'account_mismatch':
+            form = _form(index, 'AC' + 'f' * 32)
+            return kind, form, {'X-Twilio-Signature': sdk_validator.compute_signature(WEBHOOK_URL, form)}
+        return kind, dict(_form(index), **oversized), {'X-Twilio-Signature': 'A' * 27 + '='}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    valid_sent = 0
+    started = time.perf_counter()
+    for index in range(count):
+        if valid_every and index % valid_every == 0:
+            kind, form = 'valid', _form(index)
+            headers = {'X-Twilio-Signature': sdk_validator.compute_signature(WEBHOOK_URL, form)}
+            valid_sent += 1
+        else:
+            kind, form, headers = forged(index)
+
+        request_started = time.perf_counter()
+        status = client.post('/webhook', data=form, headers=headers).status_code
+        entry = results.setdefault(kind, {"count": 0, "seconds": 0.0, "status": {}})
+        entry["count"] += 1
+        entry["seconds"] += time.perf_counter() - request_started
+        entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+    elapsed = time.perf_counter() - started
+
+    for entry in results.values():
+        entry["mean_us"] = round(entry.pop("seconds") / entry["count"] * 1e6, 1)
+
+    submitted = get_service('worker_pool').get_stats()["submitted"]
+    return {
+        "requests": count,
+        "throughput_rps": round(count / elapsed, 1),
+        "by_kind": results,
+        "valid_sent": valid_sent,
+        "queued_for_processing": submitted,
+        "forged_reached_queue": max(0, submitted - valid_sent),
+        "validator": get_service('twilio_service').signature_validator.get_stats(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de la validation des webhooks Twilio")
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--flood', type=int, default=4000, help="Webhooks envoyés à l'application")
+    parser.add_argument('--valid-every', type=int, default=100, help="Un webhook valide tous les N")
+    parser.add_argument('--output', default='')
+    args = parser.parse_args(argv)
+
+    # Réponses envoyées à un faux Twilio, génération par le moteur de test
+    twilio = FakeTwilioServer(Behaviour()).start()
+    os.environ.update({
+        'TWILIO_ACCOUNT_SID': BENCH_ACCOUNT_SID,
+        'TWILIO_AUTH_TOKEN': BENCH_AUTH_TOKEN,
+        'TWILIO_WHATSAPP_NUMBER': BENCH_NUMBER,
+        'TWILIO_API_BASE': twilio.url,
+        'INFERENCE_BACKEND': 'stub',
+        'WEBHOOK_SIGNATURE_VALIDATION': 'True',
+        'WEBHOOK_PUBLIC_URL': '',
+        'QUOTA_ENABLED': 'False',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+    })
+
+    try:
+        results = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "micro": micro_benchmark(args.iterations),
+            "flood": flood(args.flood, args.valid_every),
+        }
+    finally:
+        twilio.stop()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"signature-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps(results["micro"], indent=2))
+    flood_results = results["flood"]
+    print(f"Flot: {flood_results['requests']} webhooks, {flood_results['throughput_rps']} req/s, "
+          f"{flood_results['forged_reached_queue']} forgés mis en file")
+    for kind, entry in flood_results["by_kind"].items():
+        print(f"  {kind:<18} {entry['count']:>6}  {entry['mean_us']:>8} µs  {entry['status']}")
+    print(f"Résultats: {output}")
+    return 1 if flood_results["forged_reached_queue"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Configuration commune des tests unitaires
+Les variables d'environnement sont fixées avant le premier import de app.config
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# test_bot.py est un script à lancer contre un serveur démarré, pas un test unitaire
+collect_ignore = ['test_bot.py']
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TEST_DIR = tempfile.mkdtemp(prefix='whatsapp-bot-tests-')
+
+os.environ.update({
+    'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+    'TWILIO_AUTH_TOKEN': 'jeton-de-test',
+    'ADMIN_TOKEN': 'admin-de-test',
+    'TWILIO_WHATSAPP_NUMBER': 'whatsapp:+15550000000',
+    'INFERENCE_BACKEND': 'stub',
+    'STUB_LATENCY_MS': '0',
+    'LOG_LEVEL': 'WARNING',
+    'LOG_FILE': os.path.join(_TEST_DIR, 'tests.log'),
+    'MEDIA_DIR': os.path.join(_TEST_DIR, 'media'),
+})
+
+
+@pytest.fixture
+def client():
+    """Client de test Flask (les services sont construits à la première requête)"""
+    from app import create_app
+    return create_app().test_client()
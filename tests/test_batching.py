@@ -0,0 +1,77 @@
+"""
+Tests du regroupement en micro-lots: taille max, attente max, erreurs partagées
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.services.batching import MicroBatcher
+
+
+def test_full_batch_is_sent_without_waiting():
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=5000, max_concurrency=1)
+    futures = [batcher.submit(i) for i in range(4)]
+
+    # 4 éléments remplissent le lot: pas d'attente des 5 secondes
+    assert [future.result(1) for future in futures] == [0, 2, 4, 6]
+    assert batches == [[0, 1, 2, 3]]
+
+
+def test_partial_batch_is_sent_after_max_wait():
+    batcher = MicroBatcher(lambda items: [item.upper() for item in items],
+                           max_batch_size=8, max_wait_ms=20, max_concurrency=1)
+    futures = [batcher.submit(text) for text in ('a', 'b')]
+    assert [future.result(1) for future in futures] == ['A', 'B']
+    stats = batcher.get_stats()
+    assert stats["batches"] == 1 and stats["items"] == 2
+
+
+def test_items_accumulate_while_all_slots_are_busy():
+    release = threading.Event()
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=1, max_concurrency=1)
+    first = batcher.submit(0)
+    while not batches:
+        time.sleep(0.005)
+    # Le lot [1] est fermé puis attend un créneau: 2, 3 et 4 forment le lot suivant
+    second = batcher.submit(1)
+    time.sleep(0.05)
+    rest = [batcher.submit(i) for i in range(2, 5)]
+    release.set()
+
+    assert first.result(1) == 0 and second.result(1) == 1
+    assert [future.result(1) for future in rest] == [2, 3, 4]
+    assert batches == [[0], [1], [2, 3, 4]]
+
+
+def test_error_fails_every_item_of_the_batch():
+    def batch_fn(items):
+        raise RuntimeError("modèle indisponible")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=1000, max_concurrency=1)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(1)
+    assert batcher.get_stats()["errors"] == 1
+
+
+def test_result_count_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait_ms=1000, max_concurrency=1)
+    futures = [batcher.submit(i) for i in range(2)]
+    with pytest.raises(ValueError):
+        futures[0].result(1)
@@ -3,12 +3,19 @@ Script de test pour le bot WhatsApp
 Teste les différents endpoints et fonctionnalités
 """
 
+import os
 import requests
 import json
 import time
+from dotenv import load_dotenv
+from twilio.request_validator import RequestValidator
 
-# Configuration
+# Configuration (mêmes identifiants Twilio que le serveur pour signer le webhook)
+load_dotenv()
 BASE_URL = "http://localhost:5000"
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "AC" + "x" * 32)
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
+WEBHOOK_URL = os.getenv("WEBHOOK_PUBLIC_URL") or f"{BASE_URL}/webhook"
 
 
 def print_separator(title=""):
@@ -166,17 +173,21 @@ def test_webhook():
         "To": "whatsapp:+14155238886",
         "Body": "Test de webhook!",
         "MessageSid": "SM" + "x" * 32,
-        "AccountSid": "AC" + "x" * 32,
+        "AccountSid": TWILIO_ACCOUNT_SID,
         "NumMedia": "0",
         "ProfileName": "Test User"
     }
     
+    # Signature calculée comme Twilio: le serveur rejette les webhooks non signés
+    signature = RequestValidator(TWILIO_AUTH_TOKEN).compute_signature(WEBHOOK_URL, webhook_data)
+    
     try:
-        print("Envoi de données webhook simulées...")
+        print("Envoi de données webhook simulées (signées)...")
         
         response = requests.post(
             f"{BASE_URL}/webhook",
             data=webhook_data,
+            headers={"X-Twilio-Signature": signature},
             timeout=120
         )
         
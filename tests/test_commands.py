@@ -0,0 +1,20 @@
+"""
+Tests des commandes du bot (/info, /ping)
+"""
+
+from app.registry import get_service
+
+
+def test_info_reports_active_backend():
+    handler = get_service('message_handler')
+    backend = handler.huggingface_service.backend
+
+    info = handler._get_info_message()
+    assert backend.name == 'stub'
+    assert f"Plateforme: {backend.label}" in info
+    assert f"Modèle IA: {backend.model.split('/')[-1]}" in info
+    assert "Hugging Face Inference API" not in info
+
+
+def test_ping_command():
+    assert get_service('message_handler')._handle_command('/ping') == "🏓 Pong! Le bot est actif."
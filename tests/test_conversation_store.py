@@ -0,0 +1,85 @@
+"""
+Tests de la mémoire des conversations: éviction LRU, expiration, tampon circulaire et budget
+"""
+
+import time
+
+from app.services.conversation_store import ConversationStore, estimate_tokens, select_history
+
+
+def make_store(**kwargs):
+    params = dict(max_turns=3, max_conversations=2, idle_ttl=60, max_chars=100)
+    params.update(kwargs)
+    return ConversationStore(**params)
+
+
+def test_least_recently_active_conversation_is_evicted():
+    """Au-delà de max_conversations, la conversation la moins récemment active part"""
+    store = make_store()
+    store.add_exchange('alice', 'bonjour', 'salut')
+    store.add_exchange('bob', 'bonjour', 'salut')
+    store.add_exchange('alice', 'encore moi', 're')  # alice redevient la plus récente
+    store.add_exchange('carol', 'bonjour', 'salut')
+
+    assert store.get_history('bob') == []
+    assert len(store.get_history('alice')) == 2
+    assert len(store.get_history('carol')) == 1
+    stats = store.get_stats()
+    assert stats["evictions"] == 1 and stats["conversations"] == 2
+
+
+def test_idle_conversations_expire():
+    """Les conversations inactives depuis idle_ttl sont oubliées, les actives restent"""
+    store = make_store(idle_ttl=0.05)
+    store.add_exchange('alice', 'bonjour', 'salut')
+    time.sleep(0.08)
+    store.add_exchange('bob', 'bonjour', 'salut')
+
+    assert store.get_history('alice') == []
+    assert len(store.get_history('bob')) == 1
+    stats = store.get_stats()
+    assert stats["expirations"] == 1 and stats["conversations"] == 1
+
+
+def test_ring_buffer_keeps_last_turns():
+    """Seuls les max_turns derniers échanges sont conservés, dans l'ordre"""
+    store = make_store()
+    for index in range(5):
+        store.add_exchange('alice', f'question {index}', f'réponse {index}')
+
+    history = store.get_history('alice')
+    assert [user_text for user_text, _, _ in history] == ['question 2', 'question 3', 'question 4']
+
+
+def test_messages_truncated_and_tokens_counted_once():
+    """Les messages sont tronqués à max_chars; le coût en tokens porte sur le texte conservé"""
+    store = make_store(max_chars=10)
+    store.add_exchange('alice', 'x' * 50, 'y' * 50)
+
+    user_text, assistant_text, tokens = store.get_history('alice')[0]
+    assert user_text == 'x' * 10 and assistant_text == 'y' * 10
+    assert tokens == estimate_tokens('x' * 10) + estimate_tokens('y' * 10)
+
+
+def test_select_history_keeps_most_recent_within_budget():
+    """Les échanges les plus récents tenant dans le budget, en ordre chronologique"""
+    history = [('q1', 'r1', 5), ('q2', 'r2', 4), ('q3', 'r3', 3)]
+
+    assert select_history(history, 7) == [('q2', 'r2', 4), ('q3', 'r3', 3)]
+    assert select_history(history, 12) == history
+    assert select_history(history, 6) == [('q3', 'r3', 3)]
+    assert select_history(history, 2) == []
+
+
+def test_select_history_stops_at_first_overflow():
+    """Un ancien échange court ne saute pas par-dessus un échange trop long"""
+    history = [('q1', 'r1', 1), ('q2', 'r2', 10), ('q3', 'r3', 3)]
+    assert select_history(history, 5) == [('q3', 'r3', 3)]
+
+
+def test_clear_forgets_conversation():
+    """/clear oublie la conversation de l'utilisateur"""
+    store = make_store()
+    store.add_exchange('alice', 'bonjour', 'salut')
+    store.clear('alice')
+    assert store.get_history('alice') == []
@@ -0,0 +1,58 @@
+"""
+Tests de la file équitable entre expéditeurs
+"""
+
+import queue
+import threading
+
+import pytest
+
+from app.handlers.fair_queue import FairQueue
+
+
+def drain(fair_queue):
+    return [fair_queue.get(timeout=0) for _ in range(fair_queue.qsize())]
+
+
+def test_round_robin_between_senders():
+    fair_queue = FairQueue(maxsize=100)
+    for i in range(4):
+        fair_queue.put_nowait('bavard', f'b{i}')
+    fair_queue.put_nowait('alice', 'a0')
+    fair_queue.put_nowait('bob', 'c0')
+    fair_queue.put_nowait('alice', 'a1')
+
+    # Le bavard n'attend que derrière ses propres messages, l'ordre par expéditeur est gardé
+    assert drain(fair_queue) == ['b0', 'a0', 'c0', 'b1', 'a1', 'b2', 'b3']
+
+
+def test_global_and_per_sender_limits():
+    fair_queue = FairQueue(maxsize=3, max_per_key=2)
+    fair_queue.put_nowait('alice', 1)
+    fair_queue.put_nowait('alice', 2)
+    with pytest.raises(queue.Full):
+        fair_queue.put_nowait('alice', 3)
+
+    fair_queue.put_nowait('bob', 1)
+    with pytest.raises(queue.Full):
+        fair_queue.put_nowait('carol', 1)
+    assert fair_queue.qsize() == 3
+
+
+def test_get_times_out_when_empty():
+    with pytest.raises(queue.Empty):
+        FairQueue(maxsize=10).get(timeout=0.01)
+
+
+def test_close_wakes_consumers_after_draining():
+    fair_queue = FairQueue(maxsize=10)
+    fair_queue.put_nowait('alice', 'dernier')
+    results = []
+    consumers = [threading.Thread(target=lambda: results.append(fair_queue.get())) for _ in range(3)]
+    for consumer in consumers:
+        consumer.start()
+    fair_queue.close()
+    for consumer in consumers:
+        consumer.join(5)
+
+    assert sorted(results, key=str) == [None, None, 'dernier']
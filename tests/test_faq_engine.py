@@ -0,0 +1,74 @@
+"""
+Tests de la FAQ: automate Aho-Corasick, choix de l'entrée, rechargement à chaud
+"""
+
+import json
+import os
+
+from app.services.faq_engine import AhoCorasick, FaqEngine
+
+
+def write_faq(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"entries": entries}, f)
+
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert automaton.find("ushers") == [0, 1, 3]
+    assert automaton.find("ahishers") == [0, 1, 2, 3]
+    assert automaton.find("xyz") == []
+
+
+def test_automaton_matches_naive_search():
+    patterns = ["aba", "ab", "bab", "b", "abab"]
+    automaton = AhoCorasick(patterns)
+    for text in ("abababa", "bbbb", "aaaa", "babab", ""):
+        expected = [i for i, pattern in enumerate(patterns) if pattern in text]
+        assert automaton.find(text) == expected
+
+
+def test_answer_matches_whole_words_only(tmp_path):
+    path = os.path.join(tmp_path, 'faq.json')
+    write_faq(path, [{"id": "horaires", "keywords": ["horaires", "heure d'ouverture"], "response": "9h-18h"}])
+    faq = FaqEngine(path, reload_interval=0)
+
+    assert faq.answer("Quels sont vos HORAIRES ?") == "9h-18h"
+    assert faq.answer("À quelle heure d'ouverture ?") == "9h-18h"
+    assert faq.answer("Les horairesxyz") is None
+    assert faq.get_stats()["hits"] == 2
+
+
+def test_priority_score_and_max_words(tmp_path):
+    path = os.path.join(tmp_path, 'faq.json')
+    write_faq(path, [
+        {"id": "prix", "keywords": ["prix"], "response": "Voir le site"},
+        {"id": "prix_livraison", "keywords": ["prix", "livraison"], "response": "Livraison offerte"},
+        {"id": "urgence", "keywords": ["urgent"], "response": "Appelez-nous", "priority": 5},
+        {"id": "bonjour", "keywords": ["bonjour"], "response": "Bonjour !", "max_words": 2},
+    ])
+    faq = FaqEngine(path, reload_interval=0)
+
+    # Plus de mots-clés trouvés l'emporte, sauf priorité explicite
+    assert faq.answer("prix de la livraison") == "Livraison offerte"
+    assert faq.answer("prix urgent de la livraison") == "Appelez-nous"
+    # Un long message qui commence par bonjour est une vraie question
+    assert faq.answer("Bonjour") == "Bonjour !"
+    assert faq.answer("Bonjour, je voudrais connaître votre politique de retour") is None
+
+
+def test_hot_reload_keeps_previous_table_on_invalid_file(tmp_path):
+    path = os.path.join(tmp_path, 'faq.json')
+    write_faq(path, [{"id": "a", "keywords": ["retour"], "response": "30 jours"}])
+    faq = FaqEngine(path, reload_interval=0)
+    assert faq.answer("retour") == "30 jours"
+
+    write_faq(path, [{"id": "a", "keywords": ["retour"], "response": "60 jours"}])
+    os.utime(path, (1, 1))
+    assert faq.answer("retour") == "60 jours"
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("{invalide")
+    os.utime(path, (2, 2))
+    assert faq.answer("retour") == "60 jours"
+    assert faq.get_stats()["load_errors"] == 1
@@ -0,0 +1,152 @@
+"""
+Tests du moteur composite: doublon après le délai, bascule sur erreur, budget et classement
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.config import Config
+from app.services.backends.hedged import HedgedBackend
+from app.services.backends.stub import StubBackend
+
+HEDGE_DELAY = 0.02
+SLOW = 0.3
+
+
+class FailingBackend(StubBackend):
+    """Moteur qui échoue après sa latence"""
+
+    def generate(self, prompt):
+        super().generate(prompt)
+        raise RuntimeError("moteur en panne")
+
+    async def agenerate(self, prompt):
+        await super().agenerate(prompt)
+        raise RuntimeError("moteur en panne")
+
+
+def make_stub(latency, backend_class=StubBackend):
+    backend = backend_class("stub", {})
+    backend.latency = latency
+    return backend
+
+
+def make_hedged(*backends):
+    return HedgedBackend([(f"stub:{index}", backend) for index, backend in enumerate(backends)])
+
+
+def run(hedged, mode):
+    """Appelle generate() ou agenerate() selon le mode"""
+    if mode == "async":
+        return asyncio.run(hedged.agenerate("Bonjour"))
+    return hedged.generate("Bonjour")
+
+
+@pytest.fixture(autouse=True)
+def hedge_config(monkeypatch):
+    """Délai de couverture fixe et court, doublons autorisés à chaque requête"""
+    monkeypatch.setattr(Config, 'HEDGE_MIN_SAMPLES', 1000)
+    monkeypatch.setattr(Config, 'HEDGE_INITIAL_DELAY_MS', int(HEDGE_DELAY * 1000))
+    monkeypatch.setattr(Config, 'HEDGE_MIN_DELAY_MS', 1)
+    monkeypatch.setattr(Config, 'HEDGE_MAX_RATIO', 1.0)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_fast_primary_is_not_hedged(mode):
+    """Le principal répond avant son délai: aucun doublon"""
+    primary, secondary = make_stub(0), make_stub(0)
+    hedged = make_hedged(primary, secondary)
+
+    assert run(hedged, mode)
+    assert primary.calls == 1 and secondary.calls == 0
+    assert hedged.describe()["hedging"]["hedged"] == 0
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_hedge_fires_after_delay_and_first_response_wins(mode):
+    """Principal lent: le doublon part après hedge_delay() et sa réponse l'emporte"""
+    primary, secondary = make_stub(SLOW), make_stub(0)
+    hedged = make_hedged(primary, secondary)
+
+    started = time.monotonic()
+    assert run(hedged, mode)
+    elapsed = time.monotonic() - started
+
+    assert HEDGE_DELAY <= elapsed < SLOW
+    assert secondary.calls == 1
+    stats = hedged.describe()["hedging"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["hedge_rate"] == 1.0 and stats["hedge_win_rate"] == 1.0
+    assert hedged.endpoints[1].wins == 1 and hedged.endpoints[0].wins == 0
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_primary_wins_when_hedge_is_slower(mode):
+    """Le doublon part mais le principal répond en premier: pas de victoire du doublon"""
+    primary, secondary = make_stub(HEDGE_DELAY * 3), make_stub(SLOW)
+    hedged = make_hedged(primary, secondary)
+
+    assert run(hedged, mode)
+    stats = hedged.describe()["hedging"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 0
+    assert hedged.endpoints[0].wins == 1
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_hedge_budget_limits_duplicates(mode, monkeypatch):
+    """Au-delà de HEDGE_MAX_RATIO des requêtes, le principal lent est attendu seul"""
+    monkeypatch.setattr(Config, 'HEDGE_MAX_RATIO', 0.5)
+    primary, secondary = make_stub(HEDGE_DELAY * 3), make_stub(HEDGE_DELAY * 3)
+    hedged = make_hedged(primary, secondary)
+
+    run(hedged, mode)
+    run(hedged, mode)
+
+    stats = hedged.describe()["hedging"]
+    assert stats["requests"] == 2
+    assert stats["hedged"] == 1 and stats["hedge_budget_exhausted"] == 1
+    assert stats["hedge_rate"] == 0.5
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_failover_on_error(mode):
+    """Erreur du principal: bascule immédiate vers le suivant"""
+    primary, secondary = make_stub(0, FailingBackend), make_stub(0)
+    hedged = make_hedged(primary, secondary)
+
+    assert run(hedged, mode)
+    stats = hedged.describe()["hedging"]
+    assert stats["failovers"] == 1 and stats["hedged"] == 0
+    assert hedged.endpoints[0].failures == 1
+    assert hedged.endpoints[1].wins == 1
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_single_hedge_per_request_after_failover(mode, monkeypatch):
+    """Après une bascule, le délai de couverture ne repart pas: un seul doublon"""
+    monkeypatch.setattr(Config, 'HEDGE_MAX_RATIO', 10.0)
+    first, second = make_stub(HEDGE_DELAY * 2, FailingBackend), make_stub(HEDGE_DELAY * 3, FailingBackend)
+    third, fourth = make_stub(HEDGE_DELAY * 5), make_stub(0)
+    hedged = make_hedged(first, second, third, fourth)
+
+    assert run(hedged, mode)
+    assert third.calls == 1 and fourth.calls == 0
+    stats = hedged.describe()["hedging"]
+    assert stats["hedged"] == 1 and stats["failovers"] == 1
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_healthiest_endpoint_goes_first(mode):
+    """Le moteur le plus sain (succès / latence lissée) part en premier"""
+    primary, secondary = make_stub(0), make_stub(0)
+    hedged = make_hedged(primary, secondary)
+    hedged.endpoints[0].record(1.0)
+    hedged.endpoints[0].record(None)
+    hedged.endpoints[1].record(0.05)
+
+    assert hedged._ranked()[0] is hedged.endpoints[1]
+    assert run(hedged, mode)
+    assert secondary.calls == 1 and primary.calls == 0
+    assert hedged.describe()["hedging"]["failovers"] == 0
@@ -0,0 +1,90 @@
+"""
+Tests du pipeline médias: stockage par empreinte, plafonds et dédoublonnage concurrent
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.http_transport import StreamedResponse
+from app.services.media_pipeline import MediaPipeline
+
+
+class FakeTransport:
+    """Transport en mémoire: sert un corps fixe, éventuellement au compte-gouttes"""
+
+    def __init__(self, body=b'contenu', content_type='image/jpeg', chunk_delay=0.0, barrier=None):
+        self.body = body
+        self.content_type = content_type
+        self.chunk_delay = chunk_delay
+        self.barrier = barrier
+
+    @contextmanager
+    def open_stream(self, url, headers=None, timeout=None):
+        def iter_chunks(chunk_size):
+            for start in range(0, len(self.body), chunk_size):
+                time.sleep(self.chunk_delay)
+                yield self.body[start:start + chunk_size]
+            # Les téléchargements concurrents arrivent ensemble au stockage
+            if self.barrier is not None:
+                self.barrier.wait(5)
+
+        yield StreamedResponse(200, {'Content-Type': self.content_type}, iter_chunks)
+
+
+def make_pipeline(tmp_path, transport, **kwargs):
+    pipeline = MediaPipeline(storage_dir=str(tmp_path), transport=transport, chunk_size=4, **kwargs)
+    os.makedirs(os.path.join(str(tmp_path), 'tmp'), exist_ok=True)
+    return pipeline
+
+
+def test_stored_under_hash_without_extension(tmp_path):
+    pipeline = make_pipeline(tmp_path, FakeTransport())
+    result = pipeline.fetch({'url': 'https://media.example.com/1', 'content_type': 'image/jpeg'})
+
+    sha256 = hashlib.sha256(b'contenu').hexdigest()
+    assert result["status"] == "stored"
+    assert result["content_type"] == 'image/jpeg'
+    assert result["path"] == os.path.join(str(tmp_path), sha256[:2], sha256)
+    with open(result["path"], 'rb') as f:
+        assert f.read() == b'contenu'
+
+
+def test_same_content_under_another_type_is_a_duplicate(tmp_path):
+    make_pipeline(tmp_path, FakeTransport(content_type='image/jpeg')).fetch({'url': 'https://m/1'})
+
+    # Autre worker (index vide), même contenu annoncé comme PNG
+    other = make_pipeline(tmp_path, FakeTransport(content_type='image/png'))
+    result = other.fetch({'url': 'https://m/2'})
+    assert result["status"] == "duplicate"
+    assert result["content_type"] == 'image/png'
+    assert os.listdir(os.path.join(str(tmp_path), 'tmp')) == []
+
+
+def test_concurrent_identical_downloads_store_once(tmp_path):
+    barrier = threading.Barrier(2)
+    pipeline = make_pipeline(tmp_path, FakeTransport(barrier=barrier), concurrency=2)
+    batch = pipeline.submit([{'url': 'https://m/1'}, {'url': 'https://m/2'}])
+
+    statuses = sorted(result["status"] for result in batch.result(5))
+    assert statuses == ["duplicate", "stored"]
+    stats = pipeline.get_stats()
+    assert stats["stored"] == 1 and stats["duplicates"] == 1
+
+
+def test_total_deadline_stops_slow_download(tmp_path):
+    transport = FakeTransport(body=b'x' * 40, chunk_delay=0.02)
+    pipeline = make_pipeline(tmp_path, transport, timeout=1, deadline=0.05)
+    result = pipeline.fetch({'url': 'https://m/lent'})
+
+    assert result["status"] == "rejected"
+    assert result["reason"] == "deadline"
+    assert os.listdir(os.path.join(str(tmp_path), 'tmp')) == []
+
+
+def test_size_and_type_caps(tmp_path):
+    pipeline = make_pipeline(tmp_path, FakeTransport(body=b'x' * 40), max_bytes=10)
+    assert pipeline.fetch({'url': 'https://m/gros'})["reason"] == "too_large"
+    assert pipeline.fetch({'url': 'https://m/exe', 'content_type': 'application/x-msdownload'})["reason"] == "type"
@@ -0,0 +1,54 @@
+"""
+Tests du cache approximatif MinHash/LSH
+"""
+
+from app.config import Config
+from app.services.near_duplicate_cache import NearDuplicateCache, distinctive_tokens
+
+
+NAMESPACE = NearDuplicateCache.make_namespace('modele-test', {'max_new_tokens': 50})
+
+
+def make_cache(threshold=0.8):
+    return NearDuplicateCache(threshold=threshold, ngram_size=3, num_perm=64, bands=16, ttl=60)
+
+
+def test_disabled_by_default():
+    assert Config.NEAR_DUP_ENABLED is False
+    assert Config.NEAR_DUP_THRESHOLD >= 0.9
+
+
+def test_near_identical_message_hits():
+    cache = make_cache()
+    cache.set("Quels sont vos horaires d'ouverture le samedi ?", NAMESPACE, "9h-18h")
+    assert cache.get("quels sont vos horaires d'ouverture le samedi svp", NAMESPACE) == "9h-18h"
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_unrelated_message_misses():
+    cache = make_cache()
+    cache.set("Quels sont vos horaires d'ouverture le samedi ?", NAMESPACE, "9h-18h")
+    assert cache.get("Comment puis-je annuler ma commande ?", NAMESPACE) is None
+
+
+def test_distinctive_token_change_misses():
+    # Même avec un seuil bas, A/B ou un numéro différent ne doivent jamais se confondre
+    cache = make_cache(threshold=0.5)
+    cache.set("Quel est le prix du produit A ?", NAMESPACE, "10 €")
+    cache.set("Où en est ma commande 1234 ?", NAMESPACE, "Expédiée")
+    assert cache.get("Quel est le prix du produit B ?", NAMESPACE) is None
+    assert cache.get("Où en est ma commande 1243 ?", NAMESPACE) is None
+    assert cache.get("quel est le prix du produit A", NAMESPACE) == "10 €"
+    assert cache.get_stats()["distinctive_mismatches"] >= 2
+
+
+def test_distinctive_tokens():
+    assert distinctive_tokens("Prix du produit A, réf X12 !") == frozenset({'a', 'x12'})
+    assert distinctive_tokens("Quels sont vos horaires ?") == frozenset()
+
+
+def test_namespace_isolation():
+    cache = make_cache()
+    other = NearDuplicateCache.make_namespace('autre-modele', {'max_new_tokens': 50})
+    cache.set("Quels sont vos horaires d'ouverture ?", NAMESPACE, "9h-18h")
+    assert cache.get("Quels sont vos horaires d'ouverture ?", other) is None
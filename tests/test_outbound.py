@@ -0,0 +1,150 @@
+"""
+Tests de la file d'envoi sortante: seau à jetons, priorités, idempotence, retries
+"""
+
+import asyncio
+import threading
+import time
+
+from twilio.base.exceptions import TwilioRestException
+
+from app.services.outbound_dispatcher import (
+    OutboundDispatcher, TokenBucket, PRIORITY_BULK, PRIORITY_REPLY
+)
+
+
+class FakeTwilioService:
+    """Service Twilio en mémoire: enregistre les envois, peut bloquer ou échouer"""
+
+    whatsapp_number = 'whatsapp:+15550000000'
+
+    def __init__(self, failures=None, gate=None):
+        self.sent = []
+        self.failures = list(failures or [])
+        self.gate = gate
+        self.lock = threading.Lock()
+
+    def create_message(self, to, body, media_url=None):
+        if self.gate is not None and not self.sent:
+            self.gate.wait(5)
+        with self.lock:
+            if self.failures:
+                raise TwilioRestException(self.failures.pop(0), 'uri', msg='échec simulé')
+            self.sent.append((to, body))
+            return f"SM{len(self.sent)}"
+
+    def get_retry_after(self):
+        return 0.01
+
+    def find_sent_message(self, to, body, since):
+        return None
+
+
+def wait_until(predicate, timeout=5.0):
+    """Attend qu'une condition soit vraie (threads de la file)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_token_bucket_burst_then_refill():
+    """La rafale est servie immédiatement, puis un jeton par 1/rate secondes"""
+    bucket = TokenBucket(rate=100, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.01 + 1e-6
+    time.sleep(wait + 0.005)
+    assert bucket.try_acquire() == 0.0
+
+
+def test_replies_overtake_bulk_messages():
+    """Une réponse passe avant les envois de masse déjà en file"""
+    gate = threading.Event()
+    service = FakeTwilioService(gate=gate)
+    dispatcher = OutboundDispatcher(service, rate=1000, burst=1000, concurrency=1)
+
+    dispatcher.submit('+1000', 'premier', priority=PRIORITY_BULK)
+    assert wait_until(lambda: dispatcher.get_stats()["in_flight"] == 1)
+    for index in range(3):
+        dispatcher.submit(f'+200{index}', f'masse {index}', priority=PRIORITY_BULK)
+    dispatcher.submit('+3000', 'réponse', priority=PRIORITY_REPLY)
+    gate.set()
+
+    assert wait_until(lambda: len(service.sent) == 5)
+    bodies = [body for _, body in service.sent]
+    assert bodies[0] == 'premier'
+    assert bodies[1] == 'réponse'
+    assert bodies[2:] == ['masse 0', 'masse 1', 'masse 2']
+
+
+def test_same_recipient_keeps_order():
+    """Les parties d'une réponse à un même destinataire partent dans l'ordre"""
+    service = FakeTwilioService()
+    dispatcher = OutboundDispatcher(service, rate=1000, burst=1000, concurrency=4)
+    for index in range(10):
+        dispatcher.submit('+1000', f'partie {index}')
+    assert wait_until(lambda: len(service.sent) == 10)
+    assert [body for _, body in service.sent] == [f'partie {index}' for index in range(10)]
+
+
+def test_rate_limited_recipients_keep_fifo_order():
+    """Sans jeton, le destinataire en tête garde son rang au lieu de repasser derrière"""
+    service = FakeTwilioService()
+    dispatcher = OutboundDispatcher(service, rate=50, burst=1, concurrency=4)
+    for index in range(5):
+        dispatcher.submit(f'+100{index}', f'message {index}')
+
+    assert wait_until(lambda: len(service.sent) == 5)
+    assert [body for _, body in service.sent] == [f'message {index}' for index in range(5)]
+    assert dispatcher.get_stats()["rate_limited_waits"] >= 1
+
+
+def test_idempotency_key_sends_once():
+    """Une même clé n'est envoyée qu'une fois, en file ou déjà envoyée"""
+    service = FakeTwilioService()
+    dispatcher = OutboundDispatcher(service, rate=1000, burst=1000)
+    first = dispatcher.submit('+1000', 'bonjour', idempotency_key='SM1')
+    assert first.result(5) is not None
+    again = dispatcher.submit('+1000', 'bonjour', idempotency_key='SM1')
+    assert again.result(5) == first.result()
+    assert len(service.sent) == 1
+    assert dispatcher.get_stats()["duplicates"] == 1
+
+
+def test_throttled_message_is_retried():
+    """Un 429 est retenté après Retry-After au lieu d'être perdu"""
+    service = FakeTwilioService(failures=[429])
+    dispatcher = OutboundDispatcher(service, rate=1000, burst=1000, max_attempts=3)
+    future = dispatcher.submit('+1000', 'bonjour')
+    assert future.result(5) is not None
+    stats = dispatcher.get_stats()
+    assert stats["retries"] == 1 and stats["throttled"] == 1 and stats["sent"] == 1
+
+
+def test_full_queue_rejects():
+    """File pleine: le message est refusé sans bloquer"""
+    gate = threading.Event()
+    service = FakeTwilioService(gate=gate)
+    dispatcher = OutboundDispatcher(service, rate=1000, burst=1000, concurrency=1, max_queue_size=2)
+    assert dispatcher.submit('+1000', 'a') is not None
+    assert dispatcher.submit('+1001', 'b') is not None
+    assert dispatcher.submit('+1002', 'c') is None
+    gate.set()
+
+
+def test_async_handler_sends_through_dispatcher():
+    """Le gestionnaire ASGI passe par la file (débit, retries, idempotence)"""
+    from app.handlers.async_message_handler import AsyncMessageHandler
+
+    handler = AsyncMessageHandler()
+    service = FakeTwilioService()
+    handler.outbound = OutboundDispatcher(service, rate=1000, burst=1000)
+    message = {'from': 'whatsapp:+1000', 'body': '/ping', 'message_sid': 'SMasync', 'num_media': 0}
+
+    assert asyncio.run(handler.process_message(message))
+    assert asyncio.run(handler.process_message(message))
+    assert wait_until(lambda: len(service.sent) == 1)
+    assert handler.outbound.get_stats()["duplicates"] == 1
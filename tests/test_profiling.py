@@ -0,0 +1,52 @@
+"""
+Tests du profilage à la demande: en-tête X-Profile et lecture des traces
+"""
+
+from app.utils.profiling import Profiler
+
+ADMIN_HEADERS = {'X-Admin-Token': 'admin-de-test'}
+
+
+def make_profiler():
+    profiler = Profiler()
+    profiler.sample_rate = 0.0
+    return profiler
+
+
+def test_profile_header_requires_admin():
+    profiler = make_profiler()
+    assert profiler.start_trace('webhook', '1') is None
+    assert profiler.start_trace('webhook', 'cprofile', admin=False) is None
+
+    trace = profiler.start_trace('webhook', 'cprofile', admin=True)
+    assert trace is not None and trace.cprofile
+
+
+def test_sampling_still_applies_without_header():
+    profiler = make_profiler()
+    profiler.set_sample_rate(1.0, duration=60)
+    trace = profiler.start_trace('webhook', 'cprofile', admin=False)
+    assert trace is not None and not trace.cprofile
+
+
+def test_get_traces_limit_is_clamped():
+    profiler = make_profiler()
+    for _ in range(5):
+        profiler.record(profiler.start_trace('webhook', '1', admin=True))
+
+    assert len(profiler.get_traces(2)) == 2
+    assert profiler.get_traces(0) == []
+    assert profiler.get_traces(-3) == []
+    assert len(profiler.get_traces(10 ** 9)) == 5
+
+
+def test_test_ai_ignores_profile_header_without_admin(client):
+    from app.utils.profiling import get_profiler
+
+    before = get_profiler().get_stats()["traced"]
+    response = client.post('/test/ai', json={'prompt': 'bonjour'}, headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert get_profiler().get_stats()["traced"] == before
+
+    client.post('/test/ai', json={'prompt': 'bonjour'}, headers={'X-Profile': '1', **ADMIN_HEADERS})
+    assert get_profiler().get_stats()["traced"] == before + 1
@@ -0,0 +1,107 @@
+"""
+Tests des gabarits de prompt: familles, budget de tokens et extraction de la réponse
+"""
+
+import pytest
+
+from app.services.prompt_templates import (
+    TEMPLATES, ModelPrompt, PromptTemplateRegistry, PromptTokenizer, detect_family
+)
+
+HISTORY = [
+    ('première question ' * 5, 'première réponse ' * 5, 0),
+    ('deuxième question ' * 5, 'deuxième réponse ' * 5, 0),
+    ('troisième question', 'troisième réponse', 0),
+]
+
+
+def make_prompt(family='mistral', budget=4096):
+    return ModelPrompt(f'modele-{family}', TEMPLATES[family], PromptTokenizer(''), budget)
+
+
+@pytest.mark.parametrize("model, family", [
+    ('mistralai/Mistral-7B-Instruct-v0.2', 'mistral'),
+    ('mistralai/Mixtral-8x7B-Instruct-v0.1', 'mistral'),
+    ('meta-llama/Llama-2-7b-chat-hf', 'llama'),
+    ('google/flan-t5-large', 'flan'),
+    ('HuggingFaceH4/zephyr-7b-beta', 'generic'),
+])
+def test_detect_family(model, family):
+    """La famille vient du nom du modèle, generic à défaut"""
+    assert detect_family(model) == family
+
+
+def test_registry_resolves_once_and_caps_budget():
+    """Un gabarit par modèle, budget borné par la fenêtre de la famille"""
+    registry = PromptTemplateRegistry(tokenizer_path='', max_budget=1000)
+    resolved = registry.resolve('google/flan-t5-large')
+    assert registry.resolve('google/flan-t5-large') is resolved
+    assert resolved.template.family == 'flan'
+    assert resolved.budget == 512
+    assert registry.resolve('mistralai/Mistral-7B-Instruct-v0.2').budget == 1000
+
+
+def test_format_within_budget_keeps_history():
+    """Sous le budget, tout l'historique est conservé"""
+    model_prompt = make_prompt()
+    prompt, tokens = model_prompt.format("Quelle heure est-il ?", "Alice", HISTORY)
+
+    assert "troisième question" in prompt and "première question" in prompt
+    assert prompt.endswith("Alice te demande: Quelle heure est-il ? [/INST]")
+    assert tokens == model_prompt.count_tokens(prompt)
+    stats = model_prompt.get_stats()
+    assert stats["history_trimmed"] == 0 and stats["over_budget"] == 0
+
+
+def test_format_trims_oldest_history_first():
+    """Les échanges les plus anciens partent d'abord; le message courant reste"""
+    model_prompt = make_prompt()
+    message = "Quelle heure est-il ?"
+    # Budget juste suffisant pour le dernier échange
+    budget = model_prompt.count_tokens(TEMPLATES['mistral'].render(message, "Alice", HISTORY[-1:]))
+    model_prompt.budget = budget
+
+    prompt, tokens = model_prompt.format(message, "Alice", HISTORY)
+
+    assert tokens <= budget
+    assert "troisième question" in prompt
+    assert "première question" not in prompt and "deuxième question" not in prompt
+    assert message in prompt
+    stats = model_prompt.get_stats()
+    assert stats["history_trimmed"] == 2 and stats["over_budget"] == 0
+
+
+def test_format_over_budget_keeps_current_message():
+    """Même sans historique le prompt dépasse: il est envoyé tel quel et compté"""
+    model_prompt = make_prompt(budget=5)
+    message = "Un message bien trop long pour un budget de cinq tokens"
+
+    prompt, tokens = model_prompt.format(message, "Alice", HISTORY)
+
+    assert message in prompt
+    assert "troisième question" not in prompt
+    assert tokens > 5
+    stats = model_prompt.get_stats()
+    assert stats["history_trimmed"] == len(HISTORY)
+    assert stats["over_budget"] == 1 and stats["prompts"] == 1
+
+
+@pytest.mark.parametrize("family", ['mistral', 'llama'])
+def test_extract_strips_echoed_prompt(family):
+    """Mistral/Llama: l'écho du prompt est retiré jusqu'au dernier [/INST]"""
+    template = TEMPLATES[family]
+    prompt = template.render("Quelle heure est-il ?", "Alice", HISTORY)
+    assert template.extract(prompt + "  Il est midi. ") == "Il est midi."
+    assert template.extract("Il est midi.") == "Il est midi."
+
+
+def test_extract_leaves_flan_output_untouched():
+    """Flan ne renvoie que la réponse: seul l'espace autour est retiré"""
+    template = TEMPLATES['flan']
+    assert template.extract(" Réponse: il est midi [/INST] ") == "Réponse: il est midi [/INST]"
+
+
+def test_user_name_in_template():
+    """Le nom fait partie du prompt pour mistral, pas pour flan"""
+    assert TEMPLATES['mistral'].uses_user_name
+    assert not TEMPLATES['flan'].uses_user_name
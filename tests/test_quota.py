@@ -0,0 +1,87 @@
+"""
+Tests des quotas par expéditeur: fenêtre glissante, partage SQLite, endpoint /usage
+"""
+
+import os
+
+from app.services.quota import QuotaManager, SlidingWindowCounter
+
+ADMIN_HEADERS = {'X-Admin-Token': 'admin-de-test'}
+
+
+def test_sliding_window_weights_previous_window():
+    counter = SlidingWindowCounter(window_start=0)
+    counter.add(10, 100, amount=40)
+    assert counter.value(50, 100) == 40
+
+    # Un quart de la fenêtre précédente chevauche encore la fenêtre glissante
+    counter.add(175, 100, amount=5)
+    assert counter.value(175, 100) == 40 * 0.25 + 5
+
+    # Deux fenêtres plus tard, plus rien ne compte
+    assert counter.value(390, 100) == 0
+
+
+def test_message_quota_rejects_then_counts_rejections():
+    quotas = QuotaManager(window=3600, max_messages=3, max_tokens=0, sqlite_path='')
+    assert [quotas.allow_message('whatsapp:+1') for _ in range(4)] == [True, True, True, False]
+    assert quotas.allow_message('whatsapp:+2')
+
+    usage = quotas.get_usage('whatsapp:+1')
+    assert usage['messages'] >= 3 and usage['rejected'] == 1
+    assert quotas.get_stats() == {
+        "allowed": 4, "rejected": 1, "evictions": 0, "disk_errors": 0,
+        "tracked_users": 2, "shared": False,
+    }
+
+
+def test_token_quota():
+    quotas = QuotaManager(window=3600, max_messages=0, max_tokens=100, sqlite_path='')
+    assert quotas.allow_message('whatsapp:+1')
+    quotas.record_tokens('whatsapp:+1', 150)
+    assert not quotas.allow_message('whatsapp:+1')
+
+
+def test_least_recent_users_are_evicted():
+    quotas = QuotaManager(window=3600, max_messages=10, max_tokens=0, max_users=2, sqlite_path='')
+    for sender in ('a', 'b', 'c'):
+        quotas.allow_message(sender)
+    assert quotas.get_usage('a') is None
+    assert quotas.get_stats()["evictions"] == 1
+
+
+def test_shared_store_enforces_one_limit_across_workers(tmp_path):
+    path = os.path.join(tmp_path, 'quotas.db')
+    # Deux gestionnaires sur le même fichier se comportent comme deux workers gunicorn
+    worker_a = QuotaManager(window=3600, max_messages=4, max_tokens=50, sqlite_path=path)
+    worker_b = QuotaManager(window=3600, max_messages=4, max_tokens=50, sqlite_path=path)
+
+    results = [(worker_a if i % 2 else worker_b).allow_message('whatsapp:+1') for i in range(6)]
+    assert results.count(True) == 4
+
+    usage = worker_a.get_usage('whatsapp:+1')
+    assert usage['messages'] >= 4 and usage['rejected'] == 2
+
+    worker_a.record_tokens('whatsapp:+2', 60)
+    assert not worker_b.allow_message('whatsapp:+2')
+    assert worker_b.get_usage('whatsapp:+2')['tokens'] >= 60
+    assert worker_b.get_stats()["shared"] is True
+
+
+def test_usage_endpoint_requires_admin_token(client):
+    assert client.get('/usage/+33612345678').status_code == 401
+    assert client.get('/usage/+33612345678', headers={'X-Admin-Token': 'mauvais'}).status_code == 401
+
+    response = client.get('/usage/+33612345678', headers=ADMIN_HEADERS)
+    assert response.status_code == 404
+    assert response.get_json()["sender"] == 'whatsapp:+33612345678'
+
+
+def test_asgi_usage_endpoint_requires_admin_token():
+    from starlette.testclient import TestClient
+    from app.asgi import app
+
+    # Sans bloc `with`: pas de lifespan, donc pas de préchauffage des connexions Twilio
+    asgi_client = TestClient(app)
+    assert asgi_client.get('/usage/+33612345678').status_code == 401
+    assert asgi_client.get('/usage/+33612345678', headers=ADMIN_HEADERS).status_code == 404
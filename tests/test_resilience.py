@@ -0,0 +1,215 @@
+"""
+Tests du disjoncteur et de la libération des appels d'essai
+"""
+
+import asyncio
+import time
+
+from app.services.async_huggingface_services import AsyncHuggingFaceService
+from app.services.backends import ModelLoadingError
+from app.services.backends.hedged import HedgedBackend
+from app.services.backends.stub import StubBackend
+from app.services.huggingface_services import HuggingFaceService
+from app.services.resilience import CircuitBreaker, CircuitOpenError
+
+RECOVERY = 0.05
+
+
+def make_breaker(threshold=2):
+    """Disjoncteur court: ouverture après `threshold` échecs, essai après 50 ms"""
+    return CircuitBreaker("test", failure_threshold=threshold, recovery_timeout=RECOVERY, half_open_max_calls=1)
+
+
+def open_then_half_open(breaker):
+    """Ouvre le disjoncteur puis attend le passage en semi-ouvert"""
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(RECOVERY * 1.5)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_breaker_opens_after_threshold():
+    """Fermé tant que le seuil n'est pas atteint, puis refuse les appels"""
+    breaker = make_breaker(threshold=3)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.get_stats()["rejected"] == 1
+
+
+def test_success_resets_consecutive_failures():
+    """Un succès remet le compteur d'échecs consécutifs à zéro"""
+    breaker = make_breaker(threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_one_trial_call():
+    """En semi-ouvert, un seul appel d'essai passe"""
+    breaker = make_breaker()
+    open_then_half_open(breaker)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_half_open_success_closes():
+    """Un essai réussi referme le disjoncteur"""
+    breaker = make_breaker()
+    open_then_half_open(breaker)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_failure_reopens():
+    """Un essai en échec rouvre le disjoncteur immédiatement"""
+    breaker = make_breaker(threshold=5)
+    open_then_half_open(breaker)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_release_gives_back_half_open_slot():
+    """Un appel sans issue connue rend sa place d'essai"""
+    breaker = make_breaker()
+    open_then_half_open(breaker)
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_release_when_closed_is_noop():
+    """release() ne change rien hors semi-ouvert"""
+    breaker = make_breaker()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def _stub_service():
+    return HuggingFaceService(backend=StubBackend("stub", {}))
+
+
+class LoadingBackend(StubBackend):
+    """Moteur qui répond 503 (modèle en chargement) aux `loading` premiers appels"""
+
+    def __init__(self, loading):
+        super().__init__("stub", {})
+        self.loading = loading
+
+    def generate(self, prompt):
+        if self.loading > 0:
+            self.loading -= 1
+            raise ModelLoadingError(estimated_time=0.001)
+        return super().generate(prompt)
+
+    async def agenerate(self, prompt):
+        return self.generate(prompt)
+
+
+def test_model_loading_does_not_open_breaker():
+    """Un modèle en chargement n'est pas une panne: le disjoncteur reste fermé"""
+    service = HuggingFaceService(backend=LoadingBackend(loading=3))
+    service.circuit_breaker = make_breaker(threshold=1)
+
+    assert service._generate("Bonjour", max_retries=4)
+    assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+    assert service.circuit_breaker.get_stats()["failures"] == 0
+
+
+def test_model_loading_does_not_open_breaker_async():
+    """Même garantie pour la génération asynchrone"""
+    service = AsyncHuggingFaceService()
+    service.backend = LoadingBackend(loading=3)
+    service.circuit_breaker = make_breaker(threshold=1)
+
+    result = asyncio.run(service._generate_async("Bonjour", "User", [], "cle", None, 4))
+    assert result
+    assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+    assert service.circuit_breaker.get_stats()["failures"] == 0
+
+
+def test_model_loading_in_half_open_gives_back_trial_slot():
+    """En semi-ouvert, un 503 de chargement rend la place d'essai"""
+    service = HuggingFaceService(backend=LoadingBackend(loading=1))
+    service.circuit_breaker = make_breaker()
+    open_then_half_open(service.circuit_breaker)
+
+    assert service._generate("Bonjour", max_retries=2)
+    assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_closed_before_first_token_releases_slot():
+    """Flux fermé avant le premier token: le disjoncteur reste utilisable"""
+    service = _stub_service()
+    service.circuit_breaker = make_breaker()
+    open_then_half_open(service.circuit_breaker)
+
+    stream = service._stream_tokens("Bonjour")
+    stream.close()  # générateur jamais démarré: allow_request() n'a pas été appelé
+    assert service.circuit_breaker.allow_request()
+    service.circuit_breaker.release()
+
+    stream = service._stream_tokens("Bonjour")
+    next(stream)
+    stream.close()  # envoi échoué côté appelant après le premier token
+    assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+    assert service.circuit_breaker.allow_request()
+
+
+def test_stream_closed_early_does_not_wedge_half_open_breaker():
+    """Scénario du bug: fermer tôt un flux en semi-ouvert ne bloque plus le disjoncteur"""
+    service = _stub_service()
+    service.circuit_breaker = make_breaker()
+
+    for _ in range(3):
+        open_then_half_open(service.circuit_breaker)
+        stream = service._stream_tokens("Bonjour")
+        next(stream)
+        stream.close()
+        assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+
+    # Un flux consommé jusqu'au bout referme aussi le disjoncteur
+    open_then_half_open(service.circuit_breaker)
+    assert "".join(service._stream_tokens("Bonjour"))
+    assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_refused_when_open():
+    """Disjoncteur ouvert: le flux échoue immédiatement"""
+    service = _stub_service()
+    service.circuit_breaker = make_breaker()
+    for _ in range(2):
+        service.circuit_breaker.record_failure()
+
+    stream = service._stream_tokens("Bonjour")
+    try:
+        next(stream)
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("CircuitOpenError attendue")
+
+
+def test_hedged_stream_closed_early_keeps_endpoint_usable():
+    """Même garantie pour le flux du moteur composite"""
+    backend = HedgedBackend([("stub:a", StubBackend("a", {})), ("stub:b", StubBackend("b", {}))])
+    for endpoint in backend.endpoints:
+        endpoint.circuit_breaker = make_breaker()
+        open_then_half_open(endpoint.circuit_breaker)
+
+    stream = backend.stream("Bonjour")
+    next(stream)
+    stream.close()
+
+    assert all(endpoint.circuit_breaker.allow_request() for endpoint in backend.endpoints)
@@ -0,0 +1,112 @@
+"""
+Tests du cache de réponses à deux niveaux (mémoire puis SQLite)
+"""
+
+import os
+import time
+
+from app.services.response_cache import ResponseCache
+
+PARAMS = {'max_new_tokens': 50}
+
+
+def test_key_normalizes_prompt_and_separates_models_and_history():
+    key = ResponseCache.make_key("Quels sont vos  HORAIRES ?", 'modele-a', PARAMS)
+    assert key == ResponseCache.make_key("quels sont vos horaires ?", 'modele-a', PARAMS)
+    assert key != ResponseCache.make_key("quels sont vos horaires ?", 'modele-b', PARAMS)
+    assert key != ResponseCache.make_key("quels sont vos horaires ?", 'modele-a', {'max_new_tokens': 80})
+    assert key != ResponseCache.make_key(
+        "quels sont vos horaires ?", 'modele-a', PARAMS, history=[("et le samedi ?", "10h-16h")]
+    )
+
+
+def test_memory_lru_eviction_and_expiry():
+    cache = ResponseCache(max_entries=2, ttl=60, sqlite_path='')
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C')
+    # 'b' est le moins récemment utilisé
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A' and cache.get('c') == 'C'
+
+    short = ResponseCache(max_entries=10, ttl=0.05, sqlite_path='')
+    short.set('a', 'A')
+    time.sleep(0.06)
+    assert short.get('a') is None
+
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path):
+    path = os.path.join(tmp_path, 'cache', 'responses.db')
+    ResponseCache(max_entries=10, ttl=60, sqlite_path=path).set('cle', 'réponse')
+
+    restarted = ResponseCache(max_entries=10, ttl=60, sqlite_path=path)
+    assert restarted.get('cle') == 'réponse'
+    assert restarted.get('cle') == 'réponse'
+    stats = restarted.get_stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+
+
+def make_service(model):
+    from app.services.backends.stub import StubBackend
+    from app.services.huggingface_services import HuggingFaceService
+    from app.services.near_duplicate_cache import NearDuplicateCache
+
+    service = HuggingFaceService(backend=StubBackend(model, dict(PARAMS)))
+    service.cache = ResponseCache(max_entries=10, ttl=60, sqlite_path='')
+    service.near_cache = NearDuplicateCache(threshold=0.8, num_perm=64, bands=16, ttl=60)
+    service.cache_namespace = service.near_cache.make_namespace(service.model, service.generation_params)
+    return service
+
+
+def test_reply_is_not_shared_between_names_when_prompt_contains_it():
+    service = make_service('mistralai/Mistral-7B-Instruct-v0.2')
+    assert service.prompt.template.uses_user_name
+
+    service.generate_response("Quels sont vos horaires d'ouverture ?", user_name="Alice")
+    service.generate_response("Quels sont vos horaires d'ouverture ?", user_name="Bob")
+    assert service.backend.calls == 2
+
+    # Même nom: servi par le cache exact, puis par le cache approximatif
+    service.generate_response("Quels sont vos horaires d'ouverture ?", user_name="Alice")
+    service.generate_response("quels sont vos horaires d'ouverture svp", user_name="Alice")
+    assert service.backend.calls == 2
+    service.generate_response("quels sont vos horaires d'ouverture svp", user_name="Carol")
+    assert service.backend.calls == 3
+
+
+def test_reply_is_shared_when_template_ignores_name():
+    service = make_service('google/flan-t5-base')
+    assert not service.prompt.template.uses_user_name
+
+    service.generate_response("Quels sont vos horaires d'ouverture ?", user_name="Alice")
+    service.generate_response("Quels sont vos horaires d'ouverture ?", user_name="Bob")
+    assert service.backend.calls == 1
+
+
+def test_async_disk_cache_runs_off_the_event_loop(tmp_path):
+    """Avec le niveau SQLite, lecture et écriture du cache quittent la boucle d'événements"""
+    import asyncio
+    import threading
+    from app.services.async_huggingface_services import AsyncHuggingFaceService
+    from app.services.backends.stub import StubBackend
+
+    service = AsyncHuggingFaceService()
+    service.backend = StubBackend('modele-test', dict(PARAMS))
+    service.cache = ResponseCache(max_entries=10, ttl=60, sqlite_path=os.path.join(str(tmp_path), 'cache.db'))
+    service._cache_on_disk = True
+    threads = []
+    lookup, store = service._lookup_cached, service._store_response
+    service._lookup_cached = lambda *args: threads.append(threading.get_ident()) or lookup(*args)
+    service._store_response = lambda *args: threads.append(threading.get_ident()) or store(*args)
+
+    async def ask():
+        loop_thread = threading.get_ident()
+        first = await service.generate_response("Bonjour", "Alice")
+        second = await service.generate_response("Bonjour", "Alice")
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(ask())
+    assert first == second
+    assert len(threads) == 3 and loop_thread not in threads
+    assert service.cache.get_stats()["sets"] == 1
@@ -0,0 +1,91 @@
+"""
+Tests de la coalescence des appels identiques en cours
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.services.single_flight import SingleFlight, SingleFlightTimeout
+
+
+def run_concurrently(group, key, fn, callers):
+    """Lance `callers` appels de la même clé et retourne (résultats, erreurs)"""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(group.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    group = SingleFlight(timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait(5)
+        return "réponse"
+
+    threads, results, errors = run_concurrently(group, 'prompt', generate, 5)
+    while group.get_stats()["coalesced"] < 4:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["réponse"] * 5 and errors == []
+    assert group.get_stats() == {"leaders": 1, "coalesced": 4, "timeouts": 0, "in_flight": 0}
+
+
+def test_error_is_shared_then_next_call_runs_again():
+    group = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("modèle indisponible")
+
+    threads, results, errors = run_concurrently(group, 'prompt', failing, 3)
+    while group.get_stats()["coalesced"] < 2:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [] and len(errors) == 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    # La clé est libérée: un nouvel appel est exécuté
+    assert group.do('prompt', lambda: "ok") == "ok"
+
+
+def test_waiter_times_out():
+    group = SingleFlight(timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=('prompt', lambda: release.wait(5)))
+    leader.start()
+    while group.get_stats()["in_flight"] == 0:
+        time.sleep(0.005)
+
+    with pytest.raises(SingleFlightTimeout):
+        group.do('prompt', lambda: "jamais appelé")
+    release.set()
+    leader.join(5)
+    assert group.get_stats()["timeouts"] == 1
+
+
+def test_distinct_keys_do_not_coalesce():
+    group = SingleFlight(timeout=5)
+    assert group.do('a', lambda: 1) == 1
+    assert group.do('b', lambda: 2) == 2
+    assert group.get_stats()["leaders"] == 2
@@ -0,0 +1,62 @@
+"""
+Tests du découpage d'un flux de tokens en messages WhatsApp
+"""
+
+from app.services.streaming import SentenceChunker
+
+
+def feed_tokens(chunker, text):
+    """Alimente le découpeur mot par mot, comme un flux SSE"""
+    messages = []
+    for token in text.split(' '):
+        messages.extend(chunker.feed(token + ' '))
+    return messages
+
+
+def test_first_sentence_is_sent_as_soon_as_complete():
+    chunker = SentenceChunker(followup_min_chars=50)
+    assert chunker.feed("Bonjour") == []
+    assert chunker.feed(" !") == []
+    # La fin de phrase n'est confirmée que par l'espace suivant
+    assert chunker.feed(" Je") == ["Bonjour !"]
+    assert chunker.flush() == "Je"
+
+
+def test_first_paragraph_counts_as_first_message():
+    chunker = SentenceChunker(followup_min_chars=50)
+    assert chunker.feed("Voici la liste\n- un") == ["Voici la liste"]
+
+
+def test_decimal_point_is_not_a_sentence_end():
+    chunker = SentenceChunker(followup_min_chars=50)
+    assert chunker.feed("Le prix est de 3.50 euros") == []
+
+
+def test_followups_wait_for_min_chars_then_cut_at_paragraph():
+    chunker = SentenceChunker(followup_min_chars=30)
+    text = "Première phrase. " + "a" * 20 + ". Suite du texte.\n\nDeuxième paragraphe"
+    messages = feed_tokens(chunker, text)
+    assert messages == ["Première phrase.", "a" * 20 + ". Suite du texte."]
+    assert chunker.flush() == "Deuxième paragraphe"
+
+
+def test_followups_cut_at_last_sentence_without_paragraph():
+    chunker = SentenceChunker(followup_min_chars=30)
+    messages = feed_tokens(chunker, "Intro. " + "Une phrase assez longue ici. " * 3 + "Fin")
+    assert messages[0] == "Intro."
+    assert len(messages) >= 2
+    assert all(len(message) >= 30 for message in messages[1:])
+    assert all(message.endswith('.') for message in messages[1:])
+    assert " ".join(messages[1:] + [chunker.flush()]) == "Une phrase assez longue ici. " * 3 + "Fin"
+
+
+def test_text_without_punctuation_is_cut_at_max_chars():
+    chunker = SentenceChunker(followup_min_chars=10, max_chars=20)
+    messages = chunker.feed("x" * 45)
+    assert messages == ["x" * 20, "x" * 20]
+    assert chunker.flush() == "x" * 5
+
+
+def test_flush_empty_buffer():
+    chunker = SentenceChunker(followup_min_chars=10)
+    assert chunker.flush() is None
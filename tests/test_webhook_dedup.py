@@ -0,0 +1,80 @@
+"""
+Tests de la déduplication des webhooks Twilio par MessageSid
+"""
+
+import os
+import time
+
+from app.services.webhook_dedup import WebhookDeduplicator
+
+
+def test_retry_is_a_duplicate_until_forgotten():
+    dedup = WebhookDeduplicator(max_entries=100, ttl=60, sqlite_path='')
+    assert dedup.check_and_mark('SM1')
+    assert not dedup.check_and_mark('SM1')
+
+    # Échec du traitement: le prochain retry Twilio doit passer
+    dedup.forget('SM1')
+    assert dedup.check_and_mark('SM1')
+    assert dedup.get_stats()["duplicates"] == 1
+
+
+def test_entries_expire_after_ttl():
+    dedup = WebhookDeduplicator(max_entries=100, ttl=0.05, sqlite_path='')
+    assert dedup.check_and_mark('SM1')
+    time.sleep(0.06)
+    assert dedup.check_and_mark('SM1')
+
+
+def test_memory_is_bounded():
+    dedup = WebhookDeduplicator(max_entries=2, ttl=60, sqlite_path='')
+    for sid in ('SM1', 'SM2', 'SM3'):
+        dedup.check_and_mark(sid)
+    stats = dedup.get_stats()
+    assert stats["memory_entries"] == 2 and stats["evictions"] == 1
+
+
+def test_sqlite_store_is_shared_between_workers_and_restarts(tmp_path):
+    path = os.path.join(tmp_path, 'dedup', 'webhooks.db')
+    worker_a = WebhookDeduplicator(max_entries=100, ttl=60, sqlite_path=path)
+    worker_b = WebhookDeduplicator(max_entries=100, ttl=60, sqlite_path=path)
+
+    assert worker_a.check_and_mark('SM1')
+    assert not worker_b.check_and_mark('SM1')
+
+    # Nouveau processus après redémarrage: la mémoire est vide, le fichier reste
+    restarted = WebhookDeduplicator(max_entries=100, ttl=60, sqlite_path=path)
+    assert not restarted.check_and_mark('SM1')
+
+    worker_a.forget('SM1')
+    assert worker_b.check_and_mark('SM1')
+    assert worker_b.get_stats()["disk_errors"] == 0
+
+
+def test_expired_shared_entry_can_be_claimed_again(tmp_path):
+    path = os.path.join(tmp_path, 'webhooks.db')
+    worker_a = WebhookDeduplicator(max_entries=100, ttl=0.05, sqlite_path=path)
+    worker_b = WebhookDeduplicator(max_entries=100, ttl=0.05, sqlite_path=path)
+    assert worker_a.check_and_mark('SM1')
+    time.sleep(0.06)
+    assert worker_b.check_and_mark('SM1')
+
+
+def test_webhook_retry_is_acknowledged_without_requeue(client, monkeypatch):
+    from app.registry import get_service
+
+    submitted = []
+    monkeypatch.setattr(get_service('worker_pool'), 'submit', lambda data: submitted.append(data) or True)
+    form = {
+        'AccountSid': 'AC' + '0' * 32,
+        'MessageSid': 'SMretry-dedup',
+        'From': 'whatsapp:+33612345678',
+        'Body': 'bonjour',
+    }
+    signature = get_service('twilio_service').signature_validator.compute('http://localhost/webhook', form)
+    headers = {'X-Twilio-Signature': signature}
+
+    assert client.post('/webhook', data=form, headers=headers).status_code == 200
+    retry = client.post('/webhook', data=form, headers=headers)
+    assert retry.status_code == 200 and retry.content_type.startswith('text/xml')
+    assert len(submitted) == 1
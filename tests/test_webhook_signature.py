@@ -0,0 +1,132 @@
+"""
+Tests de la validation X-Twilio-Signature: codes de refus et URL derrière un proxy
+"""
+
+import io
+import itertools
+from urllib.parse import urlencode
+
+import pytest
+
+from app.config import Config
+from app.registry import get_service
+
+_sids = itertools.count()
+
+
+def make_form():
+    return {
+        'AccountSid': 'AC' + '0' * 32,
+        'MessageSid': f'SMsignature{next(_sids)}',
+        'From': 'whatsapp:+33612345678',
+        'Body': 'bonjour',
+    }
+
+
+def sign(url, form):
+    return get_service('twilio_service').signature_validator.compute(url, form)
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Messages acceptés par le webhook, sans les traiter"""
+    submitted = []
+    monkeypatch.setattr(get_service('worker_pool'), 'submit', lambda data: submitted.append(data) or True)
+    return submitted
+
+
+def test_valid_signature_is_accepted(client, queued):
+    form = make_form()
+    headers = {'X-Twilio-Signature': sign('http://localhost/webhook', form)}
+    assert client.post('/webhook', data=form, headers=headers).status_code == 200
+    assert len(queued) == 1
+
+
+def test_missing_signature_is_unauthorized(client, queued):
+    assert client.post('/webhook', data=make_form()).status_code == 401
+
+
+def test_bad_signature_is_forbidden(client, queued):
+    form = make_form()
+    headers = {'X-Twilio-Signature': sign('http://localhost/autre', form)}
+    assert client.post('/webhook', data=form, headers=headers).status_code == 403
+    # Signature de la bonne longueur mais pas en base64
+    assert client.post('/webhook', data=form, headers={'X-Twilio-Signature': '!' * 28}).status_code == 403
+    assert queued == []
+
+
+def test_proxy_url_is_rejected_without_configuration(client, queued):
+    form = make_form()
+    headers = {
+        'X-Twilio-Signature': sign('https://bot.example.com/webhook', form),
+        'X-Forwarded-Proto': 'https',
+        'X-Forwarded-Host': 'bot.example.com',
+    }
+    assert client.post('/webhook', data=form, headers=headers).status_code == 403
+
+
+def test_trusted_proxy_rebuilds_signed_url(client, queued, monkeypatch):
+    monkeypatch.setattr(Config, 'WEBHOOK_TRUSTED_PROXY', True)
+    form = make_form()
+    headers = {
+        'X-Twilio-Signature': sign('https://bot.example.com/webhook?source=ngrok', form),
+        'X-Forwarded-Proto': 'https',
+        'X-Forwarded-Host': 'bot.example.com, interne.local',
+    }
+    response = client.post('/webhook?source=ngrok', data=form, headers=headers)
+    assert response.status_code == 200
+    assert len(queued) == 1
+
+
+def test_public_url_takes_precedence(client, queued, monkeypatch):
+    monkeypatch.setattr(Config, 'WEBHOOK_PUBLIC_URL', 'https://mon-bot.example.com/webhook')
+    monkeypatch.setattr(Config, 'WEBHOOK_TRUSTED_PROXY', True)
+    form = make_form()
+    headers = {
+        'X-Twilio-Signature': sign('https://mon-bot.example.com/webhook', form),
+        'X-Forwarded-Host': 'ailleurs.example.com',
+    }
+    assert client.post('/webhook', data=form, headers=headers).status_code == 200
+
+
+def chunked_oversized_body():
+    form = make_form()
+    form['Body'] = 'x' * (Config.WEBHOOK_MAX_BODY_BYTES + 1)
+    return form, urlencode(form).encode()
+
+
+def test_chunked_oversized_body_is_rejected_while_reading(client, queued):
+    form, body = chunked_oversized_body()
+    headers = {
+        'X-Twilio-Signature': sign('http://localhost/webhook', form),
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Transfer-Encoding': 'chunked',
+    }
+    # Pas de Content-Length: le précontrôle laisse passer, la lecture doit s'arrêter au plafond
+    response = client.post(
+        '/webhook',
+        input_stream=io.BytesIO(body),
+        headers=headers,
+        environ_overrides={'wsgi.input_terminated': True}
+    )
+    assert response.status_code == 413
+    assert queued == []
+
+
+def test_asgi_chunked_oversized_body_is_rejected():
+    from starlette.testclient import TestClient
+    from app.asgi import app
+
+    form, body = chunked_oversized_body()
+    headers = {
+        'X-Twilio-Signature': sign('http://testserver/webhook', form),
+        'Content-Type': 'application/x-www-form-urlencoded',
+    }
+
+    def chunks():
+        for start in range(0, len(body), 4096):
+            yield body[start:start + 4096]
+
+    # Un générateur est envoyé en Transfer-Encoding: chunked, sans Content-Length
+    response = TestClient(app).post('/webhook', content=chunks(), headers=headers)
+    assert response.status_code == 413